@@ -0,0 +1,153 @@
+"""Counters of the bookings per day of the week, time of the day and weekly time, for all users and per user, kept
+up to date as reservations are made and cancelled so the reports don't read the whole history.
+
+The counters are rows of an SQLite table keyed by (scope, kind, key), the scope being the username or ALL for
+every user. A booking or cancellation only adds to its own six rows, however many users there are.
+"""
+import datetime
+import sqlite3
+from contextlib import contextmanager
+
+import metrics
+import storage
+
+AGGREGATES_PATH = "report_aggregates.db"
+# The scope of the counters of every user, no username is empty.
+ALL = ""
+KINDS = ('days', 'times', 'weekly_times')
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS counts (
+        scope TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (scope, kind, key)
+    );
+"""
+
+
+def empty_counts():
+    """Returns the counters of a user without any reservations."""
+    return {'days': {}, 'times': {}, 'weekly_times': {}}
+
+
+def day_of_week(date):
+    """Returns the name of the day of the week of the given ISO date."""
+    return datetime.date.fromisoformat(date).strftime("%A")
+
+
+def count_keys(date, time):
+    """Returns the (kind, key) counters a booking at the given date and time adds to."""
+    day = day_of_week(date)
+    return ('days', day), ('times', time), ('weekly_times', f"{day} {time}")
+
+
+def add_to_counts(counts, day, time, delta):
+    """Adds delta to the day, time and weekly time counters, dropping the ones that reach zero."""
+    for name, key in (('days', day), ('times', time), ('weekly_times', f"{day} {time}")):
+        counter = counts[name]
+        counter[key] = counter.get(key, 0) + delta
+        if counter[key] <= 0:
+            del counter[key]
+
+
+def compute(reservations):
+    """Counts the bookings per day of the week, time of the day and weekly time, for all users and per user."""
+    aggregates = {'all': empty_counts(), 'users': {}}
+    for key, slots in reservations.items():
+        date, time = key.split()
+        day = day_of_week(date)
+        for res in slots:
+            add_to_counts(aggregates['all'], day, time, 1)
+            add_to_counts(aggregates['users'].setdefault(res['username'], empty_counts()), day, time, 1)
+    return aggregates
+
+
+@contextmanager
+def connect(path):
+    """Opens a connection to the counters, commits on success and closes it afterwards."""
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        with connection:
+            connection.executescript(SCHEMA)
+            yield connection
+    finally:
+        connection.close()
+
+
+def fill(connection):
+    """Computes the counters from the whole history if they haven't been yet. The database's user_version tells
+    whether they have, as no counters at all is also what an empty history gives. Must be called in a write
+    transaction."""
+    if connection.execute("PRAGMA user_version").fetchone()[0]:
+        return
+    aggregates = compute(storage.get_backend().load())
+    scopes = [(ALL, aggregates['all'])] + list(aggregates['users'].items())
+    connection.executemany("INSERT INTO counts (scope, kind, key, n) VALUES (?, ?, ?, ?)",
+                           ((scope, kind, key, n) for scope, counts in scopes
+                            for kind in KINDS for key, n in counts[kind].items()))
+    connection.execute("PRAGMA user_version = 1")
+
+
+def read(path=AGGREGATES_PATH):
+    """Returns the stored counters in the format of compute, None if they haven't been computed yet."""
+    with connect(path) as connection:
+        if not connection.execute("PRAGMA user_version").fetchone()[0]:
+            return None
+        aggregates = {'all': empty_counts(), 'users': {}}
+        for scope, kind, key, n in connection.execute("SELECT scope, kind, key, n FROM counts ORDER BY rowid"):
+            counts = aggregates['all'] if scope == ALL else aggregates['users'].setdefault(scope, empty_counts())
+            counts[kind][key] = n
+    return aggregates
+
+
+def load(path=AGGREGATES_PATH):
+    """Computes the counters from the whole history if they haven't been yet."""
+    with connect(path) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        fill(connection)
+
+
+def record(date, time, username, delta, path=AGGREGATES_PATH):
+    """Updates the stored aggregates for a booking (delta 1) or cancellation (delta -1) that has already been
+    saved, touching only the counters of its day and time."""
+    record_many([(date, time, username, delta)], path)
+
+
+def record_many(changes, path=AGGREGATES_PATH):
+    """Updates the stored aggregates for several (date, time, username, delta) changes that have already been
+    saved, in a single transaction touching only their own counters. Counters that reach zero are dropped."""
+    rows = [(scope, kind, key, delta) for date, time, username, delta in changes
+            for kind, key in count_keys(date, time) for scope in (ALL, username)]
+    with connect(path) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        if not connection.execute("PRAGMA user_version").fetchone()[0]:
+            # The history already contains these changes, so computing the aggregates from it is enough.
+            fill(connection)
+            return
+        connection.executemany("INSERT INTO counts (scope, kind, key, n) VALUES (?, ?, ?, ?) "
+                               "ON CONFLICT (scope, kind, key) DO UPDATE SET n = n + excluded.n", rows)
+        connection.executemany("DELETE FROM counts WHERE scope = ? AND kind = ? AND key = ? AND n <= 0",
+                               [row[:3] for row in rows])
+
+
+def invalidate(path=AGGREGATES_PATH):
+    """Drops the stored aggregates so they are computed again from the history on the next load."""
+    with connect(path) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("DELETE FROM counts")
+        connection.execute("PRAGMA user_version = 0")
+
+
+@metrics.timed("report_aggregates")
+def most_booked(username=None, limit=5, path=AGGREGATES_PATH):
+    """Gets the most booked days of the week, times of the day and weekly times, for all users or the given one."""
+    with connect(path) as connection:
+        if not connection.execute("PRAGMA user_version").fetchone()[0]:
+            connection.execute("BEGIN IMMEDIATE")
+            fill(connection)
+        top = [connection.execute("SELECT key, n FROM counts WHERE scope = ? AND kind = ? ORDER BY n DESC, rowid "
+                                  "LIMIT ?", (ALL if username is None else username, kind, limit)).fetchall()
+               for kind in KINDS]
+    days, times, weekly_times = top
+    return days, times, [(tuple(key.split()), n) for key, n in weekly_times]
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+import aggregates
+import cache
+import report
+import storage
+
+
+class TestAggregatesModule(unittest.TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "report_aggregates.db")
+        self.backend = storage.JsonBackend(os.path.join(self.directory.name, "reservations.json"))
+        storage.set_backend(self.backend)
+        for date, time, slot, username in [("2024-08-04", "10:00", 1, "user1"), ("2024-08-04", "10:00", 2, "user2"),
+                                           ("2024-08-04", "11:00", 1, "user1"), ("2024-08-05", "10:00", 1, "user1")]:
+            self.backend.add(date, time, slot, username)
+
+    def tearDown(self):
+        storage.set_backend(None)
+        self.directory.cleanup()
+
+    def test_matches_full_report(self):
+        reservations = self.backend.load()
+        self.assertEqual(aggregates.most_booked(path=self.path), report.get_most_booked_days_and_times(reservations))
+        self.assertEqual(aggregates.most_booked("user1", path=self.path),
+                         report.get_most_booked_days_and_times(reservations, "user1"))
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_record_updates_counts(self):
+        aggregates.load(self.path)
+        self.backend.add("2024-08-05", "10:00", 2, "user2")
+        aggregates.record("2024-08-05", "10:00", "user2", 1, path=self.path)
+        self.backend.remove("2024-08-04 11:00", 1, "user1")
+        aggregates.record("2024-08-04", "11:00", "user1", -1, path=self.path)
+
+        days, times, weekly_times = aggregates.most_booked(path=self.path)
+        self.assertEqual(days, [("Sunday", 2), ("Monday", 2)])
+        self.assertEqual(times, [("10:00", 4)])
+        self.assertEqual(weekly_times, [(("Sunday", "10:00"), 2), (("Monday", "10:00"), 2)])
+        self.assertEqual(aggregates.most_booked("user2", path=self.path)[0], [("Sunday", 1), ("Monday", 1)])
+        self.assertEqual(aggregates.read(self.path), aggregates.compute(self.backend.load()))
+
+    def test_record_without_stored_aggregates(self):
+        self.backend.add("2024-08-05", "10:00", 2, "user2")
+        aggregates.record("2024-08-05", "10:00", "user2", 1, path=self.path)
+        self.assertEqual(aggregates.read(self.path), aggregates.compute(self.backend.load()))
+
+    def test_record_many(self):
+        aggregates.load(self.path)
+        self.backend.add("2024-08-11", "10:00", 1, "user2")
+        self.backend.add("2024-08-18", "10:00", 1, "user2")
+        aggregates.record_many([("2024-08-11", "10:00", "user2", 1), ("2024-08-18", "10:00", "user2", 1)],
+                               path=self.path)
+        self.assertEqual(aggregates.read(self.path), aggregates.compute(self.backend.load()))
+
+    def test_invalidate(self):
+        aggregates.load(self.path)
+        self.backend.save({})
+        aggregates.invalidate(self.path)
+        self.assertIsNone(aggregates.read(self.path))
+        self.assertEqual(aggregates.most_booked(path=self.path), ([], [], []))
+
+    def test_record_touches_only_its_counters(self):
+        aggregates.load(self.path)
+        with aggregates.connect(self.path) as connection:
+            connection.execute("UPDATE counts SET n = 100 WHERE scope = 'user2'")
+        self.backend.add("2024-08-05", "11:00", 2, "user1")
+        aggregates.record("2024-08-05", "11:00", "user1", 1, path=self.path)
+        stored = aggregates.read(self.path)
+        self.assertEqual(stored['users']['user2']['days'], {"Sunday": 100})
+        self.assertEqual(stored['users']['user1'], aggregates.compute(self.backend.load())['users']['user1'])
+
+    def test_unknown_user(self):
+        self.assertEqual(aggregates.most_booked("nobody", path=self.path), ([], [], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+"""HTTP/JSON API over the reservation core, for web and mobile front ends.
+
+Run from the repository root:
+
+    python -m api [--host 127.0.0.1] [--port 8080]
+
+Endpoints (the ones marked * need an "Authorization: Bearer <token>" header from /login):
+
+    POST   /login          {"username", "password"} -> {"token"}
+    GET    /availability   ?start=YYYY-MM-DD&end=YYYY-MM-DD -> free (date, time, slot) triples
+    POST   /reservations * {"date", "time", "slot"} -> books the slot
+    DELETE /reservations * ?date=&time=&slot= -> cancels the reservation, giving the slot to the first user waiting
+    GET    /reservations * ?past=true|false -> the user's reservations
+    GET    /reports        ?mine=true * -> most booked days, times and weekly times
+"""
+import argparse
+import asyncio
+import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import aggregates
+import auth
+import bookings
+import resources
+import user_store
+from availability import free_slots
+from occupancy import IndexedReservations
+from session import SessionStore
+from storage import get_reservation_key
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    """Ends a request with the given status and error message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    """A parsed HTTP request."""
+
+    def __init__(self, method, target, headers, body):
+        self.method = method
+        url = urlsplit(target)
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body or b"{}")
+        except ValueError:
+            raise HttpError(400, "The body is not valid JSON.") from None
+
+
+def booking_fields(fields):
+    """Returns the date, time and slot of a request, checked against the resource's slots and open times and
+    against the current time, as times that have passed can't be booked or cancelled."""
+    try:
+        date = datetime.date.fromisoformat(fields['date']).isoformat()
+        time, slot = fields['time'], int(fields['slot'])
+    except (KeyError, TypeError, ValueError):
+        raise HttpError(400, "A date, time and slot are required.") from None
+    resource = resources.get_resource()
+    if not resource.has_time(time) or not resource.has_slot(slot):
+        raise HttpError(400, "No such time or slot.")
+    if not resource.is_open(date, time):
+        raise HttpError(400, "Closed at that time.")
+    if get_reservation_key(date, time) <= f"{datetime.datetime.now():%Y-%m-%d %H:%M}":
+        raise HttpError(400, "That time has already passed.")
+    return date, time, slot
+
+
+class ReservationServer:
+    """Serves the API from reservations held in memory. Reads never touch the storage files; bookings and
+    cancellations are queued to a single writer that stores them one at a time through the storage backend and then
+    applies them to the in-memory reservations, so requests never race each other for a slot."""
+
+    def __init__(self, sessions=None, session_minutes=60):
+        self.sessions = sessions or SessionStore(ttl=session_minutes * 60)
+        self.reservations = IndexedReservations(bookings.load_reservations())
+        self.writes = asyncio.Queue()
+        self.write_executor = ThreadPoolExecutor(max_workers=1)
+        self.writer_task = None
+        self.routes = {
+            ("POST", "/login"): self.login,
+            ("GET", "/availability"): self.availability,
+            ("POST", "/reservations"): self.book,
+            ("DELETE", "/reservations"): self.cancel,
+            ("GET", "/reservations"): self.my_reservations,
+            ("GET", "/reports"): self.reports,
+        }
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Starts the writer and listens for connections, returns the asyncio server."""
+        self.writer_task = asyncio.create_task(self.writer())
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def stop(self):
+        if self.writer_task is not None:
+            self.writer_task.cancel()
+        self.write_executor.shutdown()
+
+    async def writer(self):
+        """Runs the queued writes one after another, storing each before it is applied in memory."""
+        loop = asyncio.get_running_loop()
+        while True:
+            operation, args, result = await self.writes.get()
+            try:
+                stored = await loop.run_in_executor(self.write_executor, operation, *args)
+                result.set_result(stored)
+            except Exception as error:
+                result.set_exception(error)
+
+    async def write(self, operation, *args):
+        """Queues a write for the writer and waits for its result."""
+        result = asyncio.get_running_loop().create_future()
+        await self.writes.put((operation, args, result))
+        return await result
+
+    def authenticate(self, request):
+        """Returns the username of the request's bearer token."""
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        username = self.sessions.validate(token) if scheme.lower() == "bearer" else None
+        if username is None:
+            raise HttpError(401, "Log in first.")
+        return username
+
+    async def login(self, request):
+        # The user store and the aggregates are read and written in the default executor, so a slow disk or a lock
+        # held by the writer never stalls the event loop.
+        loop = asyncio.get_running_loop()
+        fields = request.json()
+        username, password = fields.get('username'), fields.get('password')
+        store = user_store.get_user_store()
+        stored = await loop.run_in_executor(None, store.get, username) if isinstance(username, str) else None
+        valid, new_hash = False, None
+        if stored is not None and isinstance(password, str):
+            valid, new_hash = await asyncio.wrap_future(auth.get_service().verify(password, stored.password))
+        if not valid:
+            raise HttpError(401, "Invalid username or password.")
+        if new_hash:
+            await loop.run_in_executor(None, store.set_password, username, new_hash)
+        return 200, {'token': self.sessions.create_token(username)}
+
+    async def availability(self, request):
+        try:
+            start = datetime.date.fromisoformat(request.query['start'])
+            end = datetime.date.fromisoformat(request.query.get('end', request.query['start']))
+        except (KeyError, ValueError):
+            raise HttpError(400, "A start date is required.") from None
+        free = free_slots(start, end, request.query.get('username'), reservations=self.reservations)
+        return 200, [{'date': date, 'time': time, 'slot': slot} for date, time, slot in free]
+
+    async def book(self, request):
+        username = self.authenticate(request)
+        date, time, slot = booking_fields(request.json())
+        if not await self.write(bookings.book, date, time, slot, username):
+            raise HttpError(409, "This slot has already been reserved.")
+        self.reservations.book(get_reservation_key(date, time), slot, username)
+        return 201, {'date': date, 'time': time, 'slot': slot}
+
+    async def cancel(self, request):
+        username = self.authenticate(request)
+        date, time, slot = booking_fields(request.query)
+        key = get_reservation_key(date, time)
+        removed, promoted = await self.write(bookings.cancel, key, slot, username)
+        if not removed:
+            raise HttpError(404, "Reservation not found.")
+        self.reservations.release(key, slot, username)
+        if promoted is not None:
+            self.reservations.book(key, slot, promoted)
+        return 200, {'date': date, 'time': time, 'slot': slot, 'promoted': promoted}
+
+    async def my_reservations(self, request):
+        username = self.authenticate(request)
+        past = {'true': True, 'false': False}.get(request.query.get('past'))
+        user_reservations = self.reservations.user_reservations(username, past, datetime.datetime.now())
+        return 200, [{'date': f"{when:%Y-%m-%d}", 'time': f"{when:%H:%M}", 'slot': slot}
+                     for when, slot in user_reservations]
+
+    async def reports(self, request):
+        username = self.authenticate(request) if request.query.get('mine') == "true" else None
+        days, times, weekly_times = await asyncio.get_running_loop().run_in_executor(None, aggregates.most_booked,
+                                                                                   username)
+        return 200, {'days': days, 'times': times,
+                     'weekly_times': [[f"{day} {time}", count] for (day, time), count in weekly_times]}
+
+    async def dispatch(self, request):
+        """Runs the handler of the request's route, returns the status and JSON payload of the response."""
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self.routes):
+                return 405, {'error': "Method not allowed."}
+            return 404, {'error': "Not found."}
+        try:
+            return await handler(request)
+        except HttpError as error:
+            return error.status, {'error': error.message}
+
+    async def handle_connection(self, reader, writer):
+        """Serves the requests of one connection, keeping it open between them unless the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                try:
+                    status, payload = await self.dispatch(Request(method, target, headers, body))
+                except Exception:
+                    status, payload = 500, {'error': "Internal server error."}
+                data = json.dumps(payload).encode('utf-8')
+                head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                        f"Content-Length: {len(data)}\r\n")
+                if not keep_alive:
+                    head += "Connection: close\r\n"
+                writer.write(head.encode('latin-1') + b"\r\n" + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port):
+    server = ReservationServer()
+    listener = await server.start(host, port)
+    print(f"Serving on http://{host}:{port}", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="api.py", description="Serve the reservation API over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import bcrypt
+
+import cache
+import storage
+from api import ReservationServer
+from auth import AuthService
+from records import User
+from resources import Resource
+from session import SessionStore
+from storage import JsonBackend
+from user_store import SqliteUserStore
+
+TOMORROW = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+
+
+class TestReservationServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.backend = JsonBackend(os.path.join(directory.name, "reservations.json"))
+        self.backend.add("2020-01-01", "09:00", 1, "user1")
+        self.users = users = SqliteUserStore(os.path.join(directory.name, "users.db"), import_from=None)
+        for username in ("user1", "user2"):
+            users.add(User(username, bcrypt.hashpw(b"Password123", bcrypt.gensalt(4)).decode('utf-8'), "Test", "User"))
+        for target, value in (("api.user_store.get_user_store", users),
+                              ("api.auth.get_service", AuthService(rounds=4, workers=0)),
+                              ("api.aggregates.record", None)):
+            patcher = patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        sessions = SessionStore(os.path.join(directory.name, "sessions.json"),
+                                os.path.join(directory.name, "session.key"), ttl=600)
+        storage.set_backend(self.backend)
+        self.addCleanup(storage.set_backend, None)
+        self.server = ReservationServer(sessions)
+        self.listener = await self.server.start("127.0.0.1", 0)
+        self.port = self.listener.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.listener.close()
+        await self.listener.wait_closed()
+        await self.server.stop()
+
+    async def request(self, method, target, body=None, token=None, connection=None):
+        """Sends one request and returns the status and decoded JSON payload of the response."""
+        reader, writer = connection or await asyncio.open_connection("127.0.0.1", self.port)
+        data = json.dumps(body).encode('utf-8') if body is not None else b""
+        head = f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n"
+        if token:
+            head += f"Authorization: Bearer {token}\r\n"
+        if connection is None:
+            head += "Connection: close\r\n"
+        writer.write(head.encode('latin-1') + b"\r\n" + data)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) != b"\r\n":
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        payload = json.loads(await reader.readexactly(int(headers['content-length'])))
+        if connection is None:
+            writer.close()
+        return status, payload
+
+    async def log_in(self, username="user1"):
+        status, payload = await self.request("POST", "/login", {'username': username, 'password': "Password123"})
+        self.assertEqual(status, 200)
+        return payload['token']
+
+    async def test_login(self):
+        self.assertTrue(await self.log_in())
+        status, payload = await self.request("POST", "/login", {'username': "user1", 'password': "wrong"})
+        self.assertEqual(status, 401)
+        self.assertEqual((await self.request("POST", "/login", {'username': "nobody", 'password': "x"}))[0], 401)
+
+    async def test_availability(self):
+        status, payload = await self.request("GET", f"/availability?start={TOMORROW}")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(payload), 8 * 3)
+        self.assertEqual(payload[0], {'date': TOMORROW, 'time': "09:00", 'slot': 1})
+        self.assertEqual((await self.request("GET", "/availability"))[0], 400)
+
+    async def test_book_and_cancel(self):
+        token = await self.log_in()
+        booking = {'date': TOMORROW, 'time': "11:00", 'slot': 2}
+        self.assertEqual((await self.request("POST", "/reservations", booking, token))[0], 201)
+        self.assertEqual((await self.request("POST", "/reservations", booking, token))[0], 409)
+        self.assertEqual(self.backend.load()[f"{TOMORROW} 11:00"], [{'slot': 2, 'username': "user1"}])
+
+        status, payload = await self.request("GET", "/reservations?past=false", token=token)
+        self.assertEqual(payload, [booking])
+        status, payload = await self.request("GET", "/availability?start=" + TOMORROW)
+        self.assertNotIn(booking, payload)
+
+        target = f"/reservations?date={TOMORROW}&time=11:00&slot=2"
+        self.assertEqual((await self.request("DELETE", target, token=token))[0], 200)
+        self.assertEqual((await self.request("DELETE", target, token=token))[0], 404)
+        self.assertEqual(self.backend.load(), {"2020-01-01 09:00": [{'slot': 1, 'username': "user1"}]})
+        self.assertEqual((await self.request("GET", "/reservations?past=false", token=token))[1], [])
+
+    async def test_cancel_promotes_waiting_user(self):
+        token = await self.log_in()
+        booking = {'date': TOMORROW, 'time': "15:00", 'slot': 1}
+        await self.request("POST", "/reservations", booking, token)
+        self.backend.join_waitlist(f"{TOMORROW} 15:00", "user2")
+        status, payload = await self.request("DELETE", f"/reservations?date={TOMORROW}&time=15:00&slot=1", token=token)
+        self.assertEqual((status, payload['promoted']), (200, "user2"))
+        status, payload = await self.request("GET", "/reservations?past=false", token=await self.log_in("user2"))
+        self.assertEqual(payload, [booking])
+
+    async def test_cancel_last_booking_loaded_at_start(self):
+        self.backend.add(TOMORROW, "13:00", 1, "user1")
+        self.listener.close()
+        await self.listener.wait_closed()
+        await self.server.stop()
+        cache.clear()
+        self.server = ReservationServer(self.server.sessions)
+        self.listener = await self.server.start("127.0.0.1", 0)
+        self.port = self.listener.sockets[0].getsockname()[1]
+        target = f"/reservations?date={TOMORROW}&time=13:00&slot=1"
+        self.assertEqual((await self.request("DELETE", target, token=await self.log_in()))[0], 200)
+        self.assertNotIn(f"{TOMORROW} 13:00", self.backend.load())
+
+    async def test_concurrent_bookings_of_one_slot(self):
+        tokens = [await self.log_in("user1"), await self.log_in("user2")] * 5
+        booking = {'date': TOMORROW, 'time': "13:00", 'slot': 1}
+        results = await asyncio.gather(*(self.request("POST", "/reservations", booking, token) for token in tokens))
+        self.assertEqual(sorted(status for status, _ in results), [201] + [409] * 9)
+        self.assertEqual(len(self.backend.load()[f"{TOMORROW} 13:00"]), 1)
+
+    async def test_invalid_booking(self):
+        token = await self.log_in()
+        for booking in ({'date': TOMORROW, 'time': "10:00", 'slot': 1}, {'date': TOMORROW, 'time': "09:00", 'slot': 4},
+                        {'date': "tomorrow", 'time': "09:00", 'slot': 1}, {}):
+            with self.subTest(booking=booking):
+                self.assertEqual((await self.request("POST", "/reservations", booking, token))[0], 400)
+
+    async def test_past_time(self):
+        token = await self.log_in()
+        booking = {'date': "2020-01-01", 'time': "11:00", 'slot': 1}
+        status, payload = await self.request("POST", "/reservations", booking, token)
+        self.assertEqual((status, payload), (400, {'error': "That time has already passed."}))
+        status, payload = await self.request("DELETE", "/reservations?date=2020-01-01&time=09:00&slot=1", token=token)
+        self.assertEqual((status, payload), (400, {'error': "That time has already passed."}))
+        self.assertEqual(self.backend.load(), {"2020-01-01 09:00": [{'slot': 1, 'username': "user1"}]})
+
+    async def test_closed_date(self):
+        token = await self.log_in()
+        with patch("api.resources.get_resource", return_value=Resource(closed_dates={TOMORROW})):
+            status, payload = await self.request("POST", "/reservations",
+                                                 {'date': TOMORROW, 'time': "09:00", 'slot': 1}, token)
+        self.assertEqual((status, payload), (400, {'error': "Closed at that time."}))
+
+    async def test_requires_token(self):
+        self.assertEqual((await self.request("GET", "/reservations"))[0], 401)
+        self.assertEqual((await self.request("GET", "/reservations", token="forged.token"))[0], 401)
+        self.assertEqual((await self.request("GET", "/reports?mine=true"))[0], 401)
+
+    @patch("api.aggregates.most_booked", return_value=([("Monday", 2)], [("09:00", 2)], [(("Monday", "09:00"), 2)]))
+    async def test_reports(self, mock_most_booked):
+        status, payload = await self.request("GET", "/reports")
+        self.assertEqual(status, 200)
+        self.assertEqual(payload, {'days': [["Monday", 2]], 'times': [["09:00", 2]],
+                                   'weekly_times': [["Monday 09:00", 2]]})
+        await self.request("GET", "/reports?mine=true", token=await self.log_in())
+        mock_most_booked.assert_called_with("user1")
+
+    async def test_blocking_calls_run_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = []
+
+        def most_booked(username):
+            threads.append(threading.get_ident())
+            return [], [], []
+
+        with patch("api.aggregates.most_booked", side_effect=most_booked), \
+                patch.object(self.users, "get", side_effect=lambda username: threads.append(threading.get_ident())):
+            self.assertEqual((await self.request("GET", "/reports"))[0], 200)
+            await self.request("POST", "/login", {'username': "user1", 'password': "Password123"})
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_unknown_route(self):
+        self.assertEqual((await self.request("GET", "/nothing"))[0], 404)
+        self.assertEqual((await self.request("PUT", "/reservations"))[0], 405)
+
+    async def test_keep_alive_serves_from_memory(self):
+        connection = await asyncio.open_connection("127.0.0.1", self.port)
+        with patch.object(self.backend, "load", side_effect=AssertionError("read the file")):
+            for _ in range(3):
+                self.assertEqual((await self.request("GET", f"/availability?start={TOMORROW}",
+                                                     connection=connection))[0], 200)
+        connection[1].close()
+
+
+if __name__ == '__main__':
+    unittest.main()
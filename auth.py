@@ -0,0 +1,100 @@
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import bcrypt
+
+import metrics
+
+ROUNDS_ENV = "RESERVATION_BCRYPT_ROUNDS"
+WORKERS_ENV = "RESERVATION_AUTH_WORKERS"
+DEFAULT_ROUNDS = 12
+
+
+def hash_password(password, rounds):
+    """Hashes the password with bcrypt at the given cost factor."""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def hash_rounds(hashed):
+    """Returns the cost factor a bcrypt hash was made with."""
+    return int(hashed.split('$')[2])
+
+
+def verify_password(password, hashed, rounds):
+    """Checks the password against its hash, and hashes it again if the hash was made with another cost factor.
+    Returns whether it matched and the new hash, None if there is none."""
+    if not bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8')):
+        return False, None
+    if hash_rounds(hashed) != rounds:
+        return True, hash_password(password, rounds)
+    return True, None
+
+
+class AuthService:
+    """Runs the bcrypt hashing in a pool of worker processes so it uses several cores and doesn't hold up the
+    calling thread. With zero workers it runs in the calling thread instead."""
+
+    def __init__(self, rounds=None, workers=None):
+        self.rounds = rounds if rounds is not None else int(os.environ.get(ROUNDS_ENV, DEFAULT_ROUNDS))
+        self.workers = workers if workers is not None else int(os.environ.get(WORKERS_ENV, os.cpu_count() or 1))
+        self.pool = None
+
+    def submit(self, function, *args):
+        """Runs the function in the pool, returns a future of its result. With metrics on, the time until the
+        result is ready, waiting for a worker included, is recorded as bcrypt_seconds."""
+        if metrics.registry is not None:
+            start = time.perf_counter()
+            future = self.run(function, *args)
+            future.add_done_callback(lambda _: metrics.observe("bcrypt_seconds", time.perf_counter() - start))
+            return future
+        return self.run(function, *args)
+
+    def run(self, function, *args):
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(function(*args))
+            except Exception as error:
+                future.set_exception(error)
+            return future
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self.pool.submit(function, *args)
+
+    def hash(self, password):
+        """Returns a future of the password's hash at the configured cost factor."""
+        return self.submit(hash_password, password, self.rounds)
+
+    def verify(self, password, hashed):
+        """Returns a future of whether the password matches the hash, and of the new hash to store if the hash
+        was made with another cost factor than the configured one."""
+        return self.submit(verify_password, password, hashed, self.rounds)
+
+    def needs_rehash(self, hashed):
+        """Checks if the hash was made with another cost factor than the configured one."""
+        return hash_rounds(hashed) != self.rounds
+
+    def shutdown(self):
+        """Stops the worker processes."""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+_service = None
+
+
+def get_service():
+    """Gets the authentication service, configured by the RESERVATION_BCRYPT_ROUNDS and RESERVATION_AUTH_WORKERS
+    environment variables."""
+    global _service
+    if _service is None:
+        _service = AuthService()
+    return _service
+
+
+def set_service(service):
+    """Replaces the authentication service in use."""
+    global _service
+    _service = service
@@ -0,0 +1,55 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import bcrypt
+
+import auth
+from auth import AuthService
+
+
+class TestAuthModule(unittest.TestCase):
+
+    def test_hash_and_verify_in_thread(self):
+        service = AuthService(rounds=4, workers=0)
+        hashed = service.hash("Password123").result()
+        self.assertEqual(auth.hash_rounds(hashed), 4)
+        self.assertEqual(service.verify("Password123", hashed).result(), (True, None))
+        self.assertEqual(service.verify("Wrong123", hashed).result(), (False, None))
+
+    def test_hash_and_verify_in_workers(self):
+        service = AuthService(rounds=4, workers=2)
+        try:
+            hashes = [service.hash(f"Password{i}") for i in range(4)]
+            checks = [service.verify(f"Password{i}", future.result()) for i, future in enumerate(hashes)]
+            self.assertEqual([future.result() for future in checks], [(True, None)] * 4)
+        finally:
+            service.shutdown()
+
+    def test_rehash_when_cost_changes(self):
+        hashed = bcrypt.hashpw(b"Password123", bcrypt.gensalt(4)).decode('utf-8')
+        service = AuthService(rounds=5, workers=0)
+        self.assertTrue(service.needs_rehash(hashed))
+        valid, new_hash = service.verify("Password123", hashed).result()
+        self.assertTrue(valid)
+        self.assertEqual(auth.hash_rounds(new_hash), 5)
+        self.assertFalse(service.needs_rehash(new_hash))
+        self.assertTrue(bcrypt.checkpw(b"Password123", new_hash.encode('utf-8')))
+
+    def test_errors_reach_the_caller(self):
+        with self.assertRaises(ValueError):
+            AuthService(rounds=4, workers=0).verify("Password123", "not a hash").result()
+
+    @patch.dict(os.environ, {auth.ROUNDS_ENV: "6", auth.WORKERS_ENV: "3"})
+    def test_configuration(self):
+        service = AuthService()
+        self.assertEqual((service.rounds, service.workers), (6, 3))
+        auth.set_service(None)
+        try:
+            self.assertEqual(auth.get_service().rounds, 6)
+        finally:
+            auth.set_service(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
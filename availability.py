@@ -0,0 +1,102 @@
+import datetime
+
+import resources
+import storage
+from occupancy import full_mask, taken_mask
+from storage import get_reservation_key
+
+
+def as_date(value):
+    """Accepts a datetime.date or an ISO formatted date string and returns the date."""
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def free_capacity(start_date, end_date, username=None, now=None, reservations=None, resource=None):
+    """Returns the (date, time, free slot mask) of every time between the start and end dates (inclusive) that
+    still has a free slot, in chronological order. Bit n of the mask is set when slot n is free. Dates can be
+    datetime.date objects or ISO strings. Only the open times of the resource are considered, leaving out the ones
+    that have already passed and the ones at which the given user already holds a slot. The reservations of the
+    range are loaded once unless they are passed in."""
+    start_date, end_date = as_date(start_date), as_date(end_date)
+    now = now or datetime.datetime.now()
+    resource = resource or resources.get_resource()
+    if reservations is None:
+        reservations = storage.get_backend().load(start_date.isoformat(), end_date.isoformat())
+    full = full_mask(resource.slot_count)
+    today, current_time = now.date(), now.strftime("%H:%M:%S")
+    free = []
+
+    for ordinal in range(max(start_date, today).toordinal(), end_date.toordinal() + 1):
+        date = datetime.date.fromordinal(ordinal)
+        iso_date = date.isoformat()
+        for time in resource.times_on(date):
+            if date == today and time + ":00" <= current_time:
+                continue
+            key = get_reservation_key(iso_date, time)
+            free_mask = full & ~taken_mask(reservations, key)
+            if not free_mask:
+                continue
+            if username is not None and any(res['username'] == username for res in reservations.get(key, [])):
+                continue
+            free.append((iso_date, time, free_mask))
+    return free
+
+
+def free_slots(start_date, end_date, username=None, now=None, reservations=None, resource=None):
+    """Returns the (date, time, slot) triples that are still free between the start and end dates (inclusive), in
+    chronological order, see free_capacity."""
+    return [(date, time, slot)
+            for date, time, free_mask in free_capacity(start_date, end_date, username, now, reservations, resource)
+            for slot in mask_slots(free_mask)]
+
+
+def free_times(start_date, end_date, username=None, now=None, reservations=None, resource=None):
+    """Returns the (date, time) pairs between the start and end dates that still have at least one free slot."""
+    return [(date, time) for date, time, _ in free_capacity(start_date, end_date, username, now, reservations,
+                                                            resource)]
+
+
+def full_times(start_date, end_date, username=None, now=None, reservations=None, resource=None):
+    """Returns the (date, time) pairs between the start and end dates whose slots are all taken, the ones users can
+    join the waitlist of. Passed times and the ones at which the given user already holds a slot are left out."""
+    start_date, end_date = as_date(start_date), as_date(end_date)
+    now = now or datetime.datetime.now()
+    resource = resource or resources.get_resource()
+    if reservations is None:
+        reservations = storage.get_backend().load(start_date.isoformat(), end_date.isoformat())
+    full = full_mask(resource.slot_count)
+    today, current_time = now.date(), now.strftime("%H:%M:%S")
+    taken = []
+
+    for ordinal in range(max(start_date, today).toordinal(), end_date.toordinal() + 1):
+        date = datetime.date.fromordinal(ordinal)
+        iso_date = date.isoformat()
+        for time in resource.times_on(date):
+            if date == today and time + ":00" <= current_time:
+                continue
+            key = get_reservation_key(iso_date, time)
+            if taken_mask(reservations, key) & full != full:
+                continue
+            if username is not None and any(res['username'] == username for res in reservations.get(key, [])):
+                continue
+            taken.append((iso_date, time))
+    return taken
+
+
+def free_counts(start_date, end_date, now=None, reservations=None, resource=None):
+    """Returns how many slots are still free at each open time between the start and end dates, as
+    {(date, time): count}."""
+    return {(date, time): free_mask.bit_count()
+            for date, time, free_mask in free_capacity(start_date, end_date, None, now, reservations, resource)}
+
+
+def mask_slots(mask):
+    """Returns the slot numbers whose bit is set in the mask, in increasing order."""
+    slots = []
+    while mask:
+        low = mask & -mask
+        slots.append(low.bit_length() - 1)
+        mask ^= low
+    return slots
@@ -0,0 +1,82 @@
+import datetime
+import unittest
+from unittest.mock import patch
+
+import availability
+from occupancy import IndexedReservations
+from resources import Resource, time_grid
+
+
+class TestAvailabilityModule(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime(2023, 1, 1, 12, 0)
+        self.reservations = IndexedReservations({
+            "2023-01-02 09:00": [{"slot": 1, "username": "user1"}, {"slot": 2, "username": "user2"},
+                                 {"slot": 3, "username": "user3"}],
+            "2023-01-02 11:00": [{"slot": 2, "username": "user1"}],
+        })
+
+    def test_free_slots(self):
+        free = availability.free_slots("2023-01-02", "2023-01-02", now=self.now, reservations=self.reservations)
+        self.assertEqual(free[:3], [("2023-01-02", "11:00", 1), ("2023-01-02", "11:00", 3),
+                                    ("2023-01-02", "13:00", 1)])
+        self.assertEqual(len(free), 2 + 6 * 3)
+
+    def test_skips_past_days_and_times(self):
+        free = availability.free_slots(datetime.date(2022, 12, 30), datetime.date(2023, 1, 1), now=self.now,
+                                       reservations={})
+        self.assertEqual({date for date, _, _ in free}, {"2023-01-01"})
+        self.assertEqual([time for _, time, slot in free if slot == 1], ["13:00", "15:00", "17:00", "19:00", "21:00",
+                                                                         "23:00"])
+
+    def test_skips_times_held_by_user(self):
+        free = availability.free_slots("2023-01-02", "2023-01-02", username="user1", now=self.now,
+                                       reservations=self.reservations)
+        self.assertNotIn("11:00", {time for _, time, _ in free})
+
+    def test_free_times(self):
+        times = availability.free_times("2023-01-02", "2023-01-03", now=self.now, reservations=self.reservations)
+        self.assertEqual(times[0], ("2023-01-02", "11:00"))
+        self.assertEqual(len(times), 7 + 8)
+
+    def test_full_times(self):
+        self.assertEqual(availability.full_times("2023-01-01", "2023-01-03", now=self.now,
+                                                 reservations=self.reservations), [("2023-01-02", "09:00")])
+        self.assertEqual(availability.full_times("2023-01-02", "2023-01-02", username="user2", now=self.now,
+                                                 reservations=self.reservations), [])
+
+    def test_long_range(self):
+        free = availability.free_slots("2023-01-01", "2023-06-30", now=self.now, reservations=self.reservations)
+        self.assertEqual(free[-1], ("2023-06-30", "23:00", 3))
+        self.assertEqual(len({date for date, _, _ in free}), 181)
+
+    def test_custom_resource(self):
+        courts = Resource(slot_count=40, times=time_grid("06:00", "23:00", 15),
+                          opening_hours={'Monday': ("10:00", "11:00"), 'Tuesday': ("06:00", "23:00")},
+                          closed_dates={"2023-01-03"})
+        reservations = IndexedReservations({"2023-01-02 10:15": [{"slot": n, "username": "u"} for n in range(1, 40)]})
+        counts = availability.free_counts("2023-01-02", "2023-01-10", now=self.now, reservations=reservations,
+                                          resource=courts)
+        self.assertEqual(counts[("2023-01-02", "10:00")], 40)
+        self.assertEqual(counts[("2023-01-02", "10:15")], 1)
+        self.assertEqual({date for date, _ in counts}, {"2023-01-02", "2023-01-09", "2023-01-10"})
+        self.assertEqual(len(counts), 4 + 4 + 68)
+        free = availability.free_slots("2023-01-02", "2023-01-02", now=self.now, reservations=reservations,
+                                       resource=courts)
+        self.assertIn(("2023-01-02", "10:15", 40), free)
+        self.assertEqual(len(free), 40 * 3 + 1)
+
+    def test_mask_slots(self):
+        self.assertEqual(availability.mask_slots(0b1010110), [1, 2, 4, 6])
+        self.assertEqual(availability.mask_slots(0), [])
+
+    @patch('availability.storage.get_backend')
+    def test_loads_range_once(self, mock_get_backend):
+        mock_get_backend.return_value.load.return_value = IndexedReservations()
+        availability.free_slots("2023-01-02", "2023-03-02", now=self.now)
+        mock_get_backend.return_value.load.assert_called_once_with("2023-01-02", "2023-03-02")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Load-tests the HTTP API and reports requests per second and latency percentiles.
+
+Run from the repository root. Without --port a server is started on empty data in a temporary directory:
+
+    python -m benchmarks.api_load [--connections 50] [--requests 20000] [--book-ratio 0.1]
+    python -m benchmarks.api_load --port 8080 --username alice --password secret123
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import bcrypt
+
+import resources
+from records import User
+from user_store import SqliteUserStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def send(connection, method, target, body=None, token=None):
+    """Sends one request on a kept-alive connection and returns the response status and payload."""
+    reader, writer = connection
+    data = json.dumps(body).encode('utf-8') if body is not None else b""
+    head = f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n"
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    writer.write(head.encode('latin-1') + b"\r\n" + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) != b"\r\n":
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port, token, requests, book_ratio, rng, latencies):
+    """Sends its share of the requests on one connection: availability lookups and a share of bookings."""
+    connection = await asyncio.open_connection("127.0.0.1", port)
+    resource = resources.get_resource()
+    today = datetime.date.today()
+    for _ in range(requests):
+        date = (today + datetime.timedelta(days=rng.randint(1, 365))).isoformat()
+        start = time.perf_counter()
+        if rng.random() < book_ratio:
+            booking = {'date': date, 'time': rng.choice(resource.times), 'slot': rng.randint(1, resource.slot_count)}
+            status, _ = await send(connection, "POST", "/reservations", booking, token)
+        else:
+            status, _ = await send(connection, "GET", f"/availability?start={date}")
+        latencies.append(time.perf_counter() - start)
+        if status >= 500:
+            raise RuntimeError(f"The server answered {status}")
+    connection[1].close()
+
+
+async def run(port, username, password, connections, requests, book_ratio):
+    connection = await asyncio.open_connection("127.0.0.1", port)
+    status, payload = await send(connection, "POST", "/login", {'username': username, 'password': password})
+    connection[1].close()
+    if status != 200:
+        raise SystemExit(f"Login failed: {payload}")
+
+    latencies = []
+    rng = random.Random(42)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, payload['token'], requests // connections, book_ratio,
+                                  random.Random(rng.random()), latencies) for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{len(latencies)} requests over {connections} connections in {elapsed:.2f} s")
+    print(f"{'requests per second':<24}{len(latencies) / elapsed:10.0f}")
+    for percentile in (50, 90, 99):
+        print(f"{f'p{percentile} latency':<24}{latencies[len(latencies) * percentile // 100] * 1000:10.2f} ms")
+
+
+def start_server(directory):
+    """Starts an API server on empty data in the directory with one user, returns the process and its port."""
+    users = SqliteUserStore(os.path.join(directory, "users.db"), import_from=None)
+    users.add(User("loadtest", bcrypt.hashpw(b"Password123", bcrypt.gensalt(4)).decode('utf-8'), "Load", "Test"))
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, PYTHONPATH=ROOT, RESERVATION_BCRYPT_ROUNDS="4", RESERVATION_AUTH_WORKERS="0")
+    process = subprocess.Popen([sys.executable, "-m", "api", "--port", str(port)], cwd=directory, env=env,
+                               stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()
+    return process, port
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, help="port of a running server, one is started if not given")
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--password", default="Password123")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--book-ratio", type=float, default=0.1, help="share of the requests that are bookings")
+    args = parser.parse_args(argv)
+
+    if args.port:
+        asyncio.run(run(args.port, args.username, args.password, args.connections, args.requests, args.book_ratio))
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        process, port = start_server(directory)
+        try:
+            asyncio.run(run(port, args.username, args.password, args.connections, args.requests, args.book_ratio))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
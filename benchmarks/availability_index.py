@@ -0,0 +1,58 @@
+"""Compares a cold week of availability read from the reservations JSON document with the same week read from the
+memory-mapped occupancy file, as each new process showing the menus does.
+
+Run from the repository root:
+
+    python -m benchmarks.availability_index [reservations]
+"""
+import datetime
+import os
+import sys
+import tempfile
+
+import availability
+import cache
+import storage
+from benchmarks.generate import generate_bookings, resource_for, user_count
+from benchmarks.report_columnar import timed
+from occupancy_file import OccupancyFile
+
+
+def from_document(backend, resource, start, end, now):
+    """Parses the document again, as a process that hasn't read it yet does."""
+    cache.clear()
+    return availability.free_counts(start, end, now, backend.load(start.isoformat(), end.isoformat()), resource)
+
+
+def from_index(backend, resource, start, end, now):
+    """Maps the occupancy file again, as a process that hasn't read it yet does."""
+    index = OccupancyFile(backend.occupancy_path)
+    index.refresh()
+    counts = availability.free_counts(start, end, now, index, resource)
+    index.close()
+    return counts
+
+
+def main(rows):
+    resource = resource_for(rows)
+    users = user_count(rows)
+    with tempfile.TemporaryDirectory() as directory:
+        backend = storage.JsonBackend(os.path.join(directory, "reservations.json"))
+        backend.add_many(generate_bookings(rows, resource, users))
+        _, build = timed(backend.occupancy, resource)
+        print(f"{rows} reservations, occupancy file of {os.path.getsize(backend.occupancy_path) / 1024:.0f} KiB "
+              f"built in {build * 1000:.1f} ms")
+
+        start = datetime.date.today() + datetime.timedelta(days=1)
+        end = start + datetime.timedelta(days=6)
+        now = datetime.datetime.combine(start, datetime.time())
+        expected, slow = timed(from_document, backend, resource, start, end, now)
+        actual, fast = timed(from_index, backend, resource, start, end, now)
+        print(f"{'JSON document':<24}{slow * 1000:8.1f} ms")
+        print(f"{'occupancy file':<24}{fast * 1000:8.1f} ms  {slow / fast:5.0f}x faster, same counts: "
+              f"{expected == actual}")
+        backend.occupancy_file.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
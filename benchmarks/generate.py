@@ -0,0 +1,75 @@
+"""Seeded generator of synthetic users and reservations for the benchmarks, from thousands to millions of rows.
+
+Run from the repository root to write a data set to a folder:
+
+    python -m benchmarks.generate [rows] [folder] [--seed N]
+"""
+import argparse
+import datetime
+import math
+import os
+import random
+
+import transfer
+from records import User
+from resources import DEFAULT_SLOT_COUNT, DEFAULT_TIMES, Resource
+
+FILL = 0.6
+HISTORY_DAYS = 10 * 365
+
+
+def user_count(rows):
+    """Returns how many users a data set with the given number of reservations has, about 50 reservations each."""
+    return max(100, rows // 50)
+
+
+def resource_for(rows):
+    """Returns the resource of a data set: the default grid, with more slots when the rows would otherwise spread
+    over more than ten years of history."""
+    slots = max(DEFAULT_SLOT_COUNT, math.ceil(rows / (len(DEFAULT_TIMES) * HISTORY_DAYS * FILL)))
+    return Resource(name="benchmark", slot_count=slots)
+
+
+def generate_users(count, password_hash, seed=42):
+    """Yields the given number of users, all with the same password hash so no time is spent hashing."""
+    rng = random.Random(seed)
+    for number in range(count):
+        yield User(f"user{number}", password_hash, rng.choice(("Ada", "Alan", "Grace", "Linus")), f"Test{number}")
+
+
+def generate_bookings(rows, resource, users, seed=42, today=None):
+    """Yields exactly the given number of (date, time, slot, username) bookings in chronological order, taking
+    about FILL of the slots of every time. A tenth of the history lies after today, so there are upcoming
+    reservations to show and cancel. The same seed always gives the same bookings."""
+    rng = random.Random(seed)
+    per_day = len(resource.times) * resource.slot_count * FILL
+    days = math.ceil(rows / per_day) + 1
+    first_day = (today or datetime.date.today()).toordinal() - int(days * 0.9)
+    produced = 0
+    for ordinal in range(first_day, first_day + days * 2):
+        date = datetime.date.fromordinal(ordinal).isoformat()
+        for time in resource.times:
+            for slot in range(1, resource.slot_count + 1):
+                if rng.random() < FILL:
+                    yield date, time, slot, f"user{rng.randrange(users)}"
+                    produced += 1
+                    if produced == rows:
+                        return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic data set as JSON Lines.")
+    parser.add_argument("rows", type=int, nargs="?", default=10_000)
+    parser.add_argument("folder", nargs="?", default="benchmark_data")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    os.makedirs(args.folder, exist_ok=True)
+    resource = resource_for(args.rows)
+    path = os.path.join(args.folder, f"reservations_{args.rows}.jsonl")
+    with open(path, 'w') as file:
+        count = transfer.write_jsonl(generate_bookings(args.rows, resource, user_count(args.rows), args.seed), file)
+    print(f"Wrote {count:,} reservations with {resource.slot_count} slots per time to {path}")
+
+
+if __name__ == "__main__":
+    main()
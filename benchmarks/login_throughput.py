@@ -0,0 +1,40 @@
+"""Measures how many logins per second the authentication service handles with more worker processes.
+
+Run from the repository root:
+
+    python -m benchmarks.login_throughput [bcrypt cost factor] [logins]
+"""
+import os
+import sys
+import time
+
+from auth import AuthService, hash_password
+
+
+def throughput(workers, rounds, logins, hashed):
+    """Verifies the password logins times at once and returns the logins per second."""
+    service = AuthService(rounds=rounds, workers=workers)
+    try:
+        service.verify("Password123", hashed).result()
+        start = time.perf_counter()
+        futures = [service.verify("Password123", hashed) for _ in range(logins)]
+        assert all(future.result()[0] for future in futures)
+        return logins / (time.perf_counter() - start)
+    finally:
+        service.shutdown()
+
+
+def main(rounds, logins):
+    hashed = hash_password("Password123", rounds)
+    cpus = os.cpu_count() or 1
+    print(f"bcrypt cost factor {rounds}, {logins} logins, {cpus} CPUs")
+    baseline = None
+    for workers in sorted({0, 1, 2, 4, cpus}):
+        rate = throughput(workers, rounds, logins, hashed)
+        baseline = baseline or rate
+        label = "in the calling thread" if workers == 0 else f"{workers} worker{'s' if workers > 1 else ''}"
+        print(f"{label:<24}{rate:8.1f} logins/s  ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 12, int(sys.argv[2]) if len(sys.argv) > 2 else 32)
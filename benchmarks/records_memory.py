@@ -0,0 +1,66 @@
+"""Measures the memory held by the reservations as plain dicts and as slotted records.
+
+Run from the repository root:
+
+    python -m benchmarks.records_memory [reservation count]
+"""
+import datetime
+import gc
+import json
+import sys
+import tracemalloc
+
+import records
+from occupancy import IndexedReservations
+from benchmarks.report_columnar import synthetic_reservations
+
+
+def held_memory(build):
+    """Returns what build() returns and the memory it still holds once it's done, in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held
+
+
+def tuple_index(reservations):
+    """The per-user index as it was before the records: (datetime, slot) tuples."""
+    by_user = {}
+    for key, slots in reservations.items():
+        reservation_time = datetime.datetime.fromisoformat(key)
+        for res in slots:
+            by_user.setdefault(res['username'], []).append((reservation_time, res['slot']))
+    return by_user
+
+
+def record_index(reservations):
+    """The per-user index as it is now: reservation records packed into arrays."""
+    return IndexedReservations(reservations).by_user
+
+
+def report(label, before, after):
+    print(f"{label:<24}{before / 2 ** 20:9.1f} MB -> {after / 2 ** 20:7.1f} MB  ({1 - after / before:.0%} saved)")
+
+
+def main(count):
+    document = json.dumps(synthetic_reservations(count))
+    print(f"{count} reservations, {len(document) / 2 ** 20:.1f} MB of JSON")
+
+    dicts, dicts_memory = held_memory(lambda: json.loads(document))
+    bookings, bookings_memory = held_memory(lambda: json.loads(document, object_hook=records.decode))
+    report("parsed document", dicts_memory, bookings_memory)
+
+    _, tuples_memory = held_memory(lambda: tuple_index(dicts))
+    _, records_memory = held_memory(lambda: record_index(bookings))
+    report("per-user index", tuples_memory, records_memory)
+
+    record = records.ReservationRecord.from_json("2024-08-04 19:00", {'slot': 1, 'username': "user1"})
+    print(f"one reservation record: {sys.getsizeof(record)} bytes, {sys.getsizeof({'slot': 1, 'username': 'user1'})} "
+          f"bytes for a dict entry, {sys.getsizeof(records.Booking(1, 'user1'))} bytes for a booking")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
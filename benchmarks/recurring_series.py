@@ -0,0 +1,52 @@
+"""Compares booking a 52-week series one date at a time with booking it as a single all-or-nothing write, on each
+storage backend with an existing history of reservations.
+
+Run from the repository root:
+
+    python -m benchmarks.recurring_series [existing reservation count]
+"""
+import datetime
+import os
+import sys
+import tempfile
+
+import bookings
+import recurrence
+import storage
+from benchmarks.report_columnar import timed
+from benchmarks.transfer_throughput import synthetic_bookings
+from storage import JournalBackend, JsonBackend, SqliteBackend
+
+
+def one_by_one(dates, time, username):
+    """Books the dates the way the menus do, one bookings.book call per date."""
+    return sum(bookings.book(date, time, 1, username) for date in dates)
+
+
+def main(count):
+    start = datetime.date.today() + datetime.timedelta(days=1)
+    dates = recurrence.occurrences(start, count=52)
+    previous_directory = os.getcwd()
+    print(f"52-week series over {count:,} existing reservations")
+    with tempfile.TemporaryDirectory() as directory:
+        # The report aggregates are kept up to date next to the data, so they are written in the temporary folder.
+        os.chdir(directory)
+        try:
+            for name, backend in (
+                    ("json", JsonBackend(os.path.join(directory, "reservations.json"))),
+                    ("sqlite", SqliteBackend(os.path.join(directory, "reservations.db"), import_from=None)),
+                    ("journal", JournalBackend(os.path.join(directory, "journal.json"),
+                                               os.path.join(directory, "journal.log")))):
+                backend.add_many(synthetic_bookings(count))
+                storage.set_backend(backend)
+                booked, slow = timed(one_by_one, dates, "09:00", "weekly1")
+                (series, conflicts), fast = timed(bookings.book_series, dates, "11:00", "weekly2")
+                print(f"{name:<10}one by one {slow * 1000:8.1f} ms ({booked} booked)   series {fast * 1000:8.1f} ms "
+                      f"({len(series)} booked, {len(conflicts)} conflicts)  {slow / fast:5.1f}x faster")
+        finally:
+            storage.set_backend(None)
+            os.chdir(previous_directory)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
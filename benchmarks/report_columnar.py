@@ -0,0 +1,54 @@
+"""Compares the Counter report with the columnar one on a synthetic history.
+
+Run from the repository root:
+
+    python -m benchmarks.report_columnar [reservation count]
+"""
+import datetime
+import random
+import sys
+import time
+
+import report
+from columnar import ReservationColumns, numpy
+
+TIMES = ["09:00", "11:00", "13:00", "15:00", "17:00", "19:00", "21:00", "23:00"]
+
+
+def synthetic_reservations(count, users=2000, days=3 * 365, seed=42):
+    """Builds a reservations dict with the given number of reservations spread over the given number of days."""
+    rng = random.Random(seed)
+    first_day = datetime.date(2022, 1, 1).toordinal()
+    reservations = {}
+    for _ in range(count):
+        date = datetime.date.fromordinal(first_day + rng.randrange(days)).isoformat()
+        key = f"{date} {rng.choice(TIMES)}"
+        reservations.setdefault(key, []).append({'slot': rng.randint(1, 3), 'username': f"user{rng.randrange(users)}"})
+    return reservations
+
+
+def timed(function, *args):
+    """Runs the function and returns its result and how long it took in seconds."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main(count):
+    reservations = synthetic_reservations(count)
+    print(f"{count} reservations, NumPy {'enabled' if numpy is not None else 'not installed'}")
+
+    columns, build_time = timed(ReservationColumns.from_reservations, reservations)
+    print(f"{'building the columns':<32}{build_time:8.3f} s")
+    for username in (None, "user7"):
+        label = "all users" if username is None else username
+        expected, counter_time = timed(report.get_most_booked_days_and_times, reservations, username)
+        actual, columnar_time = timed(columns.most_booked, username)
+        same = all([count for _, count in e] == [count for _, count in a] for e, a in zip(expected, actual))
+        print(f"{f'Counter report ({label})':<32}{counter_time:8.3f} s")
+        print(f"{f'columnar report ({label})':<32}{columnar_time:8.3f} s"
+              f"  {counter_time / columnar_time:6.0f}x faster, same counts: {same}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,43 @@
+"""Measures the cold-start import time of the menus and of the command-line mode with python -X importtime.
+
+Run from the repository root:
+
+    python -m benchmarks.startup_time [runs]
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = {
+    "menus": "import main, reservation, report, user",
+    "command line": "import main, cli",
+    "HTTP API": "import api",
+}
+
+
+def import_time(code):
+    """Returns the total import time of the code in milliseconds, and whether it loaded rich."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    total = 0
+    loaded_rich = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only the top-level imports, their cumulative time already includes what they import.
+        if not name.startswith("  "):
+            total += int(cumulative)
+        loaded_rich = loaded_rich or name.strip() == "rich"
+    return total / 1000, loaded_rich
+
+
+def main(runs):
+    for label, code in ENTRY_POINTS.items():
+        times = sorted(import_time(code)[0] for _ in range(runs))
+        print(f"{label:<16}{times[len(times) // 2]:8.1f} ms  rich loaded: {import_time(code)[1]}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
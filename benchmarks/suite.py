@@ -0,0 +1,213 @@
+"""Times the main code paths of the app on seeded synthetic data sets and prints the results as JSON, so runs on
+two commits can be compared.
+
+Run from the repository root:
+
+    python -m benchmarks.suite [--rows 10000 100000 ...] [--backend json sqlite ...] [--repeat 5]
+                               [--output results.json] [--compare baseline.json]
+
+Every operation is run --repeat times and its median and fastest time are reported in seconds. --compare prints
+how much slower or faster each operation got against the results of an earlier run. The data sets are built in a
+temporary folder, which is also the working directory while the suite runs, so the app's own data files are never
+touched.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+import aggregates
+import auth
+import bookings
+import cache
+import reservation
+import report
+import resources
+import session
+import storage
+import user
+import user_store
+from benchmarks.generate import generate_bookings, generate_users, resource_for, user_count
+from session import SessionStore
+from user_store import SqliteUserStore
+
+BACKENDS = {
+    "json": lambda directory: storage.JsonBackend(os.path.join(directory, "reservations.json")),
+    "sqlite": lambda directory: storage.SqliteBackend(os.path.join(directory, "reservations.db"), import_from=None),
+    "journal": lambda directory: storage.JournalBackend(os.path.join(directory, "reservations.json"),
+                                                        os.path.join(directory, "reservations.log")),
+    "partitioned": lambda directory: storage.PartitionedBackend(os.path.join(directory, "reservations"),
+                                                                import_from=None),
+}
+PASSWORD = "Password123"
+
+
+def measure(function, repeat, setup=None):
+    """Runs the function repeat times, calling setup before each run outside the timing. Returns the median and
+    fastest times in seconds."""
+    times = []
+    for run in range(repeat):
+        if setup is not None:
+            setup(run)
+        start = time.perf_counter()
+        function(run)
+        times.append(time.perf_counter() - start)
+    return {'median': statistics.median(times), 'min': min(times), 'runs': repeat}
+
+
+def week_grid(reservations, start, resource):
+    """Checks every slot of every time of the week starting on the start date, the way the menus used to."""
+    for offset in range(7):
+        date = (start + datetime.timedelta(days=offset)).isoformat()
+        for time_of_day in resource.times:
+            for slot in range(1, resource.slot_count + 1):
+                bookings.is_slot_reserved(reservations, date, time_of_day, slot)
+
+
+def busiest_user(backend, now):
+    """Returns the username with the most upcoming reservations in the first week ahead, and those reservations."""
+    counts = {}
+    week = backend.load(now.date().isoformat(), (now.date() + datetime.timedelta(days=7)).isoformat())
+    for slots in week.values():
+        for res in slots:
+            counts[res['username']] = counts.get(res['username'], 0) + 1
+    username = max(counts, key=counts.get)
+    return username, backend.user_reservations(username, past=False, now=now)
+
+
+def populate(directory, backend_name, rows, seed, rounds):
+    """Builds a data set in the directory and makes it the one the app uses. Returns the backend."""
+    resource = resource_for(rows)
+    resources.set_resource(resource)
+    users = SqliteUserStore(os.path.join(directory, "users.db"), import_from=None)
+    password_hash = auth.hash_password(PASSWORD, rounds)
+    with users.connect() as connection:
+        connection.executemany("INSERT INTO users (username, password, first_name, last_name) VALUES (?, ?, ?, ?)",
+                               ((u.username, u.password, u.first_name, u.last_name)
+                                for u in generate_users(user_count(rows), password_hash, seed)))
+    user_store.set_user_store(users)
+    auth.set_service(auth.AuthService(rounds=rounds, workers=0))
+    session.set_store(SessionStore(os.path.join(directory, "sessions.json"), os.path.join(directory, "session.key"),
+                                   ttl=0))
+    backend = BACKENDS[backend_name](directory)
+    backend.add_many(generate_bookings(rows, resource, user_count(rows), seed))
+    storage.set_backend(backend)
+    cache.clear()
+    return backend
+
+
+def cold_start(backend_name, directory):
+    """Makes a new instance of the backend the app's one and clears the cache, so loading the reservations reads the
+    files again instead of reusing what an earlier run kept in memory."""
+    storage.set_backend(BACKENDS[backend_name](directory))
+    cache.clear()
+
+
+def run_data_set(backend_name, rows, seed, repeat, rounds):
+    """Times every operation on one data set, returns {operation: timings}."""
+    results = {}
+    previous_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull:
+        os.chdir(directory)
+        quiet = reservation.Console(file=devnull)
+        try:
+            backend = populate(directory, backend_name, rows, seed, rounds)
+            resource = resources.get_resource()
+            now = datetime.datetime.now()
+
+            results['load_reservations'] = measure(lambda run: bookings.load_reservations(), repeat,
+                                                   setup=lambda run: cold_start(backend_name, directory))
+            storage.set_backend(backend)
+            cache.clear()
+            reservations = {key: list(slots) for key, slots in bookings.load_reservations().items()}
+            results['save_reservations'] = measure(lambda run: bookings.save_reservations(reservations), repeat)
+            week = bookings.load_reservations(now.date().isoformat(),
+                                              (now.date() + datetime.timedelta(days=6)).isoformat())
+            results['is_slot_reserved_week'] = measure(lambda run: week_grid(week, now.date(), resource), repeat)
+
+            username, upcoming = busiest_user(backend, now)
+            # Cancelling updates the stored report aggregates, which are computed from the history the first time.
+            aggregates.load()
+            # Shows the first page of the history and goes back.
+            with patch.object(reservation, "console", quiet), \
+                    patch("reservation.show_menu", side_effect=lambda options, title=None: len(options) - 1):
+                results['show_reservations'] = measure(
+                    lambda run: reservation.show_reservations(username, past=True), repeat)
+                cancellations = upcoming[:repeat]
+                results['cancel_reservation'] = measure(
+                    lambda run: reservation.cancel_reservation(username, cancellations[run % len(cancellations)]),
+                    min(repeat, len(cancellations)))
+
+            history = bookings.load_reservations()
+            results['get_most_booked_days_and_times'] = measure(
+                lambda run: report.get_most_booked_days_and_times(history), repeat)
+
+            answers = [f"user{run % user_count(rows)}" if step == 0 else PASSWORD
+                       for run in range(repeat) for step in range(2)]
+            with patch.object(user, "console", quiet), patch("user.Prompt.ask", side_effect=answers):
+                results['log_in'] = measure(lambda run: user.log_in(), repeat)
+        finally:
+            for reset in (storage.set_backend, user_store.set_user_store, auth.set_service, session.set_store,
+                          resources.set_resource):
+                reset(None)
+            cache.clear()
+            os.chdir(previous_directory)
+    return results
+
+
+def git_commit():
+    """Returns the commit being measured, None outside a git checkout."""
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    return None
+
+
+def compare(results, baseline):
+    """Prints the ratio of each median time to the baseline's, above 1 when the operation got slower."""
+    for key, operations in results['data_sets'].items():
+        for name, timings in operations.items():
+            before = baseline.get('data_sets', {}).get(key, {}).get(name)
+            if before:
+                print(f"{key:<24}{name:<34}{timings['median'] / before['median']:6.2f}x", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--backend", nargs="+", choices=sorted(BACKENDS), default=["json"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost factor of the generated users")
+    parser.add_argument("--output", help="write the JSON results to this file instead of printing them")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args(argv)
+
+    results = {'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+               'seed': args.seed, 'repeat': args.repeat, 'bcrypt_rounds': args.rounds, 'data_sets': {}}
+    for backend_name in args.backend:
+        for rows in args.rows:
+            print(f"{backend_name} backend, {rows:,} reservations", file=sys.stderr)
+            results['data_sets'][f"{backend_name}/{rows}"] = run_data_set(backend_name, rows, args.seed,
+                                                                         args.repeat, args.rounds)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return results
+
+
+if __name__ == "__main__":
+    main()
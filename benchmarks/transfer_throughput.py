@@ -0,0 +1,59 @@
+"""Measures the records per second and peak memory of importing and exporting reservations as JSON Lines and CSV.
+
+Run from the repository root:
+
+    python -m benchmarks.transfer_throughput [reservation count]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import transfer
+from resources import DEFAULT_SLOT_COUNT, DEFAULT_TIMES
+from storage import SqliteBackend
+
+
+def synthetic_bookings(count, users=2000):
+    """Yields the given number of bookings, filling every slot of every time from 2000-01-01 onwards."""
+    first_day = datetime.date(2000, 1, 1).toordinal()
+    per_day = len(DEFAULT_TIMES) * DEFAULT_SLOT_COUNT
+    for number in range(count):
+        day, rest = divmod(number, per_day)
+        time_index, slot = divmod(rest, DEFAULT_SLOT_COUNT)
+        yield (datetime.date.fromordinal(first_day + day).isoformat(), DEFAULT_TIMES[time_index], slot + 1,
+               f"user{number % users}")
+
+
+def measured(function, *args):
+    """Runs the function and returns its result and the peak memory it allocated in MB."""
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main(count):
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in ("jsonl", "csv"):
+            path = os.path.join(directory, f"bookings.{file_format}")
+            with open(path, 'w', newline='') as file:
+                transfer.write_bookings(synthetic_bookings(count), file, file_format)
+
+            backend = SqliteBackend(os.path.join(directory, f"{file_format}.db"), import_from=None)
+            with open(path, 'r', newline='') as file:
+                bookings = transfer.Counted(transfer.read_bookings(file, file_format))
+                _, peak = measured(backend.add_many, bookings)
+            print(f"{f'import {file_format}':<16}{bookings.rate():>12,.0f} records/s  peak {peak:8.1f} MB")
+
+            with open(os.devnull, 'w', newline='') as file:
+                bookings = transfer.Counted(backend.iter_bookings())
+                _, peak = measured(transfer.write_bookings, bookings, file, file_format)
+            print(f"{f'export {file_format}':<16}{bookings.rate():>12,.0f} records/s  peak {peak:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
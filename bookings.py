@@ -0,0 +1,150 @@
+import datetime
+
+import aggregates
+import metrics
+import resources
+import storage
+from occupancy import full_mask, taken_mask
+from storage import get_reservation_key
+
+# How many reservations a page of the listings shows.
+PAGE_SIZE = 10
+
+
+@metrics.timed("load_reservations")
+def load_reservations(start=None, end=None):
+    """Loads the reservations that have been made until now, optionally only the ones between the given dates."""
+    return storage.get_backend().load(start, end)
+
+
+@metrics.timed("save_reservations")
+def save_reservations(reservations):
+    """Saves the reservations with the new changes made to them."""
+    storage.get_backend().save(reservations)
+    aggregates.invalidate()
+
+
+def availability_index(start=None, end=None):
+    """Returns what the availability between the given dates can be read from without parsing the reservations:
+    the occupancy file of the storage backend, or the reservations of those dates if the backend keeps none. Only
+    the taken slots can be read from it, see occupancy.taken_mask."""
+    index = storage.get_backend().occupancy(resources.get_resource())
+    if index is not None:
+        return index
+    return load_reservations(start, end)
+
+
+def is_slot_reserved(reservations, date, time, slot):
+    """Checks if the given slot is reserved for the given date and time."""
+    return taken_mask(reservations, get_reservation_key(date, time)) >> slot & 1 == 1
+
+
+def is_time_full(reservations, date, time):
+    """Checks if every slot is reserved for the given date and time."""
+    full = full_mask(resources.get_resource().slot_count)
+    return taken_mask(reservations, get_reservation_key(date, time)) & full == full
+
+
+def book(date, time, slot, username):
+    """Books the slot for the user and counts it in the reports, returns False if it is already taken."""
+    if not storage.get_backend().add(date, time, slot, username):
+        metrics.count("booking_conflicts_total")
+        return False
+    metrics.count("bookings_total")
+    aggregates.record(date, time, username, 1)
+    return True
+
+
+def book_series(dates, time, username, slot=None, now=None):
+    """Books a slot at the same time on every date of a series, the given slot or else the first free one of each
+    date, in a single write. The whole series is checked against the occupancy of its dates in one pass first, and
+    nothing is booked if any date has passed, is closed, is full or is already held by the user. Returns the
+    (date, time, slot) bookings made and the (date, reason) conflicts, only one of them being non-empty."""
+    resource = resources.get_resource()
+    reservations = load_reservations(min(dates), max(dates))
+    full = full_mask(resource.slot_count)
+    current_key = f"{now or datetime.datetime.now():%Y-%m-%d %H:%M}"
+    series, conflicts = [], []
+    for date in dates:
+        key = get_reservation_key(date, time)
+        free = full & ~taken_mask(reservations, key)
+        if key <= current_key:
+            conflicts.append((date, "passed"))
+        elif not resource.is_open(date, time):
+            conflicts.append((date, "closed"))
+        elif any(res['username'] == username for res in reservations.get(key, [])):
+            conflicts.append((date, "already booked by you"))
+        elif slot is not None and not free >> slot & 1:
+            conflicts.append((date, f"slot {slot} taken"))
+        elif not free:
+            conflicts.append((date, "full"))
+        else:
+            series.append((date, time, slot if slot is not None else (free & -free).bit_length() - 1, username))
+    if conflicts:
+        return [], conflicts
+    # Someone may have booked one of the slots since they were loaded, the backend checks them again.
+    taken = storage.get_backend().add_all(series)
+    if taken:
+        return [], [(date, f"slot {taken_slot} taken") for date, _, taken_slot, _ in taken]
+    aggregates.record_many([(date, time, username, 1) for date, time, _, _ in series])
+    return [(date, time, chosen) for date, time, chosen, _ in series], []
+
+
+def cancel(key, slot, username):
+    """Cancels the user's reservation of the slot, books it for the first user on its waitlist and updates the
+    reports. Returns whether there was such a reservation and the username of the promoted user, None if nobody
+    was waiting."""
+    removed, promoted = storage.get_backend().cancel(key, slot, username)
+    if not removed:
+        return False, None
+    date, time = key.split()
+    metrics.count("cancellations_total")
+    aggregates.record(date, time, username, -1)
+    if promoted is not None:
+        metrics.count("waitlist_promotions_total")
+        aggregates.record(date, time, promoted, 1)
+    return True, promoted
+
+
+def join_waitlist(date, time, username):
+    """Puts the user in line for the next slot freed at the given date and time, returns their position from 1.
+    Returns None without joining if a slot has been freed since, as nobody would be promoted to it."""
+    return storage.get_backend().join_waitlist(get_reservation_key(date, time), username,
+                                               resources.get_resource().slot_count)
+
+
+def leave_waitlist(date, time, username):
+    """Takes the user out of line for the given date and time, returns False if they weren't in it."""
+    return storage.get_backend().leave_waitlist(get_reservation_key(date, time), username)
+
+
+def user_reservations(username, past=None, now=None):
+    """Returns the sorted (datetime, slot) pairs of the user's reservations, only the ones before now if past is
+    True or from now on if past is False."""
+    return storage.get_backend().user_reservations(username, past, now)
+
+
+def reservations_page(username, past=None, now=None, page=0, size=PAGE_SIZE, date=None):
+    """Returns one page of the user's sorted reservations (see user_reservations) as the (datetime, slot) pairs of
+    the page, the page number from 0 and the number of pages. Given an ISO date, the page is the one holding the
+    first reservation on or after that date. Page numbers out of range are brought back to the first or last page.
+    The backend finds the page with binary searches and builds only its rows, so a page costs the same however many
+    reservations the user has."""
+    return storage.get_backend().user_reservations_page(username, past, now, page, size, date)
+
+
+def reservation_id(when, slot):
+    """Returns the ID of the reservation of the slot at the given datetime, like "20240805-0900-2". A slot is only
+    ever held by one user, so the ID stays the same however the reservations are listed."""
+    return f"{when:%Y%m%d-%H%M}-{slot}"
+
+
+def parse_reservation_id(reservation_id):
+    """Returns the (datetime, slot) pair of a reservation ID, raises ValueError if it isn't one."""
+    parts = reservation_id.strip().split("-")
+    try:
+        if len(parts) != 3 or not parts[2].isdigit():
+            raise ValueError
+        return datetime.datetime.strptime(parts[0] + parts[1], "%Y%m%d%H%M"), int(parts[2])
+    except ValueError:
+        raise ValueError(f"Not a reservation ID: {reservation_id}") from None
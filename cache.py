@@ -0,0 +1,54 @@
+import os
+
+hits = 0
+misses = 0
+
+_entries = {}
+
+
+def file_stamp(path):
+    """Returns what identifies the current version of a file (inode, modification time and size), None if it is
+    missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def get(path, loader):
+    """Returns the parsed contents of the file, calling the loader only if the file changed since it was last
+    parsed. The returned value is shared between callers and must not be modified."""
+    global hits, misses
+    stamp = file_stamp(path)
+    entry = _entries.get(path)
+    if entry is not None and entry[0] == stamp:
+        hits += 1
+        return entry[1]
+    misses += 1
+    value = loader()
+    _entries[path] = (stamp, value)
+    return value
+
+
+def put(path, value):
+    """Stores the value that has just been written to the file, so the next read doesn't parse it again."""
+    _entries[path] = (file_stamp(path), value)
+
+
+def invalidate(path):
+    """Forgets the parsed contents of the file."""
+    _entries.pop(path, None)
+
+
+def clear():
+    """Forgets every cached file and resets the counters."""
+    global hits, misses
+    _entries.clear()
+    hits = 0
+    misses = 0
+
+
+def stats():
+    """Returns the number of cache hits and misses so far."""
+    return {'hits': hits, 'misses': misses}
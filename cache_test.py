@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import unittest
+
+import cache
+import storage
+
+
+class TestCacheModule(unittest.TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "data.json")
+        self.loads = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, data):
+        with open(self.path, 'w') as file:
+            json.dump(data, file)
+
+    def loader(self):
+        self.loads += 1
+        with open(self.path) as file:
+            return json.load(file)
+
+    def test_hit_when_file_unchanged(self):
+        self.write({"a": 1})
+        self.assertEqual(cache.get(self.path, self.loader), {"a": 1})
+        self.assertEqual(cache.get(self.path, self.loader), {"a": 1})
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_reload_when_file_changes(self):
+        self.write({"a": 1})
+        cache.get(self.path, self.loader)
+        self.write({"a": 1, "b": 2})
+        self.assertEqual(cache.get(self.path, self.loader), {"a": 1, "b": 2})
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 2})
+
+    def test_put_and_invalidate(self):
+        self.write({"a": 1})
+        cache.put(self.path, {"a": 1})
+        self.assertEqual(cache.get(self.path, self.loader), {"a": 1})
+        self.assertEqual(self.loads, 0)
+        cache.invalidate(self.path)
+        cache.get(self.path, self.loader)
+        self.assertEqual(self.loads, 1)
+
+    def test_missing_file(self):
+        self.assertIsNone(cache.file_stamp(self.path))
+
+    def test_json_backend_writes_keep_cache_warm(self):
+        backend = storage.JsonBackend(self.path)
+        backend.add("2023-01-01", "09:00", 1, "user1")
+        backend.load()
+        backend.load("2023-01-01", "2023-01-01")
+        backend.add("2023-01-01", "09:00", 2, "user2")
+        self.assertEqual(len(backend.load()["2023-01-01 09:00"]), 2)
+        self.assertEqual(cache.stats(), {'hits': 4, 'misses': 1})
+
+    def test_json_backend_sees_other_writers(self):
+        backend = storage.JsonBackend(self.path)
+        backend.add("2023-01-01", "09:00", 1, "user1")
+        backend.load()
+        self.write({"2023-01-02 09:00": [{"slot": 1, "username": "user2"}]})
+        self.assertEqual(list(backend.load()), ["2023-01-02 09:00"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import argparse
+import datetime
+import sys
+
+import aggregates
+import bookings
+import recurrence
+import storage
+import transfer
+import user_store
+from availability import free_slots
+
+FORMAT_HELP = "json (the reservations.json format), jsonl or csv, guessed from the file extension by default"
+
+
+def error(message):
+    """Prints the message to stderr and returns the exit status of a failed command."""
+    print(message, file=sys.stderr)
+    return 1
+
+
+def invalid_date(*dates):
+    """Returns the first of the given dates that isn't a valid YYYY-MM-DD date, None if they all are or are
+    missing."""
+    for date in dates:
+        if date is None:
+            continue
+        try:
+            datetime.date.fromisoformat(date)
+        except ValueError:
+            return date
+    return None
+
+
+def book(args):
+    """Books a slot for the user, the first free one at that time if no slot is given."""
+    if (date := invalid_date(args.date, args.until)) is not None:
+        return error(f"Invalid date: {date}")
+    if user_store.get_user_store().get(args.username) is None:
+        return error(f"Unknown user: {args.username}")
+    if args.until or args.count:
+        return book_series(args)
+    free = [slot for _, time, slot in free_slots(args.date, args.date, args.username)
+            if time == args.time and args.slot in (None, slot)]
+    if not free:
+        return error(f"No free slot on {args.date} at {args.time}.")
+    if not bookings.book(args.date, args.time, free[0], args.username):
+        return error("This slot has just been reserved by someone else.")
+    print(f"Reserved {args.date} {args.time} slot {free[0]}.")
+    return 0
+
+
+def book_series(args):
+    """Books the same time every few days, either all the dates of the series or none of them."""
+    try:
+        dates = recurrence.occurrences(args.date, args.every, args.until, args.count)
+    except ValueError as invalid:
+        return error(str(invalid))
+    booked, conflicts = bookings.book_series(dates, args.time, args.username, args.slot)
+    if conflicts:
+        for date, reason in conflicts:
+            print(f"Conflict: {date} {args.time} ({reason})", file=sys.stderr)
+        return error("Nothing reserved.")
+    for date, time, slot in booked:
+        print(f"Reserved {date} {time} slot {slot}.")
+    return 0
+
+
+def cancel(args):
+    """Cancels the user's upcoming reservation of the given slot."""
+    if (date := invalid_date(args.date)) is not None:
+        return error(f"Invalid date: {date}")
+    key = storage.get_reservation_key(args.date, args.time)
+    if key <= f"{datetime.datetime.now():%Y-%m-%d %H:%M}":
+        return error("Only upcoming reservations can be cancelled.")
+    removed, promoted = bookings.cancel(key, args.slot, args.username)
+    if not removed:
+        return error("Reservation not found.")
+    print(f"Cancelled {args.date} {args.time} slot {args.slot}.")
+    if promoted is not None:
+        print(f"Booked it for {promoted} from the waitlist.")
+    return 0
+
+
+def list_reservations(args):
+    """Prints the user's reservations, one per line."""
+    past = True if args.past else None if args.all else False
+    for when, slot in bookings.user_reservations(args.username, past, datetime.datetime.now()):
+        print(f"{when:%Y-%m-%d %H:%M}\t{slot}")
+    return 0
+
+
+def availability(args):
+    """Prints the free slots between the dates, one per line."""
+    if (date := invalid_date(args.start, args.end)) is not None:
+        return error(f"Invalid date: {date}")
+    for date, time, slot in free_slots(args.start, args.end or args.start, args.username):
+        print(f"{date} {time}\t{slot}")
+    return 0
+
+
+def report(args):
+    """Prints the most booked days, times and weekly times."""
+    days, times, weekly_times = aggregates.most_booked(args.username)
+    print("Most booked days of the week")
+    for day, count in days:
+        print(f"{day}\t{count}")
+    print("Most booked times of the day")
+    for time, count in times:
+        print(f"{time}\t{count}")
+    print("Most booked weekly times")
+    for (day, time), count in weekly_times:
+        print(f"{day} {time}\t{count}")
+    return 0
+
+
+def import_reservations(args):
+    """Adds the reservations of a JSON, JSON Lines or CSV file in a single write, skipping the ones whose slot is
+    already taken. JSON Lines and CSV files are read one record at a time. Nothing is imported if a record is
+    invalid."""
+    file_format = args.format or transfer.guess_format(args.file)
+    with open(args.file, 'r', newline='') as file:
+        bookings = transfer.Counted(transfer.read_bookings(file, file_format))
+        try:
+            conflicts = storage.get_backend().add_many(bookings)
+        except transfer.InvalidBooking as invalid:
+            return error(f"Nothing imported. {invalid}")
+    aggregates.invalidate()
+    for date, time, slot, username in conflicts:
+        print(f"Conflict: {date} {time} slot {slot} ({username})", file=sys.stderr)
+    print(f"Imported {bookings.count - len(conflicts)} reservations, skipped {len(conflicts)} conflicts "
+          f"({bookings.rate():.0f} records/s).")
+    return 0
+
+
+def export_reservations(args):
+    """Writes every reservation to a JSON, JSON Lines or CSV file. JSON Lines and CSV files are written one record
+    at a time."""
+    file_format = args.format or transfer.guess_format(args.file)
+    with open(args.file, 'w', newline='') as file:
+        bookings = transfer.Counted(storage.get_backend().iter_bookings())
+        transfer.write_bookings(bookings, file, file_format)
+    print(f"Exported {bookings.count} reservations ({bookings.rate():.0f} records/s).")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Manage reservations without the menus.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("book", help="book a slot")
+    command.add_argument("username")
+    command.add_argument("date", help="YYYY-MM-DD")
+    command.add_argument("time", help="HH:MM")
+    command.add_argument("--slot", type=int, help="slot number, the first free one by default")
+    command.add_argument("--every", type=int, default=7, metavar="DAYS",
+                         help="days between two bookings of a series (7 by default)")
+    series_end = command.add_mutually_exclusive_group()
+    series_end.add_argument("--until", help="book a series up to this date (YYYY-MM-DD), all or nothing")
+    series_end.add_argument("--count", type=int, help="book a series of this many bookings, all or nothing")
+    command.set_defaults(run=book)
+
+    command = commands.add_parser("cancel", help="cancel a reservation")
+    command.add_argument("username")
+    command.add_argument("date", help="YYYY-MM-DD")
+    command.add_argument("time", help="HH:MM")
+    command.add_argument("slot", type=int)
+    command.set_defaults(run=cancel)
+
+    command = commands.add_parser("list", help="list a user's upcoming reservations")
+    command.add_argument("username")
+    when = command.add_mutually_exclusive_group()
+    when.add_argument("--past", action="store_true", help="list past reservations instead")
+    when.add_argument("--all", action="store_true", help="list past and upcoming reservations")
+    command.set_defaults(run=list_reservations)
+
+    command = commands.add_parser("availability", help="list the free slots")
+    command.add_argument("start", help="YYYY-MM-DD")
+    command.add_argument("end", nargs="?", help="YYYY-MM-DD, the start date by default")
+    command.add_argument("--username", help="leave out the times this user already holds a slot at")
+    command.set_defaults(run=availability)
+
+    command = commands.add_parser("report", help="print the reservation report")
+    command.add_argument("--username", help="only count this user's reservations")
+    command.set_defaults(run=report)
+
+    command = commands.add_parser("import", help="add reservations from a file")
+    command.add_argument("file")
+    command.add_argument("--format", choices=transfer.FORMATS, help=FORMAT_HELP)
+    command.set_defaults(run=import_reservations)
+
+    command = commands.add_parser("export", help="write every reservation to a file")
+    command.add_argument("file")
+    command.add_argument("--format", choices=transfer.FORMATS, help=FORMAT_HELP)
+    command.set_defaults(run=export_reservations)
+    return parser
+
+
+def main(argv=None):
+    """Runs the command given on the command line, returns its exit status."""
+    args = build_parser().parse_args(argv)
+    return args.run(args)
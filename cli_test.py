@@ -0,0 +1,172 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+
+import cache
+import cli
+import storage
+from records import User
+from storage import JsonBackend
+from user_store import SqliteUserStore
+
+TOMORROW = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.backend = JsonBackend(os.path.join(self.directory, "reservations.json"))
+        storage.set_backend(self.backend)
+        self.addCleanup(storage.set_backend, None)
+        self.users = SqliteUserStore(os.path.join(self.directory, "users.db"), import_from=None)
+        self.users.add(User('user1', 'hash', 'Test', 'User'))
+        for target in ("user_store.get_user_store", "aggregates.record", "aggregates.record_many",
+                       "aggregates.invalidate"):
+            patcher = patch(target, return_value=self.users)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_cli(self, *argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = cli.main(list(argv))
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_book_first_free_slot(self):
+        self.backend.add(TOMORROW, "09:00", 1, "user2")
+        self.assertEqual(self.run_cli("book", "user1", TOMORROW, "09:00")[0], 0)
+        self.assertEqual(self.backend.load()[f"{TOMORROW} 09:00"][1], {'slot': 2, 'username': 'user1'})
+
+    def test_book_series(self):
+        status, stdout, _ = self.run_cli("book", "user1", TOMORROW, "09:00", "--slot", "2", "--count", "3")
+        self.assertEqual(status, 0)
+        self.assertEqual(len(stdout.splitlines()), 3)
+        self.assertEqual(len(self.backend.user_reservations("user1")), 3)
+
+    def test_book_series_conflict_books_nothing(self):
+        in_two_weeks = (datetime.date.today() + datetime.timedelta(days=15)).isoformat()
+        self.backend.add(in_two_weeks, "09:00", 2, "user2")
+        status, _, stderr = self.run_cli("book", "user1", TOMORROW, "09:00", "--slot", "2", "--until", in_two_weeks)
+        self.assertEqual(status, 1)
+        self.assertIn(f"Conflict: {in_two_weeks} 09:00 (slot 2 taken)", stderr)
+        self.assertEqual(self.backend.user_reservations("user1"), [])
+
+    def test_book_taken_slot(self):
+        self.backend.add(TOMORROW, "09:00", 1, "user2")
+        status, _, stderr = self.run_cli("book", "user1", TOMORROW, "09:00", "--slot", "1")
+        self.assertEqual(status, 1)
+        self.assertIn("No free slot", stderr)
+
+    def test_invalid_dates(self):
+        for argv in (("book", "user1", "2030-13-01", "09:00"), ("book", "user1", TOMORROW, "09:00", "--until", "soon"),
+                     ("cancel", "user1", "2030-02-30", "09:00", "1"), ("availability", "2030-02-30"),
+                     ("availability", TOMORROW, "next week")):
+            with self.subTest(argv=argv):
+                status, _, stderr = self.run_cli(*argv)
+                self.assertEqual(status, 1)
+                self.assertIn("Invalid date: ", stderr)
+        self.assertEqual(self.backend.load(), {})
+
+    def test_book_unknown_user(self):
+        status, _, stderr = self.run_cli("book", "nobody", TOMORROW, "09:00")
+        self.assertEqual(status, 1)
+        self.assertIn("Unknown user", stderr)
+        self.assertEqual(self.backend.load(), {})
+
+    def test_cancel(self):
+        self.backend.add(TOMORROW, "09:00", 2, "user1")
+        self.assertEqual(self.run_cli("cancel", "user1", TOMORROW, "09:00", "2")[0], 0)
+        self.assertEqual(self.backend.load(), {})
+        self.assertEqual(self.run_cli("cancel", "user1", TOMORROW, "09:00", "2")[0], 1)
+
+    def test_cancel_past(self):
+        self.backend.add("2020-01-01", "09:00", 1, "user1")
+        self.backend.join_waitlist("2020-01-01 09:00", "user2")
+        status, _, stderr = self.run_cli("cancel", "user1", "2020-01-01", "09:00", "1")
+        self.assertEqual(status, 1)
+        self.assertIn("Only upcoming reservations", stderr)
+        self.assertEqual(self.backend.load(), {"2020-01-01 09:00": [{"slot": 1, "username": "user1"}]})
+        self.assertEqual(self.backend.waitlist("2020-01-01 09:00"), ["user2"])
+
+    def test_list(self):
+        self.backend.add(TOMORROW, "11:00", 1, "user1")
+        self.backend.add("2020-01-01", "09:00", 3, "user1")
+        self.assertEqual(self.run_cli("list", "user1")[1], f"{TOMORROW} 11:00\t1\n")
+        self.assertEqual(self.run_cli("list", "user1", "--past")[1], "2020-01-01 09:00\t3\n")
+        self.assertEqual(len(self.run_cli("list", "user1", "--all")[1].splitlines()), 2)
+
+    def test_availability(self):
+        self.backend.add(TOMORROW, "09:00", 1, "user2")
+        lines = self.run_cli("availability", TOMORROW)[1].splitlines()
+        self.assertEqual(lines[:2], [f"{TOMORROW} 09:00\t2", f"{TOMORROW} 09:00\t3"])
+        self.assertEqual(len(lines), 8 * 3 - 1)
+
+    @patch("aggregates.most_booked", return_value=([("Monday", 2)], [("09:00", 2)], [(("Monday", "09:00"), 2)]))
+    def test_report(self, mock_most_booked):
+        stdout = self.run_cli("report", "--username", "user1")[1]
+        mock_most_booked.assert_called_once_with("user1")
+        self.assertIn("Monday\t2\n", stdout)
+        self.assertIn("Monday 09:00\t2\n", stdout)
+
+    def test_import_writes_once(self):
+        self.backend.add("2023-01-01", "09:00", 1, "user1")
+        path = os.path.join(self.directory, "import.json")
+        with open(path, 'w') as file:
+            json.dump({"2023-01-01 09:00": [{"slot": 1, "username": "user2"}, {"slot": 2, "username": "user2"}],
+                       "2023-01-02 11:00": [{"slot": 3, "username": "user3"}]}, file)
+        with patch("storage.atomic_write_json", wraps=storage.atomic_write_json) as mock_write:
+            status, stdout, stderr = self.run_cli("import", path)
+        self.assertEqual(status, 0)
+        mock_write.assert_called_once()
+        self.assertIn("Imported 2 reservations, skipped 1 conflicts", stdout)
+        self.assertIn("2023-01-01 09:00 slot 1 (user2)", stderr)
+        self.assertEqual(self.backend.load()["2023-01-01 09:00"],
+                         [{"slot": 1, "username": "user1"}, {"slot": 2, "username": "user2"}])
+
+    def test_import_csv_and_jsonl(self):
+        csv_path = os.path.join(self.directory, "import.csv")
+        with open(csv_path, 'w') as file:
+            file.write("date,time,slot,username\n2023-01-01,09:00,1,user1\n2023-01-01,09:00,1,user2\n")
+        jsonl_path = os.path.join(self.directory, "import.jsonl")
+        with open(jsonl_path, 'w') as file:
+            file.write('{"date": "2023-01-02", "time": "11:00", "slot": 2, "username": "user3"}\n')
+        self.assertIn("Imported 1 reservations, skipped 1 conflicts", self.run_cli("import", csv_path)[1])
+        self.assertIn("Imported 1 reservations", self.run_cli("import", jsonl_path)[1])
+        self.assertEqual(self.backend.load(), {"2023-01-01 09:00": [{"slot": 1, "username": "user1"}],
+                                               "2023-01-02 11:00": [{"slot": 2, "username": "user3"}]})
+
+    def test_import_invalid_record(self):
+        path = os.path.join(self.directory, "import.csv")
+        with open(path, 'w') as file:
+            file.write("date,time,slot,username\n2023-01-01,09:00,1,user1\n2023-01-01,10:00,1,user1\n")
+        status, _, stderr = self.run_cli("import", path)
+        self.assertEqual(status, 1)
+        self.assertIn("Nothing imported. Line 3: invalid time '10:00'", stderr)
+        self.assertEqual(self.backend.load(), {})
+
+    def test_export_csv(self):
+        self.backend.add("2023-01-01", "09:00", 1, "user1")
+        path = os.path.join(self.directory, "export.txt")
+        self.assertIn("Exported 1 reservations", self.run_cli("export", path, "--format", "csv")[1])
+        with open(path) as file:
+            self.assertEqual(file.read(), "date,time,slot,username\n2023-01-01,09:00,1,user1\n")
+
+    def test_export(self):
+        self.backend.add("2023-01-01", "09:00", 1, "user1")
+        path = os.path.join(self.directory, "export.json")
+        self.assertEqual(self.run_cli("export", path)[0], 0)
+        with open(path) as file:
+            self.assertEqual(json.load(file), {"2023-01-01 09:00": [{"slot": 1, "username": "user1"}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
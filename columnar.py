@@ -0,0 +1,102 @@
+import datetime
+from array import array
+from collections import Counter
+from itertools import compress
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# 2024-01-01 was a Monday, so these follow date.weekday() order.
+DAY_NAMES = [datetime.date(2024, 1, day).strftime("%A") for day in range(1, 8)]
+
+
+class ReservationColumns:
+    """Reservations held column by column in compact arrays: date ordinals, time indices, slot numbers and username
+    codes. Times and usernames are interned, the arrays only hold their index in the times and usernames lists."""
+
+    def __init__(self):
+        self.dates = array('i')
+        self.times = array('h')
+        self.slots = array('h')
+        self.users = array('i')
+        self.time_names = []
+        self.usernames = []
+        self.time_codes = {}
+        self.user_codes = {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def intern(self, names, codes, name):
+        """Returns the code of the name, giving it the next free code the first time it is seen."""
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def append(self, date, time, slot, username):
+        """Adds one reservation given its ISO date, time, slot and username."""
+        self.dates.append(datetime.date.fromisoformat(date).toordinal())
+        self.times.append(self.intern(self.time_names, self.time_codes, time))
+        self.slots.append(slot)
+        self.users.append(self.intern(self.usernames, self.user_codes, username))
+
+    @classmethod
+    def from_reservations(cls, reservations):
+        """Builds the columns from a reservations dict, parsing every date and time only once."""
+        columns = cls()
+        for key, slots in reservations.items():
+            date, time = key.split()
+            ordinal = datetime.date.fromisoformat(date).toordinal()
+            time_code = columns.intern(columns.time_names, columns.time_codes, time)
+            for res in slots:
+                columns.dates.append(ordinal)
+                columns.times.append(time_code)
+                columns.slots.append(res.get('slot', 0))
+                columns.users.append(columns.intern(columns.usernames, columns.user_codes, res['username']))
+        return columns
+
+    def weekly_time_counts(self, username=None):
+        """Counts the reservations per (weekday, time code) cell, returned as a flat list indexed by
+        weekday * number of times + time code."""
+        time_count = len(self.time_names)
+        cells = [0] * (7 * time_count)
+        if username is not None and username not in self.user_codes:
+            return cells
+        if numpy is not None:
+            dates = numpy.frombuffer(self.dates, dtype=numpy.int32)
+            times = numpy.frombuffer(self.times, dtype=numpy.int16)
+            if username is not None:
+                selected = numpy.frombuffer(self.users, dtype=numpy.int32) == self.user_codes[username]
+                dates, times = dates[selected], times[selected]
+            weekdays = (dates.astype(numpy.int64) + 6) % 7
+            return numpy.bincount(weekdays * time_count + times, minlength=7 * time_count).tolist()
+
+        # Without NumPy, count the (date, time) pairs at C speed and fold the far fewer distinct pairs by weekday.
+        keys = map(time_count.__rmul__, self.dates)
+        keys = map(int.__add__, keys, self.times)
+        if username is not None:
+            keys = compress(keys, map(self.user_codes[username].__eq__, self.users))
+        for key, count in Counter(keys).items():
+            ordinal, time_code = divmod(key, time_count)
+            cells[(ordinal + 6) % 7 * time_count + time_code] += count
+        return cells
+
+    def most_booked(self, username=None, limit=5):
+        """Gets the most booked days of the week, times of the day and weekly times, in the same shape as
+        report.get_most_booked_days_and_times. Ties are listed in calendar order."""
+        time_count = len(self.time_names)
+        cells = self.weekly_time_counts(username)
+        order = sorted(range(time_count), key=self.time_names.__getitem__)
+        day_counts = [(DAY_NAMES[day], sum(cells[day * time_count:(day + 1) * time_count])) for day in range(7)]
+        time_counts = [(self.time_names[time], sum(cells[time::time_count])) for time in order]
+        weekly_counts = [((DAY_NAMES[day], self.time_names[time]), cells[day * time_count + time])
+                         for day in range(7) for time in order]
+
+        def top(counts):
+            return sorted((item for item in counts if item[1]), key=lambda item: item[1], reverse=True)[:limit]
+
+        return top(day_counts), top(time_counts), top(weekly_counts)
@@ -0,0 +1,77 @@
+import random
+import unittest
+from unittest.mock import patch
+
+import columnar
+import report
+from columnar import ReservationColumns
+
+
+def synthetic_reservations(count, seed=1):
+    """Builds a reservations dict with the given number of random reservations."""
+    rng = random.Random(seed)
+    reservations = {}
+    for _ in range(count):
+        key = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.choice(['09:00', '11:00', '13:00'])}"
+        reservations.setdefault(key, []).append({'slot': rng.randint(1, 3), 'username': f"user{rng.randint(1, 5)}"})
+    return reservations
+
+
+class TestColumnarModule(unittest.TestCase):
+
+    def setUp(self):
+        self.reservations = synthetic_reservations(2000)
+        self.columns = ReservationColumns.from_reservations(self.reservations)
+
+    def assertSameRankings(self, expected, actual):
+        """Checks the rankings against the top 5 of the Counter report, allowing ties to be listed in another
+        order."""
+        for expected_counts, actual_counts in zip(expected, actual):
+            self.assertEqual([count for _, count in expected_counts], [count for _, count in actual_counts[:5]])
+            self.assertLessEqual(set(expected_counts), set(actual_counts))
+
+    def test_columns(self):
+        columns = ReservationColumns.from_reservations({"2024-08-04 10:00": [{"slot": 2, "username": "user1"}],
+                                                        "2024-08-05 11:00": [{"slot": 1, "username": "user1"}]})
+        self.assertEqual(len(columns), 2)
+        self.assertEqual(list(columns.times), [0, 1])
+        self.assertEqual(list(columns.slots), [2, 1])
+        self.assertEqual(list(columns.users), [0, 0])
+        self.assertEqual(columns.usernames, ["user1"])
+        self.assertEqual(columns.dates[1] - columns.dates[0], 1)
+
+    def test_matches_counter_report(self):
+        for username in (None, "user3"):
+            expected = report.get_most_booked_days_and_times(self.reservations, username)
+            self.assertSameRankings(expected, self.columns.most_booked(username, limit=100))
+
+    def test_pure_python_path(self):
+        with patch('columnar.numpy', None):
+            pure = self.columns.most_booked("user2", limit=100)
+        self.assertSameRankings(report.get_most_booked_days_and_times(self.reservations, "user2"), pure)
+
+    @unittest.skipIf(columnar.numpy is None, "NumPy is not installed")
+    def test_numpy_path(self):
+        with patch('columnar.numpy', None):
+            pure = self.columns.most_booked(limit=100)
+        self.assertEqual(self.columns.most_booked(limit=100), pure)
+
+    def test_report_shape(self):
+        days, times, weekly_times = ReservationColumns.from_reservations(
+            {"2024-08-04 10:00": [{"username": "user1"}, {"username": "user2"}]}).most_booked()
+        self.assertEqual(days, [("Sunday", 2)])
+        self.assertEqual(times, [("10:00", 2)])
+        self.assertEqual(weekly_times, [(("Sunday", "10:00"), 2)])
+
+    def test_unknown_user_and_empty(self):
+        self.assertEqual(self.columns.most_booked("nobody"), ([], [], []))
+        self.assertEqual(ReservationColumns().most_booked(), ([], [], []))
+
+    @patch('report.load_reservations')
+    def test_report_loads_columns(self, mock_load_reservations):
+        mock_load_reservations.return_value = self.reservations
+        self.assertEqual(len(report.load_reservation_columns()), 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,28 +1,35 @@
+import multiprocessing
 import sys
-from rich.console import Console
-from rich.prompt import Prompt, Confirm
-import user
-import reservation
-import report
 
-console = Console(color_system="windows")
+# The menus are imported when they are first shown, so the command-line mode starts without loading rich.
 
 
 def main_menu(username):
-    """gives you the option to navigate through the app."""
-    options = ["My reservations", "Available reservations", "Reservation reports", "Exit"]
-    choice = reservation.show_menu(options, title="[bold blue]Main Menu[/bold blue]")
-    if choice == 0:
-        reservation.view_reservations(username)
-    elif choice == 1:
-        reservation.available_reservations(username)
-    elif choice == 2:
-        report.report_menu(username)
-    elif choice == 3:
-        main()
+    """gives you the option to navigate through the app, until the user exits or logs out."""
+    import report
+    import reservation
+    import user
+
+    options = ["My reservations", "Available reservations", "Reservation reports", "Log Out", "Exit"]
+    while True:
+        choice = reservation.show_menu(options, title="[bold blue]Main Menu[/bold blue]")
+        if choice == 0:
+            reservation.view_reservations(username)
+        elif choice == 1:
+            reservation.available_reservations(username)
+        elif choice == 2:
+            report.report_menu(username)
+        elif choice == 3:
+            user.log_out(username)
+            return
+        elif choice == 4:
+            return
 
 
 def main():
+    import reservation
+    import user
+
     while True:
         options = ["Sign Up", "Log In", "Exit"]
         choice = reservation.show_menu(options, title="[bold blue]Welcome Menu[/bold blue]")
@@ -40,4 +47,9 @@ def main():
 
 
 if __name__ == "__main__":
+    # Lets the password hashing workers start from the packaged executable.
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
     main()
@@ -1,3 +1,6 @@
+import os
+import subprocess
+import sys
 import unittest
 from unittest.mock import patch, MagicMock
 
@@ -37,7 +40,7 @@ class TestMainAppFunctions(unittest.TestCase):
     @patch('reservation.available_reservations')
     @patch('report.report_menu')
     def test_main_menu_view_reservations(self, mock_report_menu, mock_available_reservations, mock_view_reservations):
-        with patch('builtins.input', side_effect=['1']):
+        with patch('builtins.input', side_effect=['1', '5']):
             main_menu('test_user')
         mock_view_reservations.assert_called_once_with('test_user')
 
@@ -46,7 +49,7 @@ class TestMainAppFunctions(unittest.TestCase):
     @patch('report.report_menu')
     def test_main_menu_available_reservations(self, mock_report_menu, mock_available_reservations,
                                               mock_view_reservations):
-        with patch('builtins.input', side_effect=['2']):
+        with patch('builtins.input', side_effect=['2', '5']):
             main_menu('test_user')
         mock_available_reservations.assert_called_once_with('test_user')
 
@@ -54,10 +57,54 @@ class TestMainAppFunctions(unittest.TestCase):
     @patch('reservation.available_reservations')
     @patch('report.report_menu')
     def test_main_menu_report_menu(self, mock_report_menu, mock_available_reservations, mock_view_reservations):
-        with patch('builtins.input', side_effect=['3']):
+        with patch('builtins.input', side_effect=['3', '5']):
             main_menu('test_user')
         mock_report_menu.assert_called_once_with('test_user')
 
+    @patch('user.log_out')
+    def test_main_menu_log_out(self, mock_log_out):
+        with patch('builtins.input', side_effect=['4']):
+            main_menu('test_user')
+        mock_log_out.assert_called_once_with('test_user')
+
+    @patch('user.log_out')
+    def test_main_menu_exit_keeps_session(self, mock_log_out):
+        with patch('builtins.input', side_effect=['5']):
+            main_menu('test_user')
+        mock_log_out.assert_not_called()
+
+    @patch('reservation.bookings.availability_index', return_value={})
+    @patch('reservation.console.print')
+    @patch('report.console.print')
+    def test_navigation_keeps_stack_bounded(self, mock_report_print, mock_print, mock_availability_index):
+        depths = []
+
+        def choices():
+            for _ in range(10000):
+                # My reservations, then Back; Available reservations, then Exit; Reservation reports, then Back.
+                yield from (0, 2, 1, -1, 2, 2)
+            yield 4
+
+        menu_choices = choices()
+
+        def show_menu(options, title=None):
+            frame, depth = sys._getframe(), 0
+            while frame is not None:
+                frame, depth = frame.f_back, depth + 1
+            depths.append(depth)
+            return next(menu_choices) % len(options)
+
+        with patch('reservation.show_menu', side_effect=show_menu):
+            main_menu('test_user')
+        self.assertEqual(len(depths), 60001)
+        self.assertEqual(max(depths), max(depths[:6]))
+
+    def test_command_line_mode_does_not_load_rich(self):
+        code = "import sys, cli, api; print(sorted(name for name in sys.modules if name.split('.')[0] == 'rich'))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.stdout.strip(), "[]")
+
     @patch('user.sign_up')
     @patch('user.log_in')
     @patch('main.main_menu')
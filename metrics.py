@@ -0,0 +1,246 @@
+"""Opt-in timers, counters and histograms for the hot paths of the app.
+
+Set RESERVATION_METRICS to the path of a metrics file to turn them on. The file is written as JSON if its name ends
+with .json and in the Prometheus text format otherwise, every RESERVATION_METRICS_INTERVAL seconds (10 by default)
+while the app runs and once more when it exits. When the variable isn't set every call here returns after checking
+a single global, so the instrumented code runs at its usual speed.
+"""
+import atexit
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+import cache
+
+METRICS_ENV = "RESERVATION_METRICS"
+INTERVAL_ENV = "RESERVATION_METRICS_INTERVAL"
+PREFIX = "reservation_"
+# Upper bounds of the histogram buckets in seconds, doubling from 10 microseconds to about 80 seconds.
+BUCKETS = tuple(0.00001 * 2 ** power for power in range(24))
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """Counts observations in fixed buckets, so recording one is O(log buckets) and percentiles are estimated from
+    the bucket bounds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket holding the given fraction of the observations, None if there are
+        none."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, bucket_count in zip(BUCKETS, self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def to_json(self):
+        summary = {'count': self.count, 'sum': self.sum}
+        for fraction in PERCENTILES:
+            summary[f"p{round(fraction * 100)}"] = self.percentile(fraction)
+        return summary
+
+
+class Registry:
+    """Holds the counters and histograms recorded so far and writes them to the metrics file."""
+
+    def __init__(self, path, interval=10.0):
+        self.path = path
+        self.interval = interval
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        # Serializes the writes of the file, the writer thread, the event loop and the pool callbacks of the API
+        # server all record metrics.
+        self.write_lock = threading.Lock()
+        self.last_write = time.monotonic()
+
+    def add(self, name, value):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.write_if_due()
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+        self.write_if_due()
+
+    def write_if_due(self):
+        """Writes the file if the interval has passed and no other thread is writing it. Errors are only counted,
+        they never reach the instrumented code."""
+        if time.monotonic() - self.last_write < self.interval or not self.write_lock.acquire(blocking=False):
+            return
+        try:
+            self.write_locked()
+        except Exception:
+            with self.lock:
+                self.counters['export_errors_total'] = self.counters.get('export_errors_total', 0) + 1
+        finally:
+            self.write_lock.release()
+
+    def to_json(self):
+        with self.lock:
+            return {'counters': dict(self.counters),
+                    'histograms': {name: histogram.to_json() for name, histogram in self.histograms.items()}}
+
+    def to_prometheus(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE {PREFIX}{name} counter", f"{PREFIX}{name} {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{PREFIX}{name}_bucket{{le="{bound:g}"}} {cumulative}')
+                lines += [f'{PREFIX}{name}_bucket{{le="+Inf"}} {histogram.count}',
+                          f"{PREFIX}{name}_sum {histogram.sum}", f"{PREFIX}{name}_count {histogram.count}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Writes the metrics file, replacing it in one go so a scraper never reads half of it."""
+        with self.write_lock:
+            self.write_locked()
+
+    def write_locked(self):
+        """Writes the metrics file through a temporary file of its own. Must be called while holding the write
+        lock."""
+        self.last_write = time.monotonic()
+        with self.lock:
+            # The file cache hit rate tells whether slow loads come from parsing the files again.
+            stats = cache.stats()
+            self.counters['cache_hits_total'] = stats['hits']
+            self.counters['cache_misses_total'] = stats['misses']
+        content = (json.dumps(self.to_json(), indent=2) if self.path.endswith(".json") else self.to_prometheus())
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.write(content)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+registry = None
+
+
+def enable(path, interval=10.0):
+    """Starts recording metrics to the given file, returns the registry."""
+    global registry
+    registry = Registry(path, interval)
+    return registry
+
+
+def disable():
+    """Stops recording metrics and forgets the ones recorded so far."""
+    global registry
+    registry = None
+
+
+def count(name, value=1):
+    """Adds the value to the counter."""
+    if registry is not None:
+        registry.add(name, value)
+
+
+def observe(name, value):
+    """Records a value in the histogram."""
+    if registry is not None:
+        registry.observe(name, value)
+
+
+class Timer:
+    """Times the block it wraps into the histogram of the given name, in seconds."""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start)
+
+
+class NullTimer:
+    """Stands in for Timer while metrics are off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+NULL_TIMER = NullTimer()
+
+
+def timer(name):
+    """Returns a context manager timing its block into the "<name>_seconds" histogram, one that does nothing while
+    metrics are off."""
+    if registry is None:
+        return NULL_TIMER
+    return Timer(name + "_seconds")
+
+
+def timed(name):
+    """Decorates a function to time each call into the "<name>_seconds" histogram."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if registry is None:
+                return function(*args, **kwargs)
+            with Timer(name + "_seconds"):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bytes_read(size):
+    """Counts bytes read from the data files."""
+    count("bytes_read_total", size)
+
+
+def bytes_written(size):
+    """Counts bytes written to the data files."""
+    count("bytes_written_total", size)
+
+
+def write():
+    """Writes the metrics file now, if metrics are on. Errors are ignored, as when the app exits."""
+    if registry is not None:
+        try:
+            registry.write()
+        except Exception:
+            pass
+
+
+if os.environ.get(METRICS_ENV):
+    enable(os.environ[METRICS_ENV], float(os.environ.get(INTERVAL_ENV, 10)))
+atexit.register(write)
@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import metrics
+import storage
+from auth import AuthService
+
+
+class TestMetricsModule(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(metrics.disable)
+        self.registry = metrics.enable(os.path.join(self.directory.name, "metrics.prom"), interval=3600)
+
+    def test_disabled_records_nothing(self):
+        metrics.disable()
+
+        @metrics.timed("work")
+        def work(value):
+            return value * 2
+
+        self.assertEqual(work(21), 42)
+        self.assertIs(metrics.timer("work"), metrics.NULL_TIMER)
+        metrics.count("things")
+        self.assertEqual(self.registry.histograms, {})
+        self.assertEqual(self.registry.counters, {})
+
+    def test_timed_and_counters(self):
+        @metrics.timed("work")
+        def work():
+            return "done"
+
+        for _ in range(3):
+            work()
+        with metrics.timer("block"):
+            pass
+        metrics.count("things", 2)
+        metrics.count("things")
+        self.assertEqual(self.registry.histograms["work_seconds"].count, 3)
+        self.assertEqual(self.registry.histograms["block_seconds"].count, 1)
+        self.assertEqual(self.registry.counters["things"], 3)
+
+    def test_histogram_percentiles(self):
+        histogram = metrics.Histogram()
+        self.assertIsNone(histogram.percentile(0.5))
+        for _ in range(90):
+            histogram.observe(0.000005)
+        for _ in range(10):
+            histogram.observe(0.5)
+        self.assertEqual(histogram.percentile(0.5), metrics.BUCKETS[0])
+        self.assertEqual(histogram.percentile(0.99), 0.00001 * 2 ** 16)
+        self.assertEqual(histogram.to_json()['count'], 100)
+        histogram.observe(1000)
+        self.assertEqual(histogram.percentile(1), float('inf'))
+
+    def test_prometheus_file(self):
+        metrics.count("bookings_total")
+        metrics.observe("load_reservations_seconds", 0.003)
+        metrics.write()
+        with open(self.registry.path) as file:
+            lines = file.read().splitlines()
+        self.assertIn("reservation_bookings_total 1", lines)
+        self.assertIn("# TYPE reservation_load_reservations_seconds histogram", lines)
+        self.assertIn('reservation_load_reservations_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn('reservation_load_reservations_seconds_bucket{le="0.00512"} 1', lines)
+        self.assertIn('reservation_load_reservations_seconds_bucket{le="0.00256"} 0', lines)
+        self.assertIn("reservation_load_reservations_seconds_count 1", lines)
+
+    def test_json_file(self):
+        registry = metrics.enable(os.path.join(self.directory.name, "metrics.json"), interval=0)
+        metrics.observe("report_seconds", 0.2)
+        with open(registry.path) as file:
+            data = json.load(file)
+        self.assertEqual(data['histograms']['report_seconds']['count'], 1)
+        self.assertIn('cache_hits_total', data['counters'])
+
+    def test_concurrent_writes(self):
+        registry = metrics.enable(os.path.join(self.directory.name, "metrics.prom"), interval=0)
+        errors = []
+
+        def record():
+            try:
+                for _ in range(200):
+                    metrics.count("things")
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(registry.counters["things"], 800)
+        metrics.write()
+        with open(registry.path) as file:
+            self.assertIn("reservation_things 800", file.read().splitlines())
+        self.assertEqual([name for name in os.listdir(self.directory.name) if name.endswith(".tmp")], [])
+
+    def test_export_errors_are_not_raised(self):
+        registry = metrics.enable(os.path.join(self.directory.name, "missing", "metrics.prom"), interval=0)
+        metrics.count("things")
+        self.assertEqual(registry.counters["export_errors_total"], 1)
+        with patch("metrics.os.replace", side_effect=OSError):
+            metrics.write()
+
+    def test_bytes_and_bcrypt_are_recorded(self):
+        backend = storage.JsonBackend(os.path.join(self.directory.name, "reservations.json"))
+        backend.add("2023-01-01", "09:00", 1, "user1")
+        backend.read()
+        size = os.path.getsize(backend.path)
+        self.assertEqual(self.registry.counters["bytes_written_total"], size)
+        self.assertEqual(self.registry.counters["bytes_read_total"], size)
+
+        service = AuthService(rounds=4, workers=0)
+        service.hash("Password123").result()
+        self.assertEqual(self.registry.histograms["bcrypt_seconds"].count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from records import Booking, ReservationRecord, pack
+
+
+def slots_mask(slots):
+    """Returns the bitmask of the taken slots in a list of reservations, bit n being set when slot n is taken."""
+    mask = 0
+    for res in slots:
+        mask |= 1 << res['slot']
+    return mask
+
+
+def full_mask(slot_count):
+    """Returns the bitmask of a date and time whose slots 1 to slot_count are all taken."""
+    return (1 << (slot_count + 1)) - 2
+
+
+def taken_mask(reservations, key):
+    """Returns the bitmask of the taken slots for the given reservation key, in constant time when the
+    reservations are indexed or are an occupancy file."""
+    occupancy = getattr(reservations, 'occupancy', None)
+    if occupancy is not None:
+        return occupancy.get(key, 0)
+    return slots_mask(reservations.get(key, []))
+
+
+def split_bounds(packed_records, past=None, now=None):
+    """Returns the start and end indexes of the past reservations among sorted packed reservation records if past
+    is True, of the upcoming ones if past is False and of all of them if past is None, with a binary search."""
+    if past is None:
+        return 0, len(packed_records)
+    now = now or datetime.datetime.now()
+    # A reservation of the current minute is already past once any part of that minute has gone by.
+    minute = now.hour * 60 + now.minute + (1 if now.second or now.microsecond else 0)
+    index = bisect_left(packed_records, pack(now.toordinal(), minute, 0))
+    return (0, index) if past else (index, len(packed_records))
+
+
+def split_user_reservations(packed_records, past=None, now=None):
+    """Splits a sorted sequence of packed reservation records at the current time, returning the ones before it if
+    past is True, the ones from it on if past is False, and all of them if past is None."""
+    start, end = split_bounds(packed_records, past, now)
+    return packed_records[start:end]
+
+
+def page_user_reservations(segments, username, page=0, size=10, date=None):
+    """Returns one page of a user's reservations as its (datetime, slot) pairs, the page number from 0 and the
+    number of pages. The reservations are the (packed records, start, end) segments in chronological order, see
+    split_bounds. Given an ISO date, the page is the one holding the first reservation on or after it. Out of range
+    page numbers are brought back to the first or last page. Only the records of the page are unpacked."""
+    count = sum(end - start for _, start, end in segments)
+    page_count = max(1, -(-count // size))
+    if date is not None:
+        first = pack(datetime.date.fromisoformat(date).toordinal(), 0, 0)
+        page = sum(bisect_left(packed, first, start, end) - start for packed, start, end in segments) // size
+    page = min(max(page, 0), page_count - 1)
+    skip, wanted = page * size, []
+    for packed, start, end in segments:
+        if skip >= end - start:
+            skip -= end - start
+            continue
+        wanted += packed[start + skip:min(end, start + skip + size - len(wanted))]
+        skip = 0
+        if len(wanted) == size:
+            break
+    return unpack_user_reservations(wanted, username), page, page_count
+
+
+def unpack_user_reservations(packed_records, username):
+    """Turns packed reservation records of a user into the (datetime, slot) pairs shown to them."""
+    return [(record.datetime, record.slot) for record in
+            (ReservationRecord.unpack(packed, username) for packed in packed_records)]
+
+
+class IndexedReservations(dict):
+    """Reservations dict that also keeps the bitmask of the taken slots of every date and time, its keys in sorted
+    order for date range lookups, and every user's sorted list of (datetime, slot) pairs. They are built on first
+    use and it must only be changed through book and release afterwards so they stay in sync."""
+
+    def __init__(self, reservations=()):
+        super().__init__(reservations)
+        self._occupancy = None
+        self._by_user = None
+        self.sorted_keys = None
+
+    @property
+    def occupancy(self):
+        """The bitmask of the taken slots of every reservation key."""
+        if self._occupancy is None:
+            self._occupancy = {key: slots_mask(slots) for key, slots in self.items()}
+        return self._occupancy
+
+    @property
+    def by_user(self):
+        """The sorted reservation records of every user, packed into an array of ints per user."""
+        if self._by_user is None:
+            by_user = {}
+            for key, slots in self.items():
+                for res in slots:
+                    by_user.setdefault(res['username'], []).append(ReservationRecord.from_json(key, res).pack())
+            self._by_user = {username: array('q', sorted(packed)) for username, packed in by_user.items()}
+        return self._by_user
+
+    def user_reservations(self, username, past=None, now=None):
+        """Returns the user's sorted (datetime, slot) pairs, only the past or upcoming ones if past is given."""
+        packed_records = split_user_reservations(self.by_user.get(username, array('q')), past, now)
+        return unpack_user_reservations(packed_records, username)
+
+    def user_reservations_page(self, username, past=None, now=None, page=0, size=10, date=None):
+        """Returns one page of the user's sorted (datetime, slot) pairs, the page number and the number of pages,
+        see page_user_reservations."""
+        packed_records = self.by_user.get(username, array('q'))
+        return page_user_reservations([(packed_records, *split_bounds(packed_records, past, now))], username, page,
+                                      size, date)
+
+    def is_reserved(self, key, slot):
+        """Checks if the given slot is taken for the reservation key."""
+        return self.occupancy.get(key, 0) >> slot & 1 == 1
+
+    def is_full(self, key, slot_count):
+        """Checks if slots 1 to slot_count are all taken for the reservation key."""
+        full = full_mask(slot_count)
+        return self.occupancy.get(key, 0) & full == full
+
+    def book(self, key, slot, username):
+        """Adds the reservation, returns False if the slot is already taken."""
+        if self.is_reserved(key, slot):
+            return False
+        if key not in self and self.sorted_keys is not None:
+            insort(self.sorted_keys, key)
+        booking = Booking(slot, username)
+        self[key] = self.get(key, []) + [booking]
+        self.occupancy[key] = self.occupancy.get(key, 0) | 1 << slot
+        if self._by_user is not None:
+            insort(self._by_user.setdefault(username, array('q')), ReservationRecord.from_json(key, booking).pack())
+        return True
+
+    def book_all(self, bookings):
+        """Adds every (key, slot, username) reservation, or none of them if any of their slots is already taken or
+        booked twice. Returns the conflicting ones, found in a single pass over the occupancy masks."""
+        occupancy = self.occupancy
+        wanted = {}
+        conflicts = []
+        for key, slot, username in bookings:
+            bit = 1 << slot
+            if (occupancy.get(key, 0) | wanted.get(key, 0)) & bit:
+                conflicts.append((key, slot, username))
+            else:
+                wanted[key] = wanted.get(key, 0) | bit
+        if not conflicts:
+            for key, slot, username in bookings:
+                self.book(key, slot, username)
+        return conflicts
+
+    def release(self, key, slot, username):
+        """Removes the user's reservation of the slot, returns False if there was none."""
+        slots = self.get(key, [])
+        remaining = [res for res in slots if not (res['slot'] == slot and res['username'] == username)]
+        if len(remaining) == len(slots):
+            return False
+        if remaining:
+            self[key] = remaining
+            self.occupancy[key] = slots_mask(remaining)
+        else:
+            self.occupancy.pop(key, None)
+            del self[key]
+            if self.sorted_keys is not None:
+                del self.sorted_keys[bisect_left(self.sorted_keys, key)]
+        if self._by_user is not None:
+            packed_records = self._by_user[username]
+            index = bisect_left(packed_records,
+                                ReservationRecord.from_json(key, {'slot': slot, 'username': username}).pack())
+            del packed_records[index:index + len(slots) - len(remaining)]
+        return True
+
+    def between(self, start=None, end=None):
+        """Returns the reservations between the start and end dates (inclusive) as a new indexed dict, looking
+        them up by binary search instead of scanning every key."""
+        if self.sorted_keys is None:
+            self.sorted_keys = sorted(self)
+        low = 0 if start is None else bisect_left(self.sorted_keys, start)
+        # "~" sorts after the " HH:MM" part of every key of the end date.
+        high = len(self.sorted_keys) if end is None else bisect_right(self.sorted_keys, end + "~")
+        subset = IndexedReservations({key: self[key] for key in self.sorted_keys[low:high]})
+        if self._occupancy is not None:
+            subset._occupancy = {key: self._occupancy[key] for key in subset}
+        return subset
@@ -0,0 +1,168 @@
+"""A fixed-layout binary file of which slots are taken, so availability can be answered without parsing the
+reservations.
+
+The file starts with a HEADER_SIZE byte header, followed by one record per (day, time) from the epoch day onwards,
+in order of day and then of the time's index on the grid. Each record is the occupancy mask of that time, bit n set
+when slot n is taken, stored little-endian in a fixed number of bytes. Readers map the file into memory and read a
+mask straight from its offset; writers update the records of the times they changed in place.
+"""
+import datetime
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from cache import file_stamp
+
+MAGIC = b"RSVOCC01"
+HEADER_SIZE = 4096
+# Magic, epoch day ordinal, number of days, slot count, bytes per record, the (inode, modification time, size) of
+# the reservations the records were synced with, and the length of the JSON list of times that follows.
+HEADER = struct.Struct("<8sIIIIQQQI")
+GROW_DAYS = 366
+
+
+def record_size(slot_count):
+    """Returns how many bytes the mask of one time takes, bit 0 being unused."""
+    return (slot_count + 8) // 8
+
+
+def day_of(key):
+    """Returns the day ordinal of a "YYYY-MM-DD HH:MM" key."""
+    return datetime.date.fromisoformat(key[:10]).toordinal()
+
+
+def pack_header(epoch, days, slot_count, times, source_stamp):
+    """Returns the HEADER_SIZE bytes of a header."""
+    times_json = json.dumps(list(times)).encode('utf-8')
+    header = HEADER.pack(MAGIC, epoch, days, slot_count, record_size(slot_count), *(source_stamp or (0, 0, 0)),
+                         len(times_json)) + times_json
+    if len(header) > HEADER_SIZE:
+        raise ValueError("Too many times for the occupancy file header.")
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def unpack_header(data):
+    """Returns the epoch, number of days, slot count, record size, source stamp and times of a header."""
+    if len(data) < HEADER.size:
+        raise ValueError("Not an occupancy file.")
+    magic, epoch, days, slot_count, width, inode, mtime, size, times_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an occupancy file.")
+    times = tuple(json.loads(bytes(data[HEADER.size:HEADER.size + times_length])))
+    return epoch, days, slot_count, width, (inode, mtime, size), times
+
+
+def create(path, occupancy, times, slot_count, source_stamp, today=None):
+    """Writes a new occupancy file from a {key: mask} dict, starting from today. Masks of earlier days and of
+    times that aren't on the grid are left out, availability is only ever asked for the days ahead."""
+    epoch = (today or datetime.date.today()).toordinal()
+    time_index = {time: index for index, time in enumerate(times)}
+    width = record_size(slot_count)
+    tracked = [(day_of(key), time_index.get(key[11:]), mask) for key, mask in occupancy.items()]
+    tracked = [(day, index, mask) for day, index, mask in tracked if day >= epoch and index is not None]
+    days = max([GROW_DAYS] + [day - epoch + GROW_DAYS for day, _, _ in tracked])
+    body = bytearray(days * len(times) * width)
+    for day, index, mask in tracked:
+        offset = ((day - epoch) * len(times) + index) * width
+        body[offset:offset + width] = mask.to_bytes(width, 'little')
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(pack_header(epoch, days, slot_count, times, source_stamp))
+            file.write(body)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def update(path, masks, previous_stamp, source_stamp):
+    """Writes the new masks of the {key: mask} dict in place and records the stamp of the reservations they come
+    from, growing the file for days past its end. Nothing is written unless the file was in sync with the
+    reservations as they were before the change, a reader then builds it again. Returns whether it was updated."""
+    if not os.path.exists(path):
+        return False
+    with open(path, 'r+b') as file:
+        epoch, days, slot_count, width, stamp, times = unpack_header(file.read(HEADER_SIZE))
+        if stamp != tuple(previous_stamp or (0, 0, 0)):
+            return False
+        time_index = {time: index for index, time in enumerate(times)}
+        for key, mask in masks.items():
+            day, index = day_of(key) - epoch, time_index.get(key[11:])
+            if day < 0 or index is None:
+                continue
+            if day >= days:
+                days = day + GROW_DAYS
+                file.truncate(HEADER_SIZE + days * len(times) * width)
+            file.seek(HEADER_SIZE + (day * len(times) + index) * width)
+            file.write(mask.to_bytes(width, 'little'))
+        file.seek(0)
+        file.write(pack_header(epoch, days, slot_count, times, source_stamp))
+    return True
+
+
+class OccupancyFile:
+    """Reads the masks of an occupancy file through a read-only memory map shared with every other process that
+    has it open. It can stand in for the reservations wherever only their occupancy is needed."""
+
+    def __init__(self, path):
+        self.path = path
+        self.map = None
+        self.file_stamp = None
+        self.epoch = self.days = self.slot_count = self.width = 0
+        self.source_stamp = None
+        self.times = ()
+        self.time_index = {}
+
+    @property
+    def occupancy(self):
+        """Lets occupancy.taken_mask read the masks as it does those of IndexedReservations."""
+        return self
+
+    def refresh(self):
+        """Maps the file again if it has been replaced or has grown, returns False if there is no file."""
+        stamp = file_stamp(self.path)
+        if stamp is None:
+            self.close()
+            return False
+        if self.map is None or stamp[0] != self.file_stamp[0] or stamp[2] != self.file_stamp[2]:
+            self.close()
+            with open(self.path, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.file_stamp = stamp
+        (self.epoch, days, self.slot_count, self.width, self.source_stamp,
+         times) = unpack_header(self.map[:HEADER_SIZE])
+        if times != self.times:
+            self.times = times
+            self.time_index = {time: index for index, time in enumerate(times)}
+        # The file may have grown since it was mapped, only the days inside the map can be read.
+        self.days = min(days, (len(self.map) - HEADER_SIZE) // max(1, len(times) * self.width))
+        return True
+
+    def close(self):
+        """Unmaps the file."""
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def synced_with(self, source_stamp):
+        """Checks if the masks were last synced with the reservations of the given file stamp."""
+        return self.source_stamp == tuple(source_stamp or (0, 0, 0))
+
+    def matches(self, times, slot_count):
+        """Checks if the file was laid out for the given grid of times and slot count."""
+        return self.times == tuple(times) and self.slot_count == slot_count
+
+    def get(self, key, default=0):
+        """Returns the occupancy mask of the "YYYY-MM-DD HH:MM" key, the default for the days before the epoch and
+        the times off the grid."""
+        index = self.time_index.get(key[11:])
+        day = day_of(key) - self.epoch
+        if index is None or not 0 <= day < self.days:
+            return default
+        offset = HEADER_SIZE + (day * len(self.times) + index) * self.width
+        return int.from_bytes(self.map[offset:offset + self.width], 'little')
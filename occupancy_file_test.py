@@ -0,0 +1,87 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import occupancy
+import occupancy_file
+
+TIMES = ("09:00", "11:00", "13:00")
+TODAY = datetime.date(2099, 1, 1)
+
+
+class TestOccupancyFileModule(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "occupancy.bin")
+        self.index = occupancy_file.OccupancyFile(self.path)
+
+    def tearDown(self):
+        self.index.close()
+        self.directory.cleanup()
+
+    def test_create_and_read(self):
+        occupancy_file.create(self.path, {"2099-01-01 09:00": 0b1010, "2099-01-02 13:00": 0b10,
+                                          "2098-12-31 09:00": 0b10, "2099-01-01 10:00": 0b10},
+                              TIMES, 3, (1, 2, 3), today=TODAY)
+        self.assertTrue(self.index.refresh())
+        self.assertTrue(self.index.matches(TIMES, 3))
+        self.assertFalse(self.index.matches(TIMES, 4))
+        self.assertTrue(self.index.synced_with((1, 2, 3)))
+        self.assertEqual(self.index.get("2099-01-01 09:00"), 0b1010)
+        self.assertEqual(self.index.get("2099-01-02 13:00"), 0b10)
+        self.assertEqual(self.index.get("2099-01-02 11:00"), 0)
+        # Days before the epoch and times off the grid aren't kept.
+        self.assertEqual(self.index.get("2098-12-31 09:00"), 0)
+        self.assertEqual(self.index.get("2099-01-01 10:00"), 0)
+        self.assertEqual(occupancy.taken_mask(self.index, "2099-01-01 09:00"), 0b1010)
+
+    def test_update_in_place(self):
+        occupancy_file.create(self.path, {}, TIMES, 3, (1, 2, 3), today=TODAY)
+        self.index.refresh()
+        self.assertTrue(occupancy_file.update(self.path, {"2099-01-03 11:00": 0b110}, (1, 2, 3), (1, 2, 4)))
+        self.index.refresh()
+        self.assertEqual(self.index.get("2099-01-03 11:00"), 0b110)
+        self.assertTrue(self.index.synced_with((1, 2, 4)))
+
+    def test_update_grows_file(self):
+        occupancy_file.create(self.path, {}, TIMES, 3, None, today=TODAY)
+        self.index.refresh()
+        self.assertEqual(self.index.get("2101-01-01 09:00"), 0)
+        self.assertTrue(occupancy_file.update(self.path, {"2101-01-01 09:00": 0b1110}, None, (1, 2, 3)))
+        self.index.refresh()
+        self.assertEqual(self.index.get("2101-01-01 09:00"), 0b1110)
+        self.assertGreater(self.index.days, datetime.date(2101, 1, 1).toordinal() - TODAY.toordinal())
+
+    def test_update_skipped_when_out_of_sync(self):
+        self.assertFalse(occupancy_file.update(self.path, {"2099-01-01 09:00": 0b10}, None, (1, 2, 3)))
+        occupancy_file.create(self.path, {}, TIMES, 3, (1, 2, 3), today=TODAY)
+        self.assertFalse(occupancy_file.update(self.path, {"2099-01-01 09:00": 0b10}, (9, 9, 9), (1, 2, 4)))
+        self.index.refresh()
+        self.assertEqual(self.index.get("2099-01-01 09:00"), 0)
+        self.assertTrue(self.index.synced_with((1, 2, 3)))
+
+    def test_wide_masks(self):
+        occupancy_file.create(self.path, {"2099-01-01 09:00": 1 << 40 | 0b10}, TIMES, 40, None, today=TODAY)
+        self.index.refresh()
+        self.assertEqual(self.index.width, 6)
+        self.assertEqual(self.index.get("2099-01-01 09:00"), 1 << 40 | 0b10)
+
+    def test_refresh_follows_replaced_file(self):
+        self.assertFalse(self.index.refresh())
+        occupancy_file.create(self.path, {"2099-01-01 09:00": 0b10}, TIMES, 3, None, today=TODAY)
+        self.index.refresh()
+        occupancy_file.create(self.path, {"2099-01-01 09:00": 0b100}, TIMES, 3, None, today=TODAY)
+        self.index.refresh()
+        self.assertEqual(self.index.get("2099-01-01 09:00"), 0b100)
+
+    def test_not_an_occupancy_file(self):
+        with open(self.path, 'wb') as file:
+            file.write(b"x" * occupancy_file.HEADER_SIZE)
+        with self.assertRaises(ValueError):
+            self.index.refresh()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import datetime
+import unittest
+
+import occupancy
+from occupancy import IndexedReservations
+
+
+class TestOccupancyModule(unittest.TestCase):
+
+    def setUp(self):
+        self.reservations = IndexedReservations({
+            "2023-01-01 09:00": [{"slot": 1, "username": "user1"}, {"slot": 3, "username": "user2"}],
+            "2023-01-02 11:00": [{"slot": 2, "username": "user1"}],
+            "2023-01-04 09:00": [{"slot": 1, "username": "user3"}],
+        })
+
+    def test_masks(self):
+        self.assertEqual(occupancy.slots_mask([{"slot": 1}, {"slot": 3}]), 0b1010)
+        self.assertEqual(occupancy.full_mask(3), 0b1110)
+        self.assertEqual(occupancy.taken_mask(self.reservations, "2023-01-01 09:00"), 0b1010)
+        self.assertEqual(occupancy.taken_mask(dict(self.reservations), "2023-01-01 09:00"), 0b1010)
+        self.assertEqual(occupancy.taken_mask(self.reservations, "2023-01-03 09:00"), 0)
+
+    def test_is_reserved(self):
+        self.assertTrue(self.reservations.is_reserved("2023-01-01 09:00", 3))
+        self.assertFalse(self.reservations.is_reserved("2023-01-01 09:00", 2))
+        self.assertFalse(self.reservations.is_reserved("2023-01-03 09:00", 1))
+
+    def test_book_updates_index(self):
+        self.assertTrue(self.reservations.book("2023-01-01 09:00", 2, "user3"))
+        self.assertFalse(self.reservations.book("2023-01-01 09:00", 2, "user4"))
+        self.assertTrue(self.reservations.book("2023-01-03 09:00", 1, "user4"))
+        self.assertEqual(self.reservations.occupancy["2023-01-01 09:00"], 0b1110)
+        self.assertEqual(len(self.reservations["2023-01-01 09:00"]), 3)
+        self.assertEqual(list(self.reservations.between("2023-01-03", "2023-01-03")), ["2023-01-03 09:00"])
+
+    def test_book_all(self):
+        self.assertEqual(self.reservations.book_all([("2023-01-08 09:00", 1, "user1"), ("2023-01-08 09:00", 1, "user2"),
+                                                     ("2023-01-01 09:00", 3, "user1")]),
+                         [("2023-01-08 09:00", 1, "user2"), ("2023-01-01 09:00", 3, "user1")])
+        self.assertNotIn("2023-01-08 09:00", self.reservations)
+        series = [("2023-01-08 09:00", 1, "user1"), ("2023-01-15 09:00", 1, "user1")]
+        self.assertEqual(self.reservations.book_all(series), [])
+        self.assertEqual(self.reservations.occupancy["2023-01-15 09:00"], 0b10)
+        self.assertEqual(len(self.reservations.user_reservations("user1")), 4)
+
+    def test_release_updates_index(self):
+        self.reservations.between()
+        self.assertFalse(self.reservations.release("2023-01-01 09:00", 1, "user2"))
+        self.assertTrue(self.reservations.release("2023-01-01 09:00", 1, "user1"))
+        self.assertEqual(self.reservations.occupancy["2023-01-01 09:00"], 0b1000)
+        self.assertTrue(self.reservations.release("2023-01-02 11:00", 2, "user1"))
+        self.assertNotIn("2023-01-02 11:00", self.reservations)
+        self.assertNotIn("2023-01-02 11:00", self.reservations.occupancy)
+        self.assertEqual(list(self.reservations.between("2023-01-01", "2023-01-03")), ["2023-01-01 09:00"])
+
+    def test_release_last_booking_on_fresh_index(self):
+        reservations = IndexedReservations({"2023-01-02 11:00": [{"slot": 2, "username": "user1"}]})
+        self.assertTrue(reservations.release("2023-01-02 11:00", 2, "user1"))
+        self.assertEqual(reservations, {})
+        self.assertEqual(reservations.occupancy, {})
+
+    def test_between(self):
+        self.assertEqual(list(self.reservations.between("2023-01-02", "2023-01-04")),
+                         ["2023-01-02 11:00", "2023-01-04 09:00"])
+        self.assertEqual(list(self.reservations.between(end="2023-01-01")), ["2023-01-01 09:00"])
+        subset = self.reservations.between("2023-01-01", "2023-01-01")
+        self.assertTrue(subset.is_reserved("2023-01-01 09:00", 1))
+        self.assertEqual(subset, {"2023-01-01 09:00": self.reservations["2023-01-01 09:00"]})
+
+    def test_user_reservations(self):
+        self.assertEqual(self.reservations.user_reservations("user1"),
+                         [(datetime.datetime(2023, 1, 1, 9, 0), 1), (datetime.datetime(2023, 1, 2, 11, 0), 2)])
+        now = datetime.datetime(2023, 1, 2, 11, 0)
+        self.assertEqual(self.reservations.user_reservations("user1", past=True, now=now),
+                         [(datetime.datetime(2023, 1, 1, 9, 0), 1)])
+        self.assertEqual(self.reservations.user_reservations("user1", past=False, now=now),
+                         [(datetime.datetime(2023, 1, 2, 11, 0), 2)])
+        self.assertEqual(self.reservations.user_reservations("nobody"), [])
+
+    def test_user_reservations_page(self):
+        reservations = IndexedReservations({f"2023-01-{day:02d} 09:00": [{"slot": 1, "username": "user1"}]
+                                            for day in range(1, 26)})
+        found = reservations.user_reservations("user1")
+        self.assertEqual(reservations.user_reservations_page("user1", size=10), (found[:10], 0, 3))
+        self.assertEqual(reservations.user_reservations_page("user1", page=2, size=10), (found[20:], 2, 3))
+        self.assertEqual(reservations.user_reservations_page("user1", page=7, size=10), (found[20:], 2, 3))
+        self.assertEqual(reservations.user_reservations_page("user1", size=10, date="2023-01-15"), (found[10:20], 1, 3))
+        self.assertEqual(reservations.user_reservations_page("user1", size=10, date="2024-01-01"), (found[20:], 2, 3))
+        now = datetime.datetime(2023, 1, 21, 8, 0)
+        self.assertEqual(reservations.user_reservations_page("user1", past=False, now=now, size=10),
+                         (found[20:], 0, 1))
+        self.assertEqual(reservations.user_reservations_page("user1", past=True, now=now, page=1, size=10),
+                         (found[10:20], 1, 2))
+        self.assertEqual(reservations.user_reservations_page("nobody"), ([], 0, 1))
+
+    def test_page_spans_segments(self):
+        first = IndexedReservations({f"2023-01-{day:02d} 09:00": [{"slot": 1, "username": "user1"}]
+                                     for day in range(1, 8)}).by_user["user1"]
+        second = IndexedReservations({f"2023-02-{day:02d} 09:00": [{"slot": 1, "username": "user1"}]
+                                      for day in range(1, 8)}).by_user["user1"]
+        segments = [(first, 2, 7), (second, 0, 7)]
+        rows, page, page_count = occupancy.page_user_reservations(segments, "user1", page=1, size=4)
+        self.assertEqual((page, page_count), (1, 3))
+        self.assertEqual([when.day for when, _ in rows], [7, 1, 2, 3])
+        rows, page, _ = occupancy.page_user_reservations(segments, "user1", size=4, date="2023-02-06")
+        self.assertEqual(([when.day for when, _ in rows], page), ([4, 5, 6, 7], 2))
+
+    def test_user_index_follows_book_and_release(self):
+        self.reservations.user_reservations("user1")
+        self.reservations.book("2023-01-01 13:00", 1, "user1")
+        self.reservations.release("2023-01-01 09:00", 1, "user1")
+        self.reservations.book("2023-01-05 09:00", 1, "user5")
+        self.assertEqual(self.reservations.user_reservations("user1"),
+                         [(datetime.datetime(2023, 1, 1, 13, 0), 1), (datetime.datetime(2023, 1, 2, 11, 0), 2)])
+        self.assertEqual(self.reservations.user_reservations("user5"), [(datetime.datetime(2023, 1, 5, 9, 0), 1)])
+        rebuilt = IndexedReservations(self.reservations).by_user
+        self.assertEqual({username: list(packed) for username, packed in self.reservations.by_user.items()},
+                         {username: list(packed) for username, packed in rebuilt.items()})
+
+    def test_book_does_not_change_earlier_subsets(self):
+        subset = self.reservations.between("2023-01-01", "2023-01-01")
+        self.reservations.book("2023-01-01 09:00", 2, "user3")
+        self.assertEqual(len(subset["2023-01-01 09:00"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import datetime
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+_numbers = {}
+
+
+def intern_number(number):
+    """Returns a shared int object for the number, so millions of records with the same date don't each hold a
+    copy of it."""
+    return _numbers.setdefault(number, number)
+
+
+class Booking(Mapping):
+    """One slot of a date and time and the user holding it, stored in two slots instead of a dict. It still reads
+    like the {'slot': ..., 'username': ...} dicts of the JSON document, and compares equal to them."""
+
+    __slots__ = ('slot', 'username')
+
+    def __init__(self, slot, username):
+        self.slot = slot
+        self.username = sys.intern(username)
+
+    def __getitem__(self, name):
+        if name == 'slot':
+            return self.slot
+        if name == 'username':
+            return self.username
+        raise KeyError(name)
+
+    def __iter__(self):
+        return iter(('slot', 'username'))
+
+    def __len__(self):
+        return 2
+
+    def __repr__(self):
+        return f"Booking(slot={self.slot!r}, username={self.username!r})"
+
+    def to_json(self):
+        """Returns the dict written to the JSON document."""
+        return {'slot': self.slot, 'username': self.username}
+
+
+def pack(day, time, slot):
+    """Packs a date ordinal, minutes after midnight and slot number into one int that sorts chronologically."""
+    return day << 27 | time << 16 | slot
+
+
+@dataclass(slots=True, frozen=True, order=True)
+class ReservationRecord:
+    """A reservation with its date as an ordinal and its time as minutes after midnight."""
+    day: int
+    time: int
+    slot: int
+    username: str
+
+    @classmethod
+    def unpack(cls, packed, username):
+        """Builds the record of the given user back from its packed int."""
+        return cls(packed >> 27, packed >> 16 & 0x7ff, packed & 0xffff, username)
+
+    @classmethod
+    def from_json(cls, key, entry):
+        """Builds the record from a reservation key and one of its {'slot': ..., 'username': ...} entries."""
+        date, time = key.split()
+        hours, minutes = time.split(":")
+        return cls(intern_number(datetime.date.fromisoformat(date).toordinal()),
+                   intern_number(int(hours) * 60 + int(minutes)), entry['slot'], sys.intern(entry['username']))
+
+    @property
+    def date(self):
+        return datetime.date.fromordinal(self.day)
+
+    @property
+    def datetime(self):
+        return datetime.datetime.combine(self.date, datetime.time(*divmod(self.time, 60)))
+
+    @property
+    def key(self):
+        """The "YYYY-MM-DD HH:MM" key of the reservation in the JSON document."""
+        return f"{self.date.isoformat()} {self.time // 60:02d}:{self.time % 60:02d}"
+
+    def pack(self):
+        """Returns the date, time and slot of the record packed into one int, see the pack function."""
+        return pack(self.day, self.time, self.slot)
+
+    def to_json(self):
+        """Returns the reservation key and the entry written under it in the JSON document."""
+        return self.key, {'slot': self.slot, 'username': self.username}
+
+
+@dataclass(slots=True)
+class User:
+    """A user account with its bcrypt password hash."""
+    username: str
+    password: str
+    first_name: str
+    last_name: str
+
+    def __post_init__(self):
+        self.username = sys.intern(self.username)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['username'], data['password'], data['first_name'], data['last_name'])
+
+    def to_dict(self):
+        return {
+            'username': self.username,
+            'password': self.password,
+            'first_name': self.first_name,
+            'last_name': self.last_name
+        }
+
+
+def decode(entry):
+    """JSON object hook turning the {'slot': ..., 'username': ...} entries of the reservations into bookings."""
+    if len(entry) == 2 and 'slot' in entry and 'username' in entry:
+        return Booking(entry['slot'], entry['username'])
+    return entry
+
+
+def encode(value):
+    """JSON default hook writing bookings and users back in their dict form."""
+    if isinstance(value, Booking):
+        return value.to_json()
+    if isinstance(value, User):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def iter_records(reservations):
+    """Yields the reservations of a reservations dict as records."""
+    for key, slots in reservations.items():
+        for entry in slots:
+            yield ReservationRecord.from_json(key, entry)
+
+
+def to_reservations(records):
+    """Builds a reservations dict back from records."""
+    reservations = {}
+    for record in records:
+        key, entry = record.to_json()
+        reservations.setdefault(key, []).append(Booking(entry['slot'], entry['username']))
+    return reservations
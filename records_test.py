@@ -0,0 +1,64 @@
+import datetime
+import json
+import pickle
+import unittest
+
+import records
+from records import Booking, ReservationRecord, User
+
+
+class TestRecordsModule(unittest.TestCase):
+
+    def test_booking_reads_like_a_dict(self):
+        booking = Booking(2, "user1")
+        self.assertEqual(booking['slot'], 2)
+        self.assertEqual(booking.get('username'), "user1")
+        self.assertEqual(booking, {'slot': 2, 'username': "user1"})
+        self.assertEqual({'slot': 2, 'username': "user1"}, booking)
+        self.assertNotEqual(booking, {'slot': 3, 'username': "user1"})
+        self.assertEqual(dict(booking), {'slot': 2, 'username': "user1"})
+        with self.assertRaises(KeyError):
+            booking['date']
+        with self.assertRaises(AttributeError):
+            booking.other = 1
+
+    def test_json_round_trip(self):
+        document = '{"2023-01-01 09:00": [{"slot": 1, "username": "user1"}, {"slot": 2, "username": "user1"}]}'
+        reservations = json.loads(document, object_hook=records.decode)
+        first, second = reservations["2023-01-01 09:00"]
+        self.assertIsInstance(first, Booking)
+        self.assertIs(first.username, second.username)
+        self.assertEqual(json.loads(json.dumps(reservations, default=records.encode)), json.loads(document))
+        self.assertEqual(json.loads(json.dumps(User("a", "b", "c", "d"), default=records.encode))['last_name'], "d")
+
+    def test_pickle(self):
+        self.assertEqual(pickle.loads(pickle.dumps(Booking(1, "user1"))), Booking(1, "user1"))
+
+    def test_reservation_record(self):
+        record = ReservationRecord.from_json("2023-01-02 09:30", {'slot': 3, 'username': "user1"})
+        self.assertEqual(record.day, datetime.date(2023, 1, 2).toordinal())
+        self.assertEqual(record.time, 9 * 60 + 30)
+        self.assertEqual(record.datetime, datetime.datetime(2023, 1, 2, 9, 30))
+        self.assertEqual(record.to_json(), ("2023-01-02 09:30", {'slot': 3, 'username': "user1"}))
+        self.assertLess(ReservationRecord.from_json("2023-01-01 23:00", {'slot': 3, 'username': "user1"}), record)
+
+    def test_pack(self):
+        record = ReservationRecord.from_json("2023-01-02 09:30", {'slot': 40, 'username': "user1"})
+        self.assertEqual(ReservationRecord.unpack(record.pack(), "user1"), record)
+        later = ReservationRecord.from_json("2023-01-02 09:45", {'slot': 1, 'username': "user1"})
+        self.assertLess(record.pack(), later.pack())
+
+    def test_records_round_trip(self):
+        reservations = {"2023-01-01 09:00": [{"slot": 1, "username": "user1"}],
+                        "2023-01-02 11:00": [{"slot": 2, "username": "user2"}, {"slot": 3, "username": "user1"}]}
+        self.assertEqual(records.to_reservations(records.iter_records(reservations)), reservations)
+
+    def test_user(self):
+        data = {'username': "user1", 'password': "hash", 'first_name': "Test", 'last_name': "User"}
+        user = User.from_dict(data)
+        self.assertEqual(user.to_dict(), data)
+        self.assertFalse(hasattr(user, '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import datetime
+
+MAX_OCCURRENCES = 520
+
+
+def occurrences(start, every_days=7, until=None, count=None):
+    """Returns the ISO dates of a series starting on the start date and repeating every given number of days,
+    either up to the until date (inclusive) or for count occurrences. Dates can be datetime.date objects or ISO
+    strings. Raises ValueError for a series without an end, or one longer than MAX_OCCURRENCES."""
+    if isinstance(start, str):
+        start = datetime.date.fromisoformat(start)
+    if isinstance(until, str):
+        until = datetime.date.fromisoformat(until)
+    if every_days < 1:
+        raise ValueError("A series must repeat every 1 day or more.")
+    if (until is None) == (count is None):
+        raise ValueError("A series ends either on a date or after a number of occurrences.")
+    if until is not None:
+        count = (until - start).days // every_days + 1 if until >= start else 0
+    if count < 1:
+        raise ValueError("A series needs at least one occurrence.")
+    if count > MAX_OCCURRENCES:
+        raise ValueError(f"A series can't have more than {MAX_OCCURRENCES} occurrences.")
+    step = datetime.timedelta(days=every_days)
+    return [(start + step * index).isoformat() for index in range(count)]
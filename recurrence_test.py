@@ -0,0 +1,27 @@
+import datetime
+import unittest
+
+from recurrence import MAX_OCCURRENCES, occurrences
+
+
+class TestRecurrenceModule(unittest.TestCase):
+
+    def test_count(self):
+        self.assertEqual(occurrences("2024-01-01", count=3), ["2024-01-01", "2024-01-08", "2024-01-15"])
+        self.assertEqual(occurrences(datetime.date(2024, 1, 1), 2, count=2), ["2024-01-01", "2024-01-03"])
+
+    def test_until(self):
+        self.assertEqual(occurrences("2024-01-01", 7, until="2024-01-15"), ["2024-01-01", "2024-01-08", "2024-01-15"])
+        self.assertEqual(occurrences("2024-01-01", 7, until="2024-01-14"), ["2024-01-01", "2024-01-08"])
+        self.assertEqual(len(occurrences("2024-01-01", until="2024-12-29")), 52)
+
+    def test_invalid_series(self):
+        for kwargs in ({}, {'count': 2, 'until': "2024-02-01"}, {'count': 0}, {'until': "2023-12-31"},
+                       {'every_days': 0, 'count': 2}, {'every_days': 1, 'count': MAX_OCCURRENCES + 1}):
+            with self.subTest(kwargs=kwargs):
+                with self.assertRaises(ValueError):
+                    occurrences("2024-01-01", **kwargs)
+
+
+if __name__ == '__main__':
+    unittest.main()
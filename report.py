@@ -1,25 +1,30 @@
-import json
-import os
 from collections import Counter
 from rich.console import Console
 from rich.prompt import Prompt
 from rich.table import Table
 from datetime import datetime
 
-import main
+import aggregates
+import bookings
+import metrics
 import reservation
+from columnar import ReservationColumns
 
 console = Console()
 
 
 def load_reservations():
     """Loads the reservations that have been made until now."""
-    if not os.path.exists("reservations.json"):
-        return {}
-    with open("reservations.json", 'r') as file:
-        return json.load(file)
+    return bookings.load_reservations()
 
 
+def load_reservation_columns():
+    """Loads the reservations into a columnar table, for analytics over long histories. Its most_booked method
+    gives the same rankings as get_most_booked_days_and_times without looping over every reservation in Python."""
+    return ReservationColumns.from_reservations(load_reservations())
+
+
+@metrics.timed("report")
 def get_most_booked_days_and_times(reservations, username=None):
     """Gets the most booked days of the week and their times of the day."""
     day_counter = Counter()
@@ -42,6 +47,7 @@ def get_most_booked_days_and_times(reservations, username=None):
     return most_common_days, most_common_times, most_common_weekly_times
 
 
+@metrics.timed("show_report_render")
 def show_report(most_common_days, most_common_times, most_common_weekly_times, report_type, title="Reservation Report"):
     """Displays the report relative to the report type."""
     console.print(f"[bold blue]{title}[/bold blue]", justify="center")
@@ -88,8 +94,7 @@ def show_report(most_common_days, most_common_times, most_common_weekly_times, r
 
 def generate_report(username=None):
     """Generates the report for either all users or the specified user."""
-    reservations = load_reservations()
-    most_common_days, most_common_times, most_common_weekly_times = get_most_booked_days_and_times(reservations, username)
+    most_common_days, most_common_times, most_common_weekly_times = aggregates.most_booked(username)
 
     title = "Reservation Report for All Users" if username is None else f"Reservation Report for {username}"
 
@@ -119,4 +124,4 @@ def report_menu(username):
         elif choice == 1:
             generate_report(username)
         elif choice == 2:
-            main.main_menu(username)
+            return
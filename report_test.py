@@ -1,17 +1,21 @@
 import unittest
 from unittest.mock import patch, MagicMock
+import cache
 import report
 import json
 
 
 class TestReportModule(unittest.TestCase):
 
-    @patch("report.os.path.exists", return_value=False)
+    def setUp(self):
+        cache.clear()
+
+    @patch("storage.os.path.exists", return_value=False)
     def test_load_reservations_file_not_exist(self, mock_exists):
         result = report.load_reservations()
         self.assertEqual(result, {})
 
-    @patch("report.os.path.exists", return_value=True)
+    @patch("storage.os.path.exists", return_value=True)
     @patch("builtins.open", new_callable=unittest.mock.mock_open,
            read_data='{"2024-08-04 10:00": [{"username": "test_user"}]}')
     def test_load_reservations_file_exist(self, mock_open, mock_exists):
@@ -53,26 +57,25 @@ class TestReportModule(unittest.TestCase):
 
         self.assertTrue(mock_print.called)
 
-    @patch("report.load_reservations", return_value={"2024-08-04 10:00": [{"username": "test_user"}]})
-    @patch("report.get_most_booked_days_and_times", return_value=([], [], []))
+    @patch("report.load_reservations")
+    @patch("report.aggregates.most_booked", return_value=([], [], []))
     @patch("report.show_report")
     @patch("report.Prompt.ask", side_effect=["4"])
-    def test_generate_report(self, mock_ask, mock_show_report, mock_get_most_booked_days_and_times,
-                             mock_load_reservations):
+    def test_generate_report(self, mock_ask, mock_show_report, mock_most_booked, mock_load_reservations):
         report.generate_report()
-        mock_load_reservations.assert_called_once()
-        mock_get_most_booked_days_and_times.assert_called_once()
+        mock_load_reservations.assert_not_called()
+        mock_most_booked.assert_called_once_with(None)
         mock_show_report.assert_not_called()
 
-    @patch("report.load_reservations", return_value={"2024-08-04 10:00": [{"username": "test_user"}]})
-    @patch("report.get_most_booked_days_and_times", return_value=([], [], []))
+    @patch("report.load_reservations")
+    @patch("report.aggregates.most_booked", return_value=([], [], []))
     @patch("report.show_report")
     @patch("report.Prompt.ask", side_effect=["1", "4"])
-    def test_generate_report_with_report_type(self, mock_ask, mock_show_report, mock_get_most_booked_days_and_times,
+    def test_generate_report_with_report_type(self, mock_ask, mock_show_report, mock_most_booked,
                                               mock_load_reservations):
-        report.generate_report()
-        mock_load_reservations.assert_called_once()
-        mock_get_most_booked_days_and_times.assert_called_once()
+        report.generate_report("test_user")
+        mock_load_reservations.assert_not_called()
+        mock_most_booked.assert_called_once_with("test_user")
         mock_show_report.assert_called_once()
 
 
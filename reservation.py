@@ -1,103 +1,125 @@
-import json
-import os
 import datetime
 from rich.console import Console
 from rich.table import Table
-from rich.prompt import Prompt, Confirm
-import main
-
-TIME_SLOTS = ["09:00", "11:00", "13:00", "15:00", "17:00", "19:00", "21:00", "23:00"]
+from rich.prompt import Prompt, IntPrompt, Confirm
+import bookings
+import metrics
+import resources
+from availability import free_times, full_times
+from bookings import load_reservations, save_reservations, is_slot_reserved, is_time_full
+from recurrence import occurrences
+from storage import get_reservation_key
 
 console = Console(color_system="windows")
 
 
-def load_reservations():
-    """Loads the reservations that have been made until now."""
-    if not os.path.exists("reservations.json"):
-        return {}
-    with open("reservations.json", 'r') as file:
-        return json.load(file)
-
-
-def save_reservations(reservations):
-    """Saves the reservations with the new changes made to them."""
-    with open("reservations.json", 'w') as file:
-        json.dump(reservations, file)
-
-
-def get_reservation_key(date, time):
-    """Gets the reservation key for the given date and time."""
-    return f"{date} {time}"
-
-
-def is_slot_reserved(reservations, date, time, slot):
-    """Checks if the given slot is reserved for the given date and time."""
-    key = get_reservation_key(date, time)
-    return key in reservations and any(reservation['slot'] == slot for reservation in reservations[key])
-
-
 def make_reservation(date, time, slot, username):
-    """Creates a new reservation for the given date and time and slot."""
-    reservations = load_reservations()
-    key = get_reservation_key(date, time)
-    if key not in reservations:
-        reservations[key] = []
-    reservations[key].append({'slot': slot, 'username': username})
-    save_reservations(reservations)
+    """Creates a new reservation for the given date and time and slot, unless someone else has taken the slot
+    in the meantime."""
+    if not bookings.book(date, time, slot, username):
+        console.print("[bold red]This slot has just been reserved by someone else.[/bold red]")
+        return False
     console.print("[bold green]Reservation confirmed.[/bold green]")
+    return True
 
 
 def show_menu(options, title="Choose an option"):
     """Enumerates the options of each menu and returns the index of the chosen option."""
-    table = Table(title=title, show_header=True, header_style="bold magenta")
-    table.add_column("Index", justify="right", style="cyan", no_wrap=True)
-    table.add_column("Option", style="yellow")
+    with metrics.timer("show_menu_render"):
+        table = Table(title=title, show_header=True, header_style="bold magenta")
+        table.add_column("Index", justify="right", style="cyan", no_wrap=True)
+        table.add_column("Option", style="yellow")
 
-    for idx, option in enumerate(options, 1):
-        table.add_row(str(idx), option)
+        for idx, option in enumerate(options, 1):
+            table.add_row(str(idx), option)
 
-    console.print(table)
+        console.print(table)
     choice = Prompt.ask("Enter your choice", choices=[str(i) for i in range(1, len(options) + 1)], default="1")
     return int(choice) - 1
 
 
 def time_menu(date, username):
-    """Checks for the available times for the given date and shows them."""
-    reservations = load_reservations()
-    today = datetime.date.today()
-    current_time = datetime.datetime.now().time()
-    options = [
-        time for time in TIME_SLOTS
-        if not all(is_slot_reserved(reservations, date, time, slot) for slot in range(1, 4)) and
-           (date != today.isoformat() or datetime.datetime.strptime(time, "%H:%M").time() > current_time)
-    ]
-    if not options:
+    """Checks for the available times for the given date and shows them, along with the full ones whose waitlist
+    the user can join."""
+    index = bookings.availability_index(date, date)
+    now = datetime.datetime.now()
+    times = [time for _, time in free_times(date, date, now=now, reservations=index)]
+    full = full_times(date, date, now=now, reservations=index)
+    if full:
+        # Leaving out the full times the user already holds a slot at needs the reservations themselves.
+        full = full_times(date, date, username, now=now, reservations=load_reservations(date, date))
+    full = [time for _, time in full]
+    if not times and not full:
         console.print("[bold red]No available times for this date.[/bold red]")
         return
 
-    options.append("Back")
+    options = times + [f"{time} (full, join waitlist)" for time in full] + ["Back"]
     choice = show_menu(options, title=f"[bold blue]Time Menu for {date}[/bold blue]")
     if choice == len(options) - 1:
         return
-    selected_time = options[choice]
-    slot_menu(date, selected_time, username)
+    if choice >= len(times):
+        confirm_waitlist(date, full[choice - len(times)], username)
+        return
+    slot_menu(date, times[choice], username)
+
+
+def confirm_waitlist(date, time, username):
+    """Puts the user on the waitlist of a full time if they confirm it."""
+    if not Confirm.ask(f"Every slot of {date} at {time} is taken. Do you want to join the waitlist?"):
+        return
+    position = bookings.join_waitlist(date, time, username)
+    if position is None:
+        console.print("[bold yellow]A slot has just been freed at this time.[/bold yellow]")
+        slot_menu(date, time, username)
+        return
+    console.print(f"[bold green]You are number {position} on the waitlist, the next freed slot will be booked "
+                  f"for you in turn.[/bold green]")
 
 
 def slot_menu(date, time, username):
     """Checks for the available slots for the given date and time and shows them."""
-    reservations = load_reservations()
-    options = [f"Slot {i}" for i in range(1, 4) if not is_slot_reserved(reservations, date, time, i)]
-    if not options:
+    index = bookings.availability_index(date, date)
+    slot_count = resources.get_resource().slot_count
+    free = [i for i in range(1, slot_count + 1) if not is_slot_reserved(index, date, time, i)]
+    if not free:
         console.print("[bold red]No available slots for this time.[/bold red]")
         return
 
-    options.append("Back")
+    options = [f"Slot {i}" for i in free] + ["Repeat every week or every few days", "Back"]
     choice = show_menu(options, title=f"[bold blue]Slot Menu for {date} at {time}[/bold blue]")
     if choice == len(options) - 1:
         return
-    selected_slot = int(options[choice].split()[1])
-
-    confirm_reservation(date, time, selected_slot, username)
+    if choice == len(options) - 2:
+        recurring_reservation(date, time, free, username)
+        return
+    confirm_reservation(date, time, free[choice], username)
+
+
+def recurring_reservation(date, time, free, username):
+    """Asks how a reservation starting at the given date and time repeats and books the whole series, or nothing
+    if any of its dates can't be booked."""
+    slot = int(Prompt.ask("Slot", choices=[str(i) for i in free], default=str(free[0])))
+    every_days = IntPrompt.ask("Repeat every how many days", default=7)
+    end = Prompt.ask("Repeat until a date (YYYY-MM-DD) or for a number of times", default="4")
+    try:
+        if end.isdigit():
+            dates = occurrences(date, every_days, count=int(end))
+        else:
+            dates = occurrences(date, every_days, until=end)
+    except ValueError as error:
+        console.print(f"[bold red]{error}[/bold red]")
+        return
+    if not Confirm.ask(f"Do you want to reserve {time}, Slot {slot} on {len(dates)} dates from {dates[0]} to "
+                       f"{dates[-1]}?"):
+        console.print("[bold yellow]Reservation cancelled.[/bold yellow]")
+        return
+    booked, conflicts = bookings.book_series(dates, time, username, slot)
+    if conflicts:
+        for conflict_date, reason in conflicts:
+            console.print(f"[bold red]{conflict_date}: {reason}[/bold red]")
+        console.print("[bold red]Nothing was reserved.[/bold red]")
+        return
+    console.print(f"[bold green]{len(booked)} reservations confirmed.[/bold green]")
 
 
 def confirm_reservation(date, time, selected_slot, username):
@@ -111,22 +133,19 @@ def confirm_reservation(date, time, selected_slot, username):
 
 def available_reservations(username):
     """Creates a menu with available dates for reservation with the option to navigate between each week and
-    selecting the desired dated."""
-    reservations = load_reservations()
+    selecting the desired dated. Fully booked dates are shown too, so their waitlists can be joined."""
     today = datetime.date.today()
     start_date = today
     while True:
-        options = []
-        for i in range(7):
-            date = start_date + datetime.timedelta(days=i)
-            current_time = datetime.datetime.now().time()
-            available_times = [
-                time for time in TIME_SLOTS
-                if not all(is_slot_reserved(reservations, date.isoformat(), time, slot) for slot in range(1, 4)) and
-                   (date != today or datetime.datetime.strptime(time, "%H:%M").time() > current_time)
-            ]
-            if available_times:
-                options.append(f"{date} ({date.strftime('%A')})")
+        end_date = start_date + datetime.timedelta(days=6)
+        index = bookings.availability_index(start_date.isoformat(), end_date.isoformat())
+        now = datetime.datetime.now()
+        free_dates = {date for date, _ in free_times(start_date, end_date, now=now, reservations=index)}
+        # Fully booked dates are still listed, their times can only be waited for.
+        full_dates = {date for date, _ in full_times(start_date, end_date, now=now, reservations=index)}
+        available_dates = [datetime.date.fromisoformat(date) for date in sorted(free_dates | full_dates)]
+        options = [f"{date} ({date.strftime('%A')})" +
+                   ("" if date.isoformat() in free_dates else " (full, waitlist only)") for date in available_dates]
         options.append("Next week")
         if start_date > today:
             options.append("Previous week")
@@ -134,7 +153,7 @@ def available_reservations(username):
 
         choice = show_menu(options, title="[bold blue]Reservation Menu[/bold blue]")
         if choice == len(options) - 1:
-            main.main_menu(username)
+            return
         elif choice == len(options) - 2 and start_date > today:
             start_date -= datetime.timedelta(days=7)
         elif choice == len(options) - 3 and start_date > today:
@@ -142,8 +161,7 @@ def available_reservations(username):
         elif choice == len(options) - 2 and start_date <= today:
             start_date += datetime.timedelta(days=7)
         else:
-            selected_date = start_date + datetime.timedelta(days=choice)
-            time_menu(selected_date.isoformat(), username)
+            time_menu(available_dates[choice].isoformat(), username)
 
 
 def view_reservations(username):
@@ -156,46 +174,72 @@ def view_reservations(username):
         elif choice == 1:
             show_reservations(username, past=False)
         elif choice == 2:
-            main.main_menu(username)
+            return
 
 
 def show_reservations(username, past):
-    """Views the reservations made by the user."""
-    reservations = load_reservations()
-    today = datetime.datetime.now()
-    user_reservations = []
-
-    for key, slots in reservations.items():
-        for reservation in slots:
-            if reservation['username'] == username:
-                reservation_time = datetime.datetime.strptime(key, "%Y-%m-%d %H:%M")
-                if (past and reservation_time < today) or (not past and reservation_time >= today):
-                    user_reservations.append((reservation_time, reservation['slot']))
-
-    if not user_reservations:
-        console.print("[bold red]No reservations found.[/bold red]")
-        main.main_menu(username)
-
-    user_reservations.sort()
-    table = Table(title="Reservations" if not past else "Past Reservations")
-    table.add_column("Index", justify="right")
-    table.add_column("Date and Time")
-    table.add_column("Slot")
-
-    for idx, (res_time, slot) in enumerate(user_reservations, 1):
-        table.add_row(str(idx), res_time.strftime('%Y-%m-%d %H:%M'), f"Slot {slot}")
-
-    console.print(table)
-
-    if past:
-        input("Press Enter to go back.")
-    else:
-        options = [f"Cancel reservation {idx}" for idx in range(1, len(user_reservations) + 1)]
-        options.append("Back")
-        choice = show_menu(options, title="[bold blue]Active Reservations[/bold blue]")
-        if choice == len(options) - 1:
-            main.main_menu(username)
-        confirm_cancellation(username, user_reservations[choice])
+    """Views the reservations made by the user one page at a time, so a screen costs the same however many there
+    are. The current ones are cancelled by their ID."""
+    page, date = 0, None
+    while True:
+        rows, page, page_count = bookings.reservations_page(username, past, datetime.datetime.now(), page, date=date)
+        date = None
+        if not rows:
+            console.print("[bold red]No reservations found.[/bold red]")
+            return
+
+        title = "Past Reservations" if past else "Reservations"
+        table = Table(title=f"{title} (page {page + 1} of {page_count})")
+        table.add_column("ID")
+        table.add_column("Date and Time")
+        table.add_column("Slot")
+
+        for res_time, slot in rows:
+            table.add_row(bookings.reservation_id(res_time, slot), res_time.strftime('%Y-%m-%d %H:%M'), f"Slot {slot}")
+
+        console.print(table)
+
+        options = [] if past else ["Cancel a reservation"]
+        if page < page_count - 1:
+            options.append("Next page")
+        if page > 0:
+            options.append("Previous page")
+        options += ["Jump to a date", "Back"]
+        choice = show_menu(options, title=f"[bold blue]{'Past' if past else 'Active'} Reservations[/bold blue]")
+        option = options[choice]
+        if option == "Back":
+            return
+        elif option == "Next page":
+            page += 1
+        elif option == "Previous page":
+            page -= 1
+        elif option == "Jump to a date":
+            date = ask_date()
+        else:
+            cancel_by_id(username)
+
+
+def ask_date():
+    """Asks for a date to jump to, returns None if it isn't a valid one."""
+    answer = Prompt.ask("Jump to date (YYYY-MM-DD)")
+    try:
+        return datetime.date.fromisoformat(answer).isoformat()
+    except ValueError:
+        console.print("[bold red]Invalid date.[/bold red]")
+        return None
+
+
+def cancel_by_id(username):
+    """Asks for the ID of one of the user's current reservations and cancels it once confirmed."""
+    try:
+        reservation = bookings.parse_reservation_id(Prompt.ask("ID of the reservation to cancel"))
+    except ValueError as error:
+        console.print(f"[bold red]{error}[/bold red]")
+        return
+    if reservation[0] <= datetime.datetime.now():
+        console.print("[bold red]Only upcoming reservations can be cancelled.[/bold red]")
+        return
+    confirm_cancellation(username, reservation)
 
 
 def confirm_cancellation(username, reservation):
@@ -208,17 +252,13 @@ def confirm_cancellation(username, reservation):
 
 
 def cancel_reservation(username, reservation):
-    """Cancels the reservation selected by the user."""
-    reservations = load_reservations()
+    """Cancels the reservation selected by the user, returns whether it was found."""
     key = reservation[0].strftime("%Y-%m-%d %H:%M")
     slot = reservation[1]
 
-    if key in reservations:
-        reservations[key] = [res for res in reservations[key] if
-                             not (res['slot'] == slot and res['username'] == username)]
-        if not reservations[key]:
-            del reservations[key]
-        save_reservations(reservations)
+    removed, _ = bookings.cancel(key, slot, username)
+    if removed:
         console.print("[bold green]Reservation cancelled.[/bold green]")
-    else:
-        console.print("[bold red]Reservation not found.[/bold red]")
+        return True
+    console.print("[bold red]Reservation not found.[/bold red]")
+    return False
@@ -1,30 +1,37 @@
 import unittest
-from unittest.mock import patch, mock_open, MagicMock
+from unittest.mock import patch, mock_open, MagicMock, call
+import bookings
+import cache
 import reservation
 import datetime
+from occupancy import IndexedReservations
+from resources import Resource
 
 
 class TestReservationModule(unittest.TestCase):
 
-    @patch('reservation.os.path.exists', return_value=False)
+    def setUp(self):
+        cache.clear()
+
+    @patch('storage.os.path.exists', return_value=False)
     def test_load_reservations_no_file(self, mock_exists):
         reservations = reservation.load_reservations()
         self.assertEqual(reservations, {})
 
-    @patch('reservation.os.path.exists', return_value=True)
+    @patch('storage.os.path.exists', return_value=True)
     @patch('builtins.open', new_callable=mock_open,
            read_data='{"2023-01-01 09:00": [{"slot": 1, "username": "user1"}]}')
     def test_load_reservations_with_file(self, mock_open, mock_exists):
         reservations = reservation.load_reservations()
         self.assertEqual(reservations, {"2023-01-01 09:00": [{"slot": 1, "username": "user1"}]})
 
-    @patch('builtins.open', new_callable=mock_open)
-    @patch('json.dump')
-    def test_save_reservations(self, mock_json_dump, mock_open):
+    @patch('bookings.aggregates.invalidate')
+    @patch('bookings.storage.get_backend')
+    def test_save_reservations(self, mock_get_backend, mock_invalidate):
         reservations = {"2023-01-01 09:00": [{"slot": 1, "username": "user1"}]}
         reservation.save_reservations(reservations)
-        mock_open.assert_called_once_with("reservations.json", 'w')
-        mock_json_dump.assert_called_once_with(reservations, mock_open())
+        mock_get_backend.return_value.save.assert_called_once_with(reservations)
+        mock_invalidate.assert_called_once()
 
     def test_get_reservation_key(self):
         key = reservation.get_reservation_key("2023-01-01", "09:00")
@@ -36,19 +43,118 @@ class TestReservationModule(unittest.TestCase):
         reserved = reservation.is_slot_reserved(reservations, "2023-01-01", "09:00", 1)
         self.assertTrue(reserved)
 
-    @patch('reservation.load_reservations', return_value={})
-    @patch('reservation.save_reservations')
+    def test_is_time_full(self):
+        slots = [{"slot": 1, "username": "user1"}, {"slot": 2, "username": "user2"}]
+        for reservations in ({"2023-01-01 09:00": slots}, IndexedReservations({"2023-01-01 09:00": slots})):
+            self.assertFalse(reservation.is_time_full(reservations, "2023-01-01", "09:00"))
+            self.assertTrue(reservation.is_slot_reserved(reservations, "2023-01-01", "09:00", 2))
+            self.assertFalse(reservation.is_slot_reserved(reservations, "2023-01-01", "09:00", 3))
+        full = IndexedReservations({"2023-01-01 09:00": slots + [{"slot": 3, "username": "user3"}]})
+        self.assertTrue(reservation.is_time_full(full, "2023-01-01", "09:00"))
+        self.assertFalse(reservation.is_time_full(full, "2023-01-01", "11:00"))
+
+    @patch('bookings.aggregates.record')
+    @patch('bookings.storage.get_backend')
     @patch('reservation.console.print')
-    def test_make_reservation(self, mock_print, mock_save_reservations, mock_load_reservations):
+    def test_make_reservation(self, mock_print, mock_get_backend, mock_record):
         reservation.make_reservation("2023-01-01", "09:00", 1, "user1")
-        mock_save_reservations.assert_called_once()
+        mock_get_backend.return_value.add.assert_called_once_with("2023-01-01", "09:00", 1, "user1")
+        mock_record.assert_called_once_with("2023-01-01", "09:00", "user1", 1)
         mock_print.assert_called_once_with("[bold green]Reservation confirmed.[/bold green]")
 
-    @patch('reservation.load_reservations', return_value={
+    @patch('bookings.aggregates.record')
+    @patch('bookings.storage.get_backend')
+    @patch('reservation.console.print')
+    def test_make_reservation_slot_taken(self, mock_print, mock_get_backend, mock_record):
+        mock_get_backend.return_value.add.return_value = False
+        self.assertFalse(reservation.make_reservation("2023-01-01", "09:00", 1, "user1"))
+        mock_record.assert_not_called()
+        mock_print.assert_called_once_with("[bold red]This slot has just been reserved by someone else.[/bold red]")
+
+    @patch('bookings.aggregates.record_many')
+    @patch('bookings.storage.get_backend')
+    def test_book_series(self, mock_get_backend, mock_record_many):
+        mock_get_backend.return_value.load.return_value = IndexedReservations({
+            "2099-01-08 09:00": [{"slot": 1, "username": "user2"}]})
+        mock_get_backend.return_value.add_all.return_value = []
+        booked, conflicts = bookings.book_series(["2099-01-01", "2099-01-08"], "09:00", "user1")
+        self.assertEqual((booked, conflicts), ([("2099-01-01", "09:00", 1), ("2099-01-08", "09:00", 2)], []))
+        mock_get_backend.return_value.load.assert_called_once_with("2099-01-01", "2099-01-08")
+        mock_get_backend.return_value.add_all.assert_called_once_with(
+            [("2099-01-01", "09:00", 1, "user1"), ("2099-01-08", "09:00", 2, "user1")])
+        mock_record_many.assert_called_once_with([("2099-01-01", "09:00", "user1", 1),
+                                                  ("2099-01-08", "09:00", "user1", 1)])
+
+    @patch('bookings.aggregates.record_many')
+    @patch('bookings.storage.get_backend')
+    def test_book_series_conflicts_book_nothing(self, mock_get_backend, mock_record_many):
+        mock_get_backend.return_value.load.return_value = IndexedReservations({
+            "2099-01-08 09:00": [{"slot": 1, "username": "user1"}],
+            "2099-01-15 09:00": [{"slot": 2, "username": "user2"}]})
+        with patch('bookings.resources.get_resource', return_value=Resource(closed_dates={"2099-01-22"})):
+            booked, conflicts = bookings.book_series(["2000-01-01", "2099-01-08", "2099-01-15", "2099-01-22"],
+                                                     "09:00", "user1", slot=2)
+        self.assertEqual(booked, [])
+        self.assertEqual(conflicts, [("2000-01-01", "passed"), ("2099-01-08", "already booked by you"),
+                                     ("2099-01-15", "slot 2 taken"), ("2099-01-22", "closed")])
+        mock_get_backend.return_value.add_all.assert_not_called()
+        mock_record_many.assert_not_called()
+
+    @patch('reservation.Prompt.ask', side_effect=["2", "3"])
+    @patch('reservation.IntPrompt.ask', return_value=7)
+    @patch('reservation.Confirm.ask', return_value=True)
+    @patch('reservation.bookings.book_series', return_value=([("2099-01-01", "09:00", 2)] * 3, []))
+    @patch('reservation.console.print')
+    def test_recurring_reservation(self, mock_print, mock_book_series, mock_confirm_ask, mock_int_prompt, mock_prompt):
+        reservation.recurring_reservation("2099-01-01", "09:00", [1, 2], "user1")
+        mock_book_series.assert_called_once_with(["2099-01-01", "2099-01-08", "2099-01-15"], "09:00", "user1", 2)
+        mock_print.assert_called_once_with("[bold green]3 reservations confirmed.[/bold green]")
+
+    @patch('bookings.storage.get_backend')
+    def test_availability_index(self, mock_get_backend):
+        index = mock_get_backend.return_value.occupancy.return_value
+        self.assertIs(bookings.availability_index("2023-01-01", "2023-01-07"), index)
+        mock_get_backend.return_value.load.assert_not_called()
+        mock_get_backend.return_value.occupancy.return_value = None
+        bookings.availability_index("2023-01-01", "2023-01-07")
+        mock_get_backend.return_value.load.assert_called_once_with("2023-01-01", "2023-01-07")
+
+    @patch('bookings.storage.get_backend')
+    def test_load_reservations_range(self, mock_get_backend):
+        reservation.load_reservations("2023-01-01", "2023-01-07")
+        mock_get_backend.return_value.load.assert_called_once_with("2023-01-01", "2023-01-07")
+
+    @patch('bookings.aggregates.record')
+    @patch('bookings.storage.get_backend')
+    @patch('reservation.console.print')
+    def test_cancel_reservation(self, mock_print, mock_get_backend, mock_record):
+        mock_get_backend.return_value.cancel.return_value = (True, None)
+        self.assertTrue(reservation.cancel_reservation("user1", (datetime.datetime(2023, 1, 1, 9, 0), 1)))
+        mock_get_backend.return_value.cancel.assert_called_once_with("2023-01-01 09:00", 1, "user1")
+        mock_record.assert_called_once_with("2023-01-01", "09:00", "user1", -1)
+        mock_print.assert_called_once_with("[bold green]Reservation cancelled.[/bold green]")
+
+    @patch('bookings.aggregates.record')
+    @patch('bookings.storage.get_backend')
+    @patch('reservation.console.print')
+    def test_cancel_reservation_promotes_waiting_user(self, mock_print, mock_get_backend, mock_record):
+        mock_get_backend.return_value.cancel.return_value = (True, "user2")
+        self.assertTrue(reservation.cancel_reservation("user1", (datetime.datetime(2023, 1, 1, 9, 0), 1)))
+        mock_record.assert_has_calls([call("2023-01-01", "09:00", "user1", -1),
+                                      call("2023-01-01", "09:00", "user2", 1)])
+
+    @patch('bookings.storage.get_backend')
+    @patch('reservation.console.print')
+    def test_cancel_reservation_not_found(self, mock_print, mock_get_backend):
+        mock_get_backend.return_value.cancel.return_value = (False, None)
+        self.assertFalse(reservation.cancel_reservation("user1", (datetime.datetime(2023, 1, 1, 9, 0), 1)))
+        mock_print.assert_called_once_with("[bold red]Reservation not found.[/bold red]")
+
+    @patch('reservation.bookings.availability_index', return_value={
         "2023-01-01 09:00": [{"slot": 1, "username": "user1"}, {"slot": 2, "username": "user2"},
                              {"slot": 3, "username": "user3"}]})
     @patch('reservation.show_menu', return_value=0)
-    def test_slot_menu_no_available_slots(self, mock_show_menu, mock_load_reservations):
+    def test_slot_menu_no_available_slots(self, mock_show_menu, mock_availability_index):
         with patch('reservation.console.print') as mock_print:
             with patch('reservation.datetime') as mock_datetime:
                 mock_datetime.date.today.return_value = datetime.date(2023, 1, 1)
@@ -58,6 +164,135 @@ class TestReservationModule(unittest.TestCase):
                 reservation.slot_menu("2023-01-01", "09:00", "user1")
                 mock_print.assert_called_once_with("[bold red]No available slots for this time.[/bold red]")
 
+    @patch('reservation.load_reservations', return_value=IndexedReservations({
+        "2099-01-01 09:00": [{"slot": 1, "username": "user1"}, {"slot": 2, "username": "user2"},
+                             {"slot": 3, "username": "user3"}]}))
+    @patch('reservation.bookings.availability_index')
+    @patch('reservation.show_menu', return_value=7)
+    @patch('reservation.Confirm.ask', return_value=True)
+    @patch('reservation.bookings.join_waitlist', return_value=2)
+    @patch('reservation.console.print')
+    def test_time_menu_joins_waitlist_of_full_time(self, mock_print, mock_join, mock_confirm_ask, mock_show_menu,
+                                                   mock_availability_index, mock_load_reservations):
+        mock_availability_index.return_value = mock_load_reservations.return_value
+        reservation.time_menu("2099-01-01", "user4")
+        options = mock_show_menu.call_args[0][0]
+        self.assertEqual(options[7:], ["09:00 (full, join waitlist)", "Back"])
+        mock_join.assert_called_once_with("2099-01-01", "09:00", "user4")
+        self.assertIn("number 2 on the waitlist", mock_print.call_args[0][0])
+
+    @patch('reservation.load_reservations')
+    @patch('reservation.bookings.availability_index', return_value=IndexedReservations({
+        "2099-01-01 09:00": [{"slot": 1, "username": "user1"}]}))
+    @patch('reservation.show_menu', return_value=8)
+    def test_time_menu_reads_availability_from_index(self, mock_show_menu, mock_availability_index,
+                                                     mock_load_reservations):
+        reservation.time_menu("2099-01-01", "user4")
+        mock_availability_index.assert_called_once_with("2099-01-01", "2099-01-01")
+        self.assertEqual(len(mock_show_menu.call_args[0][0]), 9)
+        mock_load_reservations.assert_not_called()
+
+    @patch('availability.resources.get_resource', return_value=Resource(times=("09:00",), slot_count=1))
+    @patch('reservation.bookings.availability_index')
+    @patch('reservation.show_menu')
+    @patch('reservation.time_menu')
+    def test_available_reservations_lists_fully_booked_dates(self, mock_time_menu, mock_show_menu,
+                                                             mock_availability_index, mock_get_resource):
+        full_date = datetime.date.today() + datetime.timedelta(days=2)
+        label = f"{full_date} ({full_date.strftime('%A')}) (full, waitlist only)"
+        mock_availability_index.return_value = IndexedReservations({
+            f"{full_date} 09:00": [{"slot": 1, "username": "user1"}]})
+        choices = iter([lambda options: options.index(label), lambda options: len(options) - 1])
+        mock_show_menu.side_effect = lambda options, title: next(choices)(options)
+        reservation.available_reservations("user4")
+        options = mock_show_menu.call_args[0][0]
+        self.assertIn(f"{full_date + datetime.timedelta(days=1)} "
+                      f"({(full_date + datetime.timedelta(days=1)).strftime('%A')})", options)
+        mock_time_menu.assert_called_once_with(full_date.isoformat(), "user4")
+
+    @patch('bookings.storage.get_backend')
+    def test_reservations_page(self, mock_get_backend):
+        now = datetime.datetime(2023, 1, 1, 8, 0)
+        bookings.reservations_page("user1", False, now, page=2, date="2023-01-15")
+        mock_get_backend.return_value.user_reservations_page.assert_called_once_with(
+            "user1", False, now, 2, bookings.PAGE_SIZE, "2023-01-15")
+
+    def test_reservation_id(self):
+        when = datetime.datetime(2024, 8, 5, 9, 0)
+        self.assertEqual(bookings.reservation_id(when, 2), "20240805-0900-2")
+        self.assertEqual(bookings.parse_reservation_id(" 20240805-0900-2 "), (when, 2))
+        for invalid in ("", "2", "20240805-0900", "20240805-0900-a", "20241305-0900-1", "2024-08-05-0900-1"):
+            with self.assertRaises(ValueError):
+                bookings.parse_reservation_id(invalid)
+
+    def paged_backend(self, reservations):
+        """Patches in a backend paging through the given reservations."""
+        patcher = patch('bookings.storage.get_backend')
+        backend = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        backend.user_reservations_page.side_effect = IndexedReservations(reservations).user_reservations_page
+
+    @patch('reservation.show_menu', side_effect=[1, 1, 2, 4])
+    @patch('reservation.Prompt.ask', return_value="2099-01-15")
+    @patch('reservation.console.print')
+    def test_show_reservations_pages(self, mock_print, mock_prompt, mock_show_menu):
+        self.paged_backend({f"2099-01-{day:02d} 09:00": [{"slot": 1, "username": "user1"}] for day in range(1, 26)})
+        reservation.show_reservations("user1", past=False)
+        pages = [list(printed[0][0].columns[0].cells) for printed in mock_print.call_args_list]
+        self.assertEqual([len(page) for page in pages], [10, 10, 5, 10])
+        self.assertEqual(pages[0][0], "20990101-0900-1")
+        self.assertEqual(pages[2][0], "20990121-0900-1")
+        self.assertEqual(pages[3][0], "20990111-0900-1")
+        options = [call_args[0][0] for call_args in mock_show_menu.call_args_list]
+        self.assertEqual(options[0], ["Cancel a reservation", "Next page", "Jump to a date", "Back"])
+        self.assertEqual(options[1], ["Cancel a reservation", "Next page", "Previous page", "Jump to a date", "Back"])
+        self.assertEqual(options[2], ["Cancel a reservation", "Previous page", "Jump to a date", "Back"])
+
+    @patch('reservation.show_menu', return_value=1)
+    @patch('reservation.console.print')
+    def test_show_past_reservations(self, mock_print, mock_show_menu):
+        self.paged_backend({"2000-01-01 09:00": [{"slot": 1, "username": "user1"}]})
+        reservation.show_reservations("user1", past=True)
+        self.assertEqual(mock_show_menu.call_args[0][0], ["Jump to a date", "Back"])
+
+    @patch('reservation.console.print')
+    def test_show_reservations_none(self, mock_print):
+        self.paged_backend({"2099-01-01 09:00": [{"slot": 1, "username": "user2"}]})
+        reservation.show_reservations("user1", past=False)
+        mock_print.assert_called_once_with("[bold red]No reservations found.[/bold red]")
+
+    @patch('reservation.Prompt.ask', return_value="20990105-1100-3")
+    @patch('reservation.confirm_cancellation')
+    def test_cancel_by_id(self, mock_confirm_cancellation, mock_prompt):
+        reservation.cancel_by_id("user1")
+        mock_confirm_cancellation.assert_called_once_with("user1", (datetime.datetime(2099, 1, 5, 11, 0), 3))
+
+    @patch('reservation.confirm_cancellation')
+    @patch('reservation.console.print')
+    def test_cancel_by_id_rejected(self, mock_print, mock_confirm_cancellation):
+        with patch('reservation.Prompt.ask', return_value="5"):
+            reservation.cancel_by_id("user1")
+        mock_print.assert_called_once_with("[bold red]Not a reservation ID: 5[/bold red]")
+        with patch('reservation.Prompt.ask', return_value="20000105-1100-3"):
+            reservation.cancel_by_id("user1")
+        mock_print.assert_called_with("[bold red]Only upcoming reservations can be cancelled.[/bold red]")
+        mock_confirm_cancellation.assert_not_called()
+
+    @patch('reservation.Confirm.ask', return_value=True)
+    @patch('reservation.bookings.join_waitlist', return_value=None)
+    @patch('reservation.slot_menu')
+    @patch('reservation.console.print')
+    def test_confirm_waitlist_offers_freed_slot(self, mock_print, mock_slot_menu, mock_join, mock_confirm_ask):
+        reservation.confirm_waitlist("2099-01-01", "09:00", "user4")
+        mock_print.assert_called_once_with("[bold yellow]A slot has just been freed at this time.[/bold yellow]")
+        mock_slot_menu.assert_called_once_with("2099-01-01", "09:00", "user4")
+
+    @patch('bookings.storage.get_backend')
+    def test_join_waitlist_checks_slot_count(self, mock_get_backend):
+        with patch('bookings.resources.get_resource', return_value=Resource(slot_count=5)):
+            bookings.join_waitlist("2099-01-01", "09:00", "user4")
+        mock_get_backend.return_value.join_waitlist.assert_called_once_with("2099-01-01 09:00", "user4", 5)
+
     @patch('reservation.Confirm.ask', return_value=True)
     @patch('reservation.make_reservation')
     @patch('reservation.console.print')
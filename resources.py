@@ -0,0 +1,102 @@
+import datetime
+import json
+import os
+from dataclasses import dataclass, field
+
+RESOURCE_ENV = "RESERVATION_RESOURCE"
+DEFAULT_TIMES = ("09:00", "11:00", "13:00", "15:00", "17:00", "19:00", "21:00", "23:00")
+DEFAULT_SLOT_COUNT = 3
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def time_grid(start, end, minutes):
+    """Returns the "HH:MM" times from start up to but not including end, every given number of minutes."""
+    first = datetime.datetime.strptime(start, "%H:%M")
+    last = datetime.datetime.strptime(end, "%H:%M")
+    times = []
+    while first < last:
+        times.append(first.strftime("%H:%M"))
+        first += datetime.timedelta(minutes=minutes)
+    return tuple(times)
+
+
+@dataclass(slots=True)
+class Resource:
+    """What can be booked: how many slots (courts, rooms, ...) each time has, the grid of times, the opening hours
+    of each weekday and the dates it is closed on. Without opening hours every time of the grid is open every day.
+    With them, a weekday is open from its opening time up to but not including its closing time, and the weekdays
+    left out are closed."""
+    name: str = "default"
+    slot_count: int = DEFAULT_SLOT_COUNT
+    times: tuple = DEFAULT_TIMES
+    opening_hours: dict = field(default_factory=dict)
+    closed_dates: frozenset = frozenset()
+    weekday_times: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.times = tuple(self.times)
+        self.closed_dates = frozenset(self.closed_dates)
+        # The open times of each weekday are worked out once, availability looks them up for every date.
+        if self.opening_hours:
+            self.weekday_times = tuple(
+                tuple(time for time in self.times if day in self.opening_hours and
+                      self.opening_hours[day][0] <= time < self.opening_hours[day][1])
+                for day in DAY_NAMES)
+        else:
+            self.weekday_times = (self.times,) * 7
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds the resource from its JSON form. The times are either listed in "times" or generated from a
+        "grid" with a start, an end and the minutes between two times."""
+        if 'grid' in data:
+            grid = data['grid']
+            times = time_grid(grid['start'], grid['end'], grid['minutes'])
+        else:
+            times = data.get('times', DEFAULT_TIMES)
+        return cls(data.get('name', "default"), data.get('slots', DEFAULT_SLOT_COUNT), times,
+                   {day: tuple(hours) for day, hours in data.get('opening_hours', {}).items()},
+                   data.get('closed_dates', ()))
+
+    def times_on(self, date):
+        """Returns the times open for booking on the given date."""
+        if date.isoformat() in self.closed_dates:
+            return ()
+        return self.weekday_times[date.weekday()]
+
+    def has_time(self, time):
+        """Checks if the time is on the grid, whatever the day."""
+        return time in self.times
+
+    def has_slot(self, slot):
+        return 1 <= slot <= self.slot_count
+
+    def is_open(self, date, time):
+        """Checks if the time is open for booking on the given ISO date."""
+        return time in self.times_on(datetime.date.fromisoformat(date))
+
+
+def load_resource(path="resource.json"):
+    """Loads the resource described in the JSON file, the default one if there is no such file."""
+    if not os.path.exists(path):
+        return Resource()
+    with open(path, 'r') as file:
+        return Resource.from_dict(json.load(file))
+
+
+_resource = None
+
+
+def get_resource():
+    """Gets the resource being booked, read from the file named by the RESERVATION_RESOURCE environment variable
+    (resource.json by default)."""
+    global _resource
+    if _resource is None:
+        _resource = load_resource(os.environ.get(RESOURCE_ENV, "resource.json"))
+    return _resource
+
+
+def set_resource(resource):
+    """Replaces the resource being booked."""
+    global _resource
+    _resource = resource
@@ -0,0 +1,58 @@
+import datetime
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import resources
+from resources import DEFAULT_TIMES, Resource, load_resource, time_grid
+
+MONDAY = datetime.date(2024, 1, 1)
+
+
+class TestResources(unittest.TestCase):
+
+    def tearDown(self):
+        resources.set_resource(None)
+
+    def test_time_grid(self):
+        self.assertEqual(time_grid("09:00", "10:00", 15), ("09:00", "09:15", "09:30", "09:45"))
+        self.assertEqual(len(time_grid("06:00", "23:00", 15)), 68)
+
+    def test_default_resource(self):
+        resource = Resource()
+        self.assertEqual(resource.slot_count, 3)
+        self.assertEqual(resource.times_on(MONDAY), DEFAULT_TIMES)
+        self.assertTrue(resource.has_slot(3))
+        self.assertFalse(resource.has_slot(4))
+        self.assertFalse(resource.has_slot(0))
+
+    def test_from_dict(self):
+        resource = Resource.from_dict({
+            'name': "courts", 'slots': 40, 'grid': {'start': "08:00", 'end': "22:00", 'minutes': 15},
+            'opening_hours': {'Monday': ["10:00", "12:00"], 'Saturday': ["08:00", "22:00"]},
+            'closed_dates': ["2024-01-06"]})
+        self.assertEqual((resource.name, resource.slot_count, len(resource.times)), ("courts", 40, 56))
+        self.assertEqual(resource.times_on(MONDAY), time_grid("10:00", "12:00", 15))
+        self.assertEqual(resource.times_on(MONDAY + datetime.timedelta(days=1)), ())
+        self.assertEqual(resource.times_on(datetime.date(2024, 1, 6)), ())
+        self.assertEqual(len(resource.times_on(datetime.date(2024, 1, 13))), 56)
+        self.assertTrue(resource.is_open("2024-01-01", "11:45"))
+        self.assertFalse(resource.is_open("2024-01-01", "12:00"))
+        self.assertTrue(resource.has_time("12:00"))
+
+    def test_load_resource(self):
+        self.assertEqual(load_resource("missing.json"), Resource())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "resource.json")
+            with open(path, 'w') as file:
+                json.dump({'slots': 5, 'times': ["10:00", "12:00"]}, file)
+            self.assertEqual(load_resource(path), Resource(slot_count=5, times=("10:00", "12:00")))
+            with patch.dict(os.environ, {resources.RESOURCE_ENV: path}):
+                resources.set_resource(None)
+                self.assertEqual(resources.get_resource().slot_count, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+import cache
+import storage
+
+SESSION_MINUTES_ENV = "RESERVATION_SESSION_MINUTES"
+
+
+class SessionStore:
+    """Remembers who logged in on this terminal with HMAC-signed tokens that expire, so a user logging in again
+    before then skips the bcrypt check. Logging out revokes the user's token. A ttl of zero turns sessions off."""
+
+    def __init__(self, path="sessions.json", key_path="session.key", ttl=None):
+        self.path = path
+        self.key_path = key_path
+        self.lock_path = path + ".lock"
+        self.ttl = ttl if ttl is not None else int(os.environ.get(SESSION_MINUTES_ENV, 0)) * 60
+        self._key = None
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    @property
+    def key(self):
+        """The secret the tokens are signed with, created the first time it is needed and readable only by the
+        owner."""
+        if self._key is None:
+            try:
+                fd = os.open(self.key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                with open(self.key_path, 'rb') as file:
+                    self._key = file.read()
+            else:
+                self._key = secrets.token_bytes(32)
+                with os.fdopen(fd, 'wb') as file:
+                    file.write(self._key)
+        return self._key
+
+    def sign(self, payload):
+        return hmac.new(self.key, payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as file:
+            return json.load(file)
+
+    def load(self):
+        """Returns the token of every user with a session on this terminal. It is shared and must not be
+        modified."""
+        return cache.get(self.path, self.read)
+
+    def write(self, tokens):
+        storage.atomic_write_json(self.path, tokens)
+        cache.put(self.path, tokens)
+
+    def create_token(self, username, now=None):
+        """Returns a signed token for the user that expires after the ttl, without storing it."""
+        expires = int(now if now is not None else time.time()) + self.ttl
+        user = base64.urlsafe_b64encode(username.encode('utf-8')).decode('ascii')
+        payload = f"{user}.{expires}.{secrets.token_hex(8)}"
+        return f"{payload}.{self.sign(payload)}"
+
+    def issue(self, username, now=None):
+        """Starts a session for the user, replacing the one they had. Returns its token, None if sessions are off."""
+        if not self.enabled:
+            return None
+        token = self.create_token(username, now)
+        with storage.file_lock(self.lock_path):
+            self.write(dict(self.load(), **{username: token}))
+        return token
+
+    def validate(self, token, now=None):
+        """Returns the username the token was issued to, None if it is forged, malformed or expired."""
+        try:
+            payload, signature = token.rsplit('.', 1)
+            user, expires, _ = payload.split('.')
+            expires = int(expires)
+            username = base64.urlsafe_b64decode(user).decode('utf-8')
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature.encode('utf-8'), self.sign(payload).encode('utf-8')):
+            return None
+        if expires <= (now if now is not None else time.time()):
+            return None
+        return username
+
+    def resume(self, username, now=None):
+        """Checks if the user has a live session on this terminal."""
+        if not self.enabled:
+            return False
+        token = self.load().get(username)
+        return token is not None and self.validate(token, now) == username
+
+    def revoke(self, username):
+        """Ends the session of the user."""
+        if username not in self.load():
+            return
+        with storage.file_lock(self.lock_path):
+            tokens = dict(self.load())
+            tokens.pop(username, None)
+            self.write(tokens)
+
+
+_store = None
+
+
+def get_store():
+    """Gets the session store, with sessions lasting RESERVATION_SESSION_MINUTES minutes (off by default)."""
+    global _store
+    if _store is None:
+        _store = SessionStore()
+    return _store
+
+
+def set_store(store):
+    """Replaces the session store in use."""
+    global _store
+    _store = store
@@ -0,0 +1,79 @@
+import os
+import stat
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cache
+import session
+from session import SessionStore
+
+NOW = 1_700_000_000
+
+
+class TestSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.store = self.make_store(ttl=600)
+
+    def make_store(self, ttl):
+        return SessionStore(os.path.join(self.directory, "sessions.json"),
+                            os.path.join(self.directory, "session.key"), ttl=ttl)
+
+    def test_issue_and_resume(self):
+        token = self.store.issue('alice', now=NOW)
+        self.assertEqual(self.store.validate(token, now=NOW + 1), 'alice')
+        self.assertTrue(self.store.resume('alice', now=NOW + 1))
+        self.assertFalse(self.store.resume('bob', now=NOW + 1))
+
+    def test_resume_from_another_store(self):
+        self.store.issue('alice', now=NOW)
+        self.assertTrue(self.make_store(ttl=600).resume('alice', now=NOW + 1))
+
+    def test_expired_token(self):
+        token = self.store.issue('alice', now=NOW)
+        self.assertIsNone(self.store.validate(token, now=NOW + 600))
+        self.assertFalse(self.store.resume('alice', now=NOW + 600))
+
+    def test_forged_token(self):
+        token = self.store.issue('alice', now=NOW)
+        payload, signature = token.rsplit('.', 1)
+        user, expires, nonce = payload.split('.')
+        self.assertIsNone(self.store.validate(f"{user}.{int(expires) + 3600}.{nonce}.{signature}", now=NOW))
+        self.assertIsNone(self.store.validate("not a token", now=NOW))
+
+    def test_token_from_another_key(self):
+        token = self.store.issue('alice', now=NOW)
+        other = SessionStore(os.path.join(self.directory, "other.json"),
+                             os.path.join(self.directory, "other.key"), ttl=600)
+        self.assertIsNone(other.validate(token, now=NOW))
+
+    def test_key_is_private(self):
+        self.store.issue('alice', now=NOW)
+        self.assertEqual(stat.S_IMODE(os.stat(self.store.key_path).st_mode) & 0o077, 0)
+
+    def test_revoke(self):
+        self.store.issue('alice', now=NOW)
+        self.store.issue('bob', now=NOW)
+        self.store.revoke('alice')
+        self.store.revoke('carol')
+        self.assertFalse(self.store.resume('alice', now=NOW + 1))
+        self.assertTrue(self.store.resume('bob', now=NOW + 1))
+
+    def test_disabled(self):
+        store = self.make_store(ttl=0)
+        self.assertIsNone(store.issue('alice', now=NOW))
+        self.assertFalse(store.resume('alice', now=NOW))
+        self.assertFalse(os.path.exists(store.path))
+
+    @patch.dict(os.environ, {session.SESSION_MINUTES_ENV: "15"})
+    def test_ttl_from_environment(self):
+        self.assertEqual(SessionStore().ttl, 900)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,1048 @@
+import datetime
+import json
+import os
+import stat
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+import cache
+import metrics
+import occupancy_file
+import records
+from cache import file_stamp
+from occupancy import (IndexedReservations, page_user_reservations, split_bounds, split_user_reservations,
+                       unpack_user_reservations)
+from records import Booking, ReservationRecord
+from waitlist import Waitlists
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+BACKEND_ENV = "RESERVATION_BACKEND"
+PARTITION_WINDOW_ENV = "RESERVATION_PARTITION_WINDOW"
+
+
+def get_reservation_key(date, time):
+    """Gets the reservation key for the given date and time."""
+    return f"{date} {time}"
+
+
+@contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on the given lock file while the block runs, so other processes wait for it."""
+    with open(path, 'a+') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_json(path, data):
+    """Writes the data to a temporary file next to the given path and renames it over the path, so readers never
+    see a half-written file."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file, default=records.encode)
+            metrics.bytes_written(file.tell())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def iter_bookings(reservations):
+    """Yields the (date, time, slot, username) bookings of a reservations dict."""
+    for key, slots in reservations.items():
+        date, time = key.split()
+        for res in slots:
+            yield date, time, res['slot'], res['username']
+
+
+def waitlist_path_for(path):
+    """Returns the path of the waitlists kept next to a reservations JSON document."""
+    return os.path.splitext(path)[0] + "_waitlist.json"
+
+
+def occupancy_path_for(path):
+    """Returns the path of the occupancy file kept next to a reservations JSON document."""
+    return os.path.splitext(path)[0] + "_occupancy.bin"
+
+
+class JsonBackend:
+    """Keeps all the reservations in a single JSON document, and the waitlists in a second one next to it. The
+    occupancy of the slots is also kept in a memory-mapped file, see occupancy_file.py."""
+
+    def __init__(self, path="reservations.json"):
+        self.path = path
+        self.waitlist_path = waitlist_path_for(path)
+        self.occupancy_path = occupancy_path_for(path)
+        self.occupancy_file = None
+        self.lock_path = path + ".lock"
+
+    def read(self):
+        """Parses the JSON document and indexes the occupancy of its slots."""
+        if not os.path.exists(self.path):
+            return IndexedReservations()
+        with open(self.path, 'r') as file:
+            reservations = json.load(file, object_hook=records.decode)
+            metrics.bytes_read(file.tell())
+        return IndexedReservations(reservations)
+
+    def load(self, start=None, end=None):
+        """Loads the reservations, optionally only the ones between the start and end dates. The document is only
+        parsed again when the file changed, so the returned dict is shared and must not be modified."""
+        reservations = cache.get(self.path, self.read)
+        if start is None and end is None:
+            return reservations
+        return reservations.between(start, end)
+
+    def write(self, reservations):
+        """Writes the reservations to the JSON document and keeps them cached. Must be called while holding the
+        lock."""
+        atomic_write_json(self.path, reservations)
+        cache.put(self.path, reservations)
+
+    def save(self, reservations):
+        """Replaces the stored reservations with the given ones."""
+        with file_lock(self.lock_path):
+            self.write(IndexedReservations(reservations))
+
+    def add(self, date, time, slot, username):
+        """Stores a new reservation for the given date, time and slot, returns False if the slot is already taken."""
+        with file_lock(self.lock_path):
+            reservations = self.load()
+            key = get_reservation_key(date, time)
+            if not reservations.book(key, slot, username):
+                return False
+            self.update(reservations, [key])
+            return True
+
+    def add_many(self, bookings):
+        """Stores the (date, time, slot, username) bookings in a single write, skipping the ones whose slot is
+        already taken. Returns the skipped ones. Nothing is stored if the bookings can't all be read."""
+        with file_lock(self.lock_path):
+            reservations = self.load()
+            conflicts, keys = [], set()
+            try:
+                for date, time, slot, username in bookings:
+                    key = get_reservation_key(date, time)
+                    if reservations.book(key, slot, username):
+                        keys.add(key)
+                    else:
+                        conflicts.append((date, time, slot, username))
+            except BaseException:
+                cache.invalidate(self.path)
+                raise
+            self.update(reservations, keys)
+            return conflicts
+
+    def add_all(self, bookings):
+        """Stores every (date, time, slot, username) booking in a single write, or none of them if any of their
+        slots is already taken. Returns the conflicting ones."""
+        keyed = [(get_reservation_key(date, time), slot, username) for date, time, slot, username in bookings]
+        with file_lock(self.lock_path):
+            reservations = self.load()
+            conflicts = reservations.book_all(keyed)
+            if conflicts:
+                return [(*key.split(), slot, username) for key, slot, username in conflicts]
+            self.update(reservations, {key for key, _, _ in keyed})
+            return []
+
+    def remove(self, key, slot, username):
+        """Removes the user's reservation of the given slot, returns False if there was none."""
+        with file_lock(self.lock_path):
+            reservations = self.load()
+            if not reservations.release(key, slot, username):
+                return False
+            self.update(reservations, [key])
+            return True
+
+    def iter_bookings(self):
+        """Yields every (date, time, slot, username) booking."""
+        return iter_bookings(self.load())
+
+    def update(self, reservations, keys=()):
+        """Writes the cached reservations after they have been changed in place, dropping them from the cache if
+        the write fails, and the new occupancy of the changed keys to the occupancy file. Must be called while
+        holding the lock."""
+        previous_stamp = file_stamp(self.path)
+        try:
+            self.write(reservations)
+        except BaseException:
+            cache.invalidate(self.path)
+            raise
+        if keys:
+            try:
+                occupancy_file.update(self.occupancy_path, {key: reservations.occupancy.get(key, 0) for key in keys},
+                                      previous_stamp, file_stamp(self.path))
+            except (OSError, ValueError):
+                # The file keeps the stamp of the reservations before the change, so it is built again when read.
+                pass
+
+    def occupancy(self, resource):
+        """Returns the occupancy file mapped into memory, built again from the reservations if it is missing, out
+        of date or laid out for other times or slots. Returns None if it can't be used, availability is then read
+        from the reservations themselves."""
+        if self.occupancy_file is None:
+            self.occupancy_file = occupancy_file.OccupancyFile(self.occupancy_path)
+        index = self.occupancy_file
+        try:
+            if self.occupancy_in_sync(resource):
+                return index
+            with file_lock(self.lock_path):
+                if not self.occupancy_in_sync(resource):
+                    metrics.count("occupancy_rebuilds_total")
+                    index.close()
+                    occupancy_file.create(self.occupancy_path, self.load().occupancy, resource.times,
+                                          resource.slot_count, file_stamp(self.path))
+                    index.refresh()
+            return index
+        except (OSError, ValueError):
+            index.close()
+            return None
+
+    def occupancy_in_sync(self, resource):
+        """Checks if the occupancy file is laid out for the resource and synced with the current reservations."""
+        index = self.occupancy_file
+        try:
+            return (index.refresh() and index.matches(resource.times, resource.slot_count) and
+                    index.synced_with(file_stamp(self.path)))
+        except ValueError:
+            index.close()
+            return False
+
+    def read_waitlists(self):
+        if not os.path.exists(self.waitlist_path):
+            return Waitlists()
+        with open(self.waitlist_path, 'r') as file:
+            return Waitlists.from_json(json.load(file))
+
+    def load_waitlists(self):
+        """Loads the waitlists, parsed again only when the file changed. They are shared and must not be
+        modified."""
+        return cache.get(self.waitlist_path, self.read_waitlists)
+
+    def update_waitlists(self, waitlists):
+        """Writes the cached waitlists after they have been changed in place, dropping them from the cache if the
+        write fails. Must be called while holding the lock."""
+        try:
+            atomic_write_json(self.waitlist_path, waitlists.to_json())
+            cache.put(self.waitlist_path, waitlists)
+        except BaseException:
+            cache.invalidate(self.waitlist_path)
+            raise
+
+    def waitlist(self, key):
+        """Returns the usernames waiting for a slot at the key, first in line first."""
+        return list(self.load_waitlists().get(key, ()))
+
+    def join_waitlist(self, key, username, slot_count=None):
+        """Puts the user in line for a slot at the key, returns their position from 1. Given the slot count, returns
+        None without joining if a slot is free, as checked under the lock."""
+        with file_lock(self.lock_path):
+            if slot_count is not None and not self.load().is_full(key, slot_count):
+                return None
+            waitlists = self.load_waitlists()
+            position = waitlists.join(key, username)
+            self.update_waitlists(waitlists)
+            return position
+
+    def leave_waitlist(self, key, username):
+        """Takes the user out of line for a slot at the key, returns False if they weren't in it."""
+        with file_lock(self.lock_path):
+            waitlists = self.load_waitlists()
+            if not waitlists.leave(key, username):
+                return False
+            self.update_waitlists(waitlists)
+            return True
+
+    def cancel(self, key, slot, username):
+        """Removes the user's reservation of the slot and books it for the first user waiting for it, under the
+        same lock. Returns whether there was such a reservation and the username of the promoted user, None if
+        nobody was waiting. The reservations are written first: should the waitlists fail to be written after
+        them, the promoted user stays in line and is skipped the next time, as they already hold a slot."""
+        with file_lock(self.lock_path):
+            reservations = self.load()
+            if not reservations.release(key, slot, username):
+                return False, None
+            waitlists = self.load_waitlists()
+            promoted = waitlists.promote(key, slot, reservations)
+            self.update(reservations, [key])
+            if promoted is not None:
+                self.update_waitlists(waitlists)
+            return True, promoted
+
+    def user_reservations(self, username, past=None, now=None):
+        """Returns the sorted (datetime, slot) pairs of the user's reservations, only the ones before now if past
+        is True or from now on if past is False."""
+        return self.load().user_reservations(username, past, now)
+
+    def user_reservations_page(self, username, past=None, now=None, page=0, size=10, date=None):
+        """Returns one page of the user's sorted (datetime, slot) pairs, the page number from 0 and the number of
+        pages, see occupancy.page_user_reservations."""
+        return self.load().user_reservations_page(username, past, now, page, size, date)
+
+
+class SqliteBackend:
+    """Keeps the reservations in an SQLite database indexed by date, time and slot and by username."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS reservations (
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            username TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS reservations_date_time_slot ON reservations (date, time, slot);
+        CREATE INDEX IF NOT EXISTS reservations_username ON reservations (username);
+        CREATE TABLE IF NOT EXISTS waitlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            username TEXT NOT NULL,
+            UNIQUE (date, time, username)
+        );
+        CREATE INDEX IF NOT EXISTS waitlist_date_time_id ON waitlist (date, time, id);
+    """
+
+    def __init__(self, path="reservations.db", import_from="reservations.json"):
+        self.path = path
+        is_new = not os.path.exists(path)
+        with self.connect() as connection:
+            connection.executescript(self.SCHEMA)
+        if is_new and import_from and os.path.exists(import_from):
+            self.save(JsonBackend(import_from).load())
+
+    @contextmanager
+    def connect(self):
+        """Opens a connection to the database, commits on success and closes it afterwards."""
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def load(self, start=None, end=None):
+        """Loads the reservations, optionally only the ones between the start and end dates."""
+        query = "SELECT date, time, slot, username FROM reservations"
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(end)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY date, time, rowid"
+        reservations = {}
+        with self.connect() as connection:
+            for date, time, slot, username in connection.execute(query, params):
+                reservations.setdefault(get_reservation_key(date, time), []).append(Booking(slot, username))
+        return IndexedReservations(reservations)
+
+    def save(self, reservations):
+        """Replaces the stored reservations with the given ones."""
+        rows = [(*key.split(), res['slot'], res['username']) for key, slots in reservations.items() for res in slots]
+        with self.connect() as connection:
+            connection.execute("DELETE FROM reservations")
+            connection.executemany("INSERT INTO reservations (date, time, slot, username) VALUES (?, ?, ?, ?)", rows)
+
+    def add(self, date, time, slot, username):
+        """Stores a new reservation for the given date, time and slot, returns False if the slot is already taken."""
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            taken = connection.execute("SELECT 1 FROM reservations WHERE date = ? AND time = ? AND slot = ?",
+                                       (date, time, slot)).fetchone()
+            if taken:
+                return False
+            connection.execute("INSERT INTO reservations (date, time, slot, username) VALUES (?, ?, ?, ?)",
+                               (date, time, slot, username))
+            return True
+
+    def add_many(self, bookings):
+        """Stores the (date, time, slot, username) bookings in a single transaction, skipping the ones whose slot
+        is already taken. Returns the skipped ones. Nothing is stored if the bookings can't all be read."""
+        conflicts = []
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for date, time, slot, username in bookings:
+                taken = connection.execute("SELECT 1 FROM reservations WHERE date = ? AND time = ? AND slot = ?",
+                                           (date, time, slot)).fetchone()
+                if taken:
+                    conflicts.append((date, time, slot, username))
+                    continue
+                connection.execute("INSERT INTO reservations (date, time, slot, username) VALUES (?, ?, ?, ?)",
+                                   (date, time, slot, username))
+        return conflicts
+
+    def add_all(self, bookings):
+        """Stores every (date, time, slot, username) booking in one transaction, or none of them if any of their
+        slots is already taken. Returns the conflicting ones. The slots taken over the dates of the bookings are
+        read with a single query."""
+        bookings = list(bookings)
+        if not bookings:
+            return []
+        dates = [date for date, _, _, _ in bookings]
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            taken = set(connection.execute("SELECT date, time, slot FROM reservations WHERE date BETWEEN ? AND ?",
+                                           (min(dates), max(dates))))
+            conflicts = []
+            for booking in bookings:
+                if booking[:3] in taken:
+                    conflicts.append(booking)
+                taken.add(booking[:3])
+            if conflicts:
+                return conflicts
+            connection.executemany("INSERT INTO reservations (date, time, slot, username) VALUES (?, ?, ?, ?)",
+                                   bookings)
+            return []
+
+    def remove(self, key, slot, username):
+        """Removes the user's reservation of the given slot, returns False if there was none."""
+        date, time = key.split()
+        with self.connect() as connection:
+            cursor = connection.execute(
+                "DELETE FROM reservations WHERE date = ? AND time = ? AND slot = ? AND username = ?",
+                (date, time, slot, username))
+            return cursor.rowcount > 0
+
+    def iter_bookings(self):
+        """Yields every (date, time, slot, username) booking, reading the rows as they are consumed."""
+        with self.connect() as connection:
+            yield from connection.execute(
+                "SELECT date, time, slot, username FROM reservations ORDER BY date, time, rowid")
+
+    def waitlist(self, key):
+        """Returns the usernames waiting for a slot at the key, first in line first."""
+        with self.connect() as connection:
+            rows = connection.execute("SELECT username FROM waitlist WHERE date = ? AND time = ? ORDER BY id",
+                                      key.split())
+            return [username for username, in rows]
+
+    def join_waitlist(self, key, username, slot_count=None):
+        """Puts the user in line for a slot at the key, returns their position from 1. Given the slot count, returns
+        None without joining if a slot is free, checked in the same transaction."""
+        date, time = key.split()
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if slot_count is not None:
+                taken = connection.execute("SELECT COUNT(DISTINCT slot) FROM reservations WHERE date = ? AND time = ? "
+                                           "AND slot BETWEEN 1 AND ?", (date, time, slot_count)).fetchone()[0]
+                if taken < slot_count:
+                    return None
+            connection.execute("INSERT OR IGNORE INTO waitlist (date, time, username) VALUES (?, ?, ?)",
+                               (date, time, username))
+            return connection.execute(
+                "SELECT COUNT(*) FROM waitlist WHERE date = ? AND time = ? AND id <= "
+                "(SELECT id FROM waitlist WHERE date = ? AND time = ? AND username = ?)",
+                (date, time, date, time, username)).fetchone()[0]
+
+    def leave_waitlist(self, key, username):
+        """Takes the user out of line for a slot at the key, returns False if they weren't in it."""
+        with self.connect() as connection:
+            cursor = connection.execute("DELETE FROM waitlist WHERE date = ? AND time = ? AND username = ?",
+                                        (*key.split(), username))
+            return cursor.rowcount > 0
+
+    def cancel(self, key, slot, username):
+        """Removes the user's reservation of the slot and books it for the first user waiting for it, in one
+        transaction. Returns whether there was such a reservation and the username of the promoted user, None if
+        nobody was waiting."""
+        date, time = key.split()
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            cursor = connection.execute(
+                "DELETE FROM reservations WHERE date = ? AND time = ? AND slot = ? AND username = ?",
+                (date, time, slot, username))
+            if cursor.rowcount == 0:
+                return False, None
+            while True:
+                waiting = connection.execute(
+                    "SELECT id, username FROM waitlist WHERE date = ? AND time = ? ORDER BY id LIMIT 1",
+                    (date, time)).fetchone()
+                if waiting is None:
+                    return True, None
+                connection.execute("DELETE FROM waitlist WHERE id = ?", (waiting[0],))
+                holds_slot = connection.execute(
+                    "SELECT 1 FROM reservations WHERE date = ? AND time = ? AND username = ?",
+                    (date, time, waiting[1])).fetchone()
+                if not holds_slot:
+                    connection.execute("INSERT INTO reservations (date, time, slot, username) VALUES (?, ?, ?, ?)",
+                                       (date, time, slot, waiting[1]))
+                    return True, waiting[1]
+
+    def user_reservations(self, username, past=None, now=None):
+        """Returns the sorted (datetime, slot) pairs of the user's reservations, only the ones before now if past
+        is True or from now on if past is False."""
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT date, time, slot FROM reservations WHERE username = ? ORDER BY date, time, slot", (username,))
+            packed_records = [ReservationRecord.from_json(get_reservation_key(date, time),
+                                                          {'slot': slot, 'username': username}).pack()
+                              for date, time, slot in rows]
+        return unpack_user_reservations(split_user_reservations(packed_records, past, now), username)
+
+    def user_reservations_page(self, username, past=None, now=None, page=0, size=10, date=None):
+        """Returns one page of the user's sorted (datetime, slot) pairs, the page number from 0 and the number of
+        pages, see occupancy.page_user_reservations. The page is counted and read by the database."""
+        condition, params = "username = ?", [username]
+        if past is not None:
+            now = now or datetime.datetime.now()
+            # A reservation of the current minute is already past once any part of that minute has gone by.
+            cutoff = now.replace(second=0, microsecond=0)
+            if cutoff != now:
+                cutoff += datetime.timedelta(minutes=1)
+            condition += " AND date || ' ' || time " + ("< ?" if past else ">= ?")
+            params.append(f"{cutoff:%Y-%m-%d %H:%M}")
+        with self.connect() as connection:
+            count = connection.execute(f"SELECT COUNT(*) FROM reservations WHERE {condition}", params).fetchone()[0]
+            page_count = max(1, -(-count // size))
+            if date is not None:
+                before = connection.execute(f"SELECT COUNT(*) FROM reservations WHERE {condition} AND date < ?",
+                                            params + [datetime.date.fromisoformat(date).isoformat()]).fetchone()[0]
+                page = before // size
+            page = min(max(page, 0), page_count - 1)
+            rows = connection.execute(f"SELECT date, time, slot FROM reservations WHERE {condition} "
+                                      f"ORDER BY date, time, slot LIMIT ? OFFSET ?", params + [size, page * size])
+            found = [(datetime.datetime.fromisoformat(f"{date} {time}"), slot) for date, time, slot in rows]
+        return found, page, page_count
+
+    def occupancy(self, resource):
+        """The database answers availability from its index, there is no occupancy file."""
+        return None
+
+
+class JournalBackend:
+    """Keeps a JSON snapshot of the reservations and waitlists plus an append-only log of the bookings,
+    cancellations and waitlist changes made since, so each write appends one line instead of rewriting the snapshot.
+    The log is folded back into the snapshot once it grows past compact_size bytes."""
+
+    def __init__(self, path="reservations.json", log_path="reservations.log", compact_size=1024 * 1024):
+        self.path = path
+        self.waitlist_path = waitlist_path_for(path)
+        self.log_path = log_path
+        self.lock_path = path + ".lock"
+        self.compact_size = compact_size
+        self.reservations = None
+        self.waitlists = None
+        self.snapshot_stamp = None
+        self.log_offset = 0
+
+    def refresh(self):
+        """Brings the in-memory reservations up to date with the snapshot and the log, reading only the log lines
+        appended since the last refresh. Must be called while holding the lock."""
+        snapshot_stamp = file_stamp(self.path)
+        log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        if self.reservations is None or snapshot_stamp != self.snapshot_stamp or log_size < self.log_offset:
+            snapshot = JsonBackend(self.path)
+            self.reservations = snapshot.read()
+            self.waitlists = snapshot.read_waitlists()
+            self.snapshot_stamp = snapshot_stamp
+            self.log_offset = 0
+        if log_size == self.log_offset:
+            return
+        metrics.bytes_read(log_size - self.log_offset)
+        with open(self.log_path, 'rb') as log:
+            log.seek(self.log_offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    break
+                self.apply(json.loads(line))
+                self.log_offset += len(line)
+        if log_size > self.log_offset:
+            # A writer crashed halfway through a line, drop it so the next append starts on a clean line.
+            with open(self.log_path, 'r+b') as log:
+                log.truncate(self.log_offset)
+
+    def apply(self, record):
+        """Replays one log record on the in-memory reservations and waitlists. A cancellation that promoted a user
+        from the waitlist names them, so the slot is booked for them in the same record."""
+        op = record['op']
+        if op == "add":
+            self.reservations.book(record['key'], record['slot'], record['username'])
+        elif op == "add_all":
+            self.reservations.book_all([tuple(booking) for booking in record['bookings']])
+        elif op == "remove":
+            self.reservations.release(record['key'], record['slot'], record['username'])
+            if record.get('promoted') is not None:
+                self.waitlists.leave(record['key'], record['promoted'])
+                self.reservations.book(record['key'], record['slot'], record['promoted'])
+        elif op == "wait":
+            self.waitlists.join(record['key'], record['username'])
+        elif op == "leave":
+            self.waitlists.leave(record['key'], record['username'])
+
+    def append(self, record):
+        """Appends one record to the log and applies it. Must be called while holding the lock."""
+        line = (json.dumps(record) + "\n").encode('utf-8')
+        with open(self.log_path, 'ab') as log:
+            log.write(line)
+            metrics.bytes_written(len(line))
+            log.flush()
+            os.fsync(log.fileno())
+        self.log_offset += len(line)
+        self.apply(record)
+        if self.log_offset >= self.compact_size:
+            self.compact()
+
+    def compact(self):
+        """Folds the log into a new snapshot and empties it. Must be called while holding the lock."""
+        atomic_write_json(self.waitlist_path, self.waitlists.to_json())
+        atomic_write_json(self.path, self.reservations)
+        cache.invalidate(self.path)
+        cache.invalidate(self.waitlist_path)
+        with open(self.log_path, 'wb'):
+            pass
+        self.snapshot_stamp = file_stamp(self.path)
+        self.log_offset = 0
+
+    def load(self, start=None, end=None):
+        """Loads the reservations, optionally only the ones between the start and end dates. The returned dict is
+        shared with the backend and must not be modified."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            if start is None and end is None:
+                return self.reservations
+            return self.reservations.between(start, end)
+
+    def save(self, reservations):
+        """Replaces the stored reservations with the given ones."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            self.reservations = IndexedReservations(reservations)
+            self.compact()
+
+    def add(self, date, time, slot, username):
+        """Stores a new reservation for the given date, time and slot, returns False if the slot is already taken."""
+        key = get_reservation_key(date, time)
+        with file_lock(self.lock_path):
+            self.refresh()
+            if self.reservations.is_reserved(key, slot):
+                return False
+            self.append({'op': "add", 'key': key, 'slot': slot, 'username': username})
+            return True
+
+    def add_many(self, bookings):
+        """Stores the (date, time, slot, username) bookings by writing a new snapshot once instead of appending a
+        log line per booking, skipping the ones whose slot is already taken. Returns the skipped ones. Nothing is
+        stored if the bookings can't all be read."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            conflicts = []
+            try:
+                for date, time, slot, username in bookings:
+                    if not self.reservations.book(get_reservation_key(date, time), slot, username):
+                        conflicts.append((date, time, slot, username))
+                self.compact()
+            except BaseException:
+                # Reload from the files, the in-memory reservations hold bookings that were never written.
+                self.reservations = None
+                raise
+            return conflicts
+
+    def add_all(self, bookings):
+        """Stores every (date, time, slot, username) booking in a single log record, or none of them if any of
+        their slots is already taken. Returns the conflicting ones."""
+        keyed = [(get_reservation_key(date, time), slot, username) for date, time, slot, username in bookings]
+        with file_lock(self.lock_path):
+            self.refresh()
+            wanted = set()
+            conflicts = []
+            for key, slot, username in keyed:
+                if self.reservations.is_reserved(key, slot) or (key, slot) in wanted:
+                    conflicts.append((*key.split(), slot, username))
+                wanted.add((key, slot))
+            if conflicts:
+                return conflicts
+            self.append({'op': "add_all", 'bookings': keyed})
+            return []
+
+    def remove(self, key, slot, username):
+        """Removes the user's reservation of the given slot, returns False if there was none."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            if not any(res['slot'] == slot and res['username'] == username for res in self.reservations.get(key, [])):
+                return False
+            self.append({'op': "remove", 'key': key, 'slot': slot, 'username': username})
+            return True
+
+    def waitlist(self, key):
+        """Returns the usernames waiting for a slot at the key, first in line first."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            return list(self.waitlists.get(key, ()))
+
+    def join_waitlist(self, key, username, slot_count=None):
+        """Puts the user in line for a slot at the key, returns their position from 1. Given the slot count, returns
+        None without joining if a slot is free, as checked under the lock."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            if slot_count is not None and not self.reservations.is_full(key, slot_count):
+                return None
+            queue = self.waitlists.get(key, {})
+            if username in queue:
+                return list(queue).index(username) + 1
+            self.append({'op': "wait", 'key': key, 'username': username})
+            return len(self.waitlists[key])
+
+    def leave_waitlist(self, key, username):
+        """Takes the user out of line for a slot at the key, returns False if they weren't in it."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            if username not in self.waitlists.get(key, {}):
+                return False
+            self.append({'op': "leave", 'key': key, 'username': username})
+            return True
+
+    def cancel(self, key, slot, username):
+        """Removes the user's reservation of the slot and books it for the first user waiting for it, in a single
+        log record. Returns whether there was such a reservation and the username of the promoted user, None if
+        nobody was waiting."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            slots = self.reservations.get(key, [])
+            if not any(res['slot'] == slot and res['username'] == username for res in slots):
+                return False, None
+            holders = {res['username'] for res in slots if res['username'] != username}
+            promoted = next((waiting for waiting in self.waitlists.get(key, ()) if waiting not in holders), None)
+            for waiting in list(self.waitlists.get(key, ())):
+                if waiting == promoted:
+                    break
+                # Users who got a slot at that time in the meantime are dropped from the line.
+                self.append({'op': "leave", 'key': key, 'username': waiting})
+            self.append({'op': "remove", 'key': key, 'slot': slot, 'username': username, 'promoted': promoted})
+            return True, promoted
+
+    def iter_bookings(self):
+        """Yields every (date, time, slot, username) booking."""
+        return iter_bookings(self.load())
+
+    def user_reservations(self, username, past=None, now=None):
+        """Returns the sorted (datetime, slot) pairs of the user's reservations, only the ones before now if past
+        is True or from now on if past is False."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            return self.reservations.user_reservations(username, past, now)
+
+    def user_reservations_page(self, username, past=None, now=None, page=0, size=10, date=None):
+        """Returns one page of the user's sorted (datetime, slot) pairs, the page number from 0 and the number of
+        pages, see occupancy.page_user_reservations."""
+        with file_lock(self.lock_path):
+            self.refresh()
+            return self.reservations.user_reservations_page(username, past, now, page, size, date)
+
+    def occupancy(self, resource):
+        """The snapshot lags behind the journal, so there is no occupancy file."""
+        return None
+
+
+# How the partitioned backend names the partition of an ISO date, one file per window.
+PARTITION_WINDOWS = {"month": lambda date: date[:7], "year": lambda date: date[:4]}
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def make_writable(path):
+    """Clears the read-only bit of a sealed archive, Windows refuses to replace or remove a read-only file."""
+    if os.path.exists(path):
+        os.chmod(path, READ_ONLY | stat.S_IWUSR)
+
+
+class PartitionedBackend:
+    """Splits the reservations into one JSON document per month (or year) in a directory, so booking and
+    availability only read the partitions of the dates they ask for. Partitions that ended before the current one
+    are sealed: moved to an archive folder and made read-only, and only history views and reports open them.
+    Every write holds a lock on the whole directory, so a write spanning several partitions is checked in full
+    before any of them is written."""
+
+    def __init__(self, directory="reservations", window=None, import_from="reservations.json"):
+        self.directory = directory
+        self.archive_directory = os.path.join(directory, "archive")
+        self.window = window or os.environ.get(PARTITION_WINDOW_ENV, "month")
+        if self.window not in PARTITION_WINDOWS:
+            raise ValueError(f"Unknown partition window: {self.window}")
+        self.partition_of = PARTITION_WINDOWS[self.window]
+        self.lock_path = os.path.join(directory, ".lock")
+        is_new = not os.path.isdir(directory)
+        os.makedirs(self.archive_directory, exist_ok=True)
+        if is_new and import_from and os.path.exists(import_from):
+            self.save(JsonBackend(import_from).load())
+
+    def current_partition(self, today=None):
+        return self.partition_of((today or datetime.date.today()).isoformat())
+
+    def is_sealed(self, partition, today=None):
+        return partition < self.current_partition(today)
+
+    def listed(self, directory):
+        """Returns the names of the partitions stored in the directory, in chronological order."""
+        names = (name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json"))
+        return sorted(name for name in names if "_" not in name)
+
+    def partitions(self, start=None, end=None, archived=True):
+        """Returns the (partition, JsonBackend) pairs overlapping the start and end dates in chronological order,
+        leaving out the archives unless archived is True."""
+        found = [(name, self.directory) for name in self.listed(self.directory)]
+        if archived:
+            found += [(name, self.archive_directory) for name in self.listed(self.archive_directory)]
+        first = None if start is None else self.partition_of(start)
+        last = None if end is None else self.partition_of(end)
+        # An archive sorts before a live partition of the same name. Both only exist when a history import wrote
+        # to the archive as the partition was being sealed, until the next seal merges them.
+        found.sort(key=lambda item: (item[0], item[1] != self.archive_directory))
+        return [(name, JsonBackend(os.path.join(directory, name + ".json"))) for name, directory in found
+                if (first is None or name >= first) and (last is None or name <= last)]
+
+    def partition(self, date):
+        """Returns the backend of the live partition of the ISO date, None if it has been sealed."""
+        name = self.partition_of(date)
+        if self.is_sealed(name):
+            return None
+        return JsonBackend(os.path.join(self.directory, name + ".json"))
+
+    def seal(self, today=None):
+        """Moves the live partitions that ended before today's into the archive and makes them read-only. Their
+        waitlists are dropped, no slot can free up in the past. Must be called while holding the lock."""
+        for name in self.listed(self.directory):
+            if not self.is_sealed(name, today):
+                continue
+            live = JsonBackend(os.path.join(self.directory, name + ".json"))
+            archive = JsonBackend(os.path.join(self.archive_directory, name + ".json"))
+            if os.path.exists(archive.path):
+                # A history import wrote to the archive of this partition while it was still live. The live
+                # bookings are added to the archive's, a slot booked in both keeps the archived booking.
+                merged = archive.read()
+                for date, time, slot, username in iter_bookings(live.read()):
+                    merged.book(get_reservation_key(date, time), slot, username)
+                self.write_archive(archive, merged)
+                os.remove(live.path)
+            else:
+                os.replace(live.path, archive.path)
+                os.chmod(archive.path, READ_ONLY)
+            for path in (live.waitlist_path, live.lock_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            cache.invalidate(live.path)
+            cache.invalidate(live.waitlist_path)
+
+    def write_archive(self, archive, reservations):
+        """Replaces the contents of a sealed archive, which stays read-only."""
+        make_writable(archive.path)
+        try:
+            archive.write(IndexedReservations(reservations))
+        finally:
+            os.chmod(archive.path, READ_ONLY)
+
+    def load(self, start=None, end=None):
+        """Loads the reservations, optionally only the ones between the start and end dates, reading only the
+        partitions of those dates. The returned dict may be shared with the backend and must not be modified."""
+        partitions = self.partitions(start, end)
+        if len(partitions) == 1:
+            return partitions[0][1].load(start, end)
+        merged = {}
+        for _, partition in partitions:
+            loaded = partition.load(start, end)
+            # Only an archive and the live partition of the same name share keys, see partitions.
+            shared = {key: [*merged[key], *loaded[key]] for key in merged.keys() & loaded.keys()}
+            merged.update(loaded)
+            merged.update(shared)
+        return IndexedReservations(merged)
+
+    def save(self, reservations):
+        """Replaces the stored reservations with the given ones, split into partitions."""
+        grouped = {}
+        for key, slots in reservations.items():
+            grouped.setdefault(self.partition_of(key), {})[key] = slots
+        with file_lock(self.lock_path):
+            for _, partition in self.partitions():
+                make_writable(partition.path)
+                os.remove(partition.path)
+                cache.invalidate(partition.path)
+            for name, group in grouped.items():
+                if self.is_sealed(name):
+                    self.write_archive(JsonBackend(os.path.join(self.archive_directory, name + ".json")), group)
+                else:
+                    JsonBackend(os.path.join(self.directory, name + ".json")).save(group)
+
+    def add(self, date, time, slot, username):
+        """Stores a new reservation for the given date, time and slot, returns False if the slot is already taken
+        or its partition has been sealed."""
+        with file_lock(self.lock_path):
+            self.seal()
+            partition = self.partition(date)
+            return partition is not None and partition.add(date, time, slot, username)
+
+    def grouped(self, bookings):
+        """Splits the (date, time, slot, username) bookings by partition, reading them all first."""
+        groups = {}
+        for booking in bookings:
+            groups.setdefault(self.partition_of(booking[0]), []).append(booking)
+        return groups
+
+    def add_many(self, bookings):
+        """Stores the (date, time, slot, username) bookings with one write per partition, skipping the ones whose
+        slot is already taken. Returns the skipped ones. Bookings of sealed partitions go to their archive, so
+        history can be imported. Nothing is stored if the bookings can't all be read."""
+        groups = self.grouped(bookings)
+        conflicts = []
+        with file_lock(self.lock_path):
+            self.seal()
+            for name in sorted(groups):
+                if not self.is_sealed(name):
+                    conflicts += JsonBackend(os.path.join(self.directory, name + ".json")).add_many(groups[name])
+                    continue
+                archive = JsonBackend(os.path.join(self.archive_directory, name + ".json"))
+                reservations = IndexedReservations(archive.read())
+                for date, time, slot, username in groups[name]:
+                    if not reservations.book(get_reservation_key(date, time), slot, username):
+                        conflicts.append((date, time, slot, username))
+                self.write_archive(archive, reservations)
+        return conflicts
+
+    def add_all(self, bookings):
+        """Stores every (date, time, slot, username) booking, or none of them if any of their slots is already
+        taken or in a sealed partition. Returns the conflicting ones. Every partition is checked before the first
+        one is written."""
+        groups = self.grouped(bookings)
+        with file_lock(self.lock_path):
+            self.seal()
+            conflicts = []
+            for name in sorted(groups):
+                if self.is_sealed(name):
+                    conflicts += groups[name]
+                    continue
+                reservations = JsonBackend(os.path.join(self.directory, name + ".json")).load()
+                wanted = set()
+                for date, time, slot, username in groups[name]:
+                    key = get_reservation_key(date, time)
+                    if reservations.is_reserved(key, slot) or (key, slot) in wanted:
+                        conflicts.append((date, time, slot, username))
+                    wanted.add((key, slot))
+            if conflicts:
+                return conflicts
+            for name in sorted(groups):
+                JsonBackend(os.path.join(self.directory, name + ".json")).add_all(groups[name])
+            return []
+
+    def remove(self, key, slot, username):
+        """Removes the user's reservation of the given slot, returns False if there was none or it has been
+        archived."""
+        with file_lock(self.lock_path):
+            self.seal()
+            partition = self.partition(key)
+            return partition is not None and partition.remove(key, slot, username)
+
+    def cancel(self, key, slot, username):
+        """Removes the user's reservation of the slot and books it for the first user waiting for it, see
+        JsonBackend.cancel."""
+        with file_lock(self.lock_path):
+            self.seal()
+            partition = self.partition(key)
+            return partition.cancel(key, slot, username) if partition is not None else (False, None)
+
+    def waitlist(self, key):
+        """Returns the usernames waiting for a slot at the key, first in line first."""
+        partition = self.partition(key)
+        return partition.waitlist(key) if partition is not None else []
+
+    def join_waitlist(self, key, username, slot_count=None):
+        """Puts the user in line for a slot at the key, returns their position from 1, or None if a slot is free
+        given the slot count, see JsonBackend.join_waitlist. Raises ValueError for a key in a sealed partition."""
+        with file_lock(self.lock_path):
+            partition = self.partition(key)
+            if partition is None:
+                raise ValueError(f"{key} has been archived.")
+            return partition.join_waitlist(key, username, slot_count)
+
+    def leave_waitlist(self, key, username):
+        """Takes the user out of line for a slot at the key, returns False if they weren't in it."""
+        with file_lock(self.lock_path):
+            partition = self.partition(key)
+            return partition is not None and partition.leave_waitlist(key, username)
+
+    def iter_bookings(self):
+        """Yields every (date, time, slot, username) booking, one partition at a time."""
+        for _, partition in self.partitions():
+            yield from iter_bookings(partition.load())
+
+    def user_reservations(self, username, past=None, now=None):
+        """Returns the sorted (datetime, slot) pairs of the user's reservations, only the ones before now if past
+        is True or from now on if past is False. Upcoming reservations are looked up in the live partitions only,
+        the archives are opened for past ones."""
+        now = now or datetime.datetime.now()
+        current = self.partition_of(now.date().isoformat())
+        found = []
+        for name, partition in self.partitions(archived=past is not False):
+            if past is True and name > current:
+                break
+            found += partition.user_reservations(username, past, now)
+        return found
+
+    def user_reservations_page(self, username, past=None, now=None, page=0, size=10, date=None):
+        """Returns one page of the user's sorted (datetime, slot) pairs, the page number from 0 and the number of
+        pages, see occupancy.page_user_reservations. The partitions are searched like in user_reservations, and
+        only the records of the page are unpacked."""
+        now = now or datetime.datetime.now()
+        current = self.partition_of(now.date().isoformat())
+        segments = []
+        for name, partition in self.partitions(archived=past is not False):
+            if past is True and name > current:
+                break
+            packed_records = partition.load().by_user.get(username)
+            if packed_records:
+                segments.append((packed_records, *split_bounds(packed_records, past, now)))
+        return page_user_reservations(segments, username, page, size, date)
+
+    def occupancy(self, resource):
+        """Availability only reads the partitions it shows, there is no occupancy file."""
+        return None
+
+
+BACKENDS = {"json": JsonBackend, "sqlite": SqliteBackend, "journal": JournalBackend,
+            "partitioned": PartitionedBackend}
+
+_backend = None
+
+
+def create_backend(name):
+    """Creates the storage backend with the given name."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown reservation backend: {name}")
+    return BACKENDS[name]()
+
+
+def get_backend():
+    """Gets the storage backend in use, chosen by the RESERVATION_BACKEND environment variable (json by default)."""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(os.environ.get(BACKEND_ENV, "json"))
+    return _backend
+
+
+def set_backend(backend):
+    """Replaces the storage backend in use."""
+    global _backend
+    _backend = backend
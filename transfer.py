@@ -0,0 +1,153 @@
+import csv
+import datetime
+import json
+import time
+
+import resources
+
+FORMATS = ("json", "jsonl", "csv")
+CSV_FIELDS = ("date", "time", "slot", "username")
+
+
+class InvalidBooking(ValueError):
+    """Raised when a record of an imported file is not a valid booking."""
+
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+def guess_format(path):
+    """Returns the format of a file from its extension, json if it has none of the known ones."""
+    extension = path.rsplit('.', 1)[-1].lower()
+    return extension if extension in FORMATS else "json"
+
+
+def read_jsonl(file):
+    """Yields the line number and (date, time, slot, username) booking of every record of a JSON Lines file,
+    skipping blank lines."""
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield line_number, (record['date'], record['time'], record['slot'], record['username'])
+        except (ValueError, KeyError, TypeError) as error:
+            raise InvalidBooking(line_number, f"not a booking record ({error})") from None
+
+
+def read_csv(file):
+    """Yields the line number and (date, time, slot, username) booking of every row of a CSV file with a
+    date,time,slot,username header."""
+    reader = csv.DictReader(file)
+    if reader.fieldnames is None:
+        return
+    missing = set(CSV_FIELDS) - set(reader.fieldnames)
+    if missing:
+        raise InvalidBooking(1, f"missing columns: {', '.join(sorted(missing))}")
+    for row in reader:
+        yield reader.line_num, (row['date'], row['time'], row['slot'], row['username'])
+
+
+def read_json(file):
+    """Yields the line number and (date, time, slot, username) booking of every reservation of a
+    reservations.json style document. Unlike the other formats the document is read in one go, and there
+    are no line numbers, so the position of the reservation is given instead."""
+    position = 0
+    for key, slots in json.load(file).items():
+        date, _, time = key.partition(" ")
+        for res in slots:
+            position += 1
+            yield position, (date, time, res.get('slot'), res.get('username'))
+
+
+READERS = {"json": read_json, "jsonl": read_jsonl, "csv": read_csv}
+
+
+def validate(numbered_bookings):
+    """Yields the bookings with their slot as an int, raising InvalidBooking on the first one with a malformed
+    date, a time that isn't on the resource's grid, a slot the resource doesn't have or no username. Opening hours
+    and closed dates are not checked, so past bookings made under other hours can be imported."""
+    resource = resources.get_resource()
+    times = set(resource.times)
+    for line, (date, time_of_day, slot, username) in numbered_bookings:
+        try:
+            datetime.date.fromisoformat(date)
+        except (TypeError, ValueError):
+            raise InvalidBooking(line, f"invalid date {date!r}") from None
+        if time_of_day not in times:
+            raise InvalidBooking(line, f"invalid time {time_of_day!r}")
+        try:
+            slot = int(slot)
+        except (TypeError, ValueError):
+            raise InvalidBooking(line, f"invalid slot {slot!r}") from None
+        if not resource.has_slot(slot):
+            raise InvalidBooking(line, f"slot {slot} is not between 1 and {resource.slot_count}")
+        if not isinstance(username, str) or not username:
+            raise InvalidBooking(line, "missing username")
+        yield date, time_of_day, slot, username
+
+
+def read_bookings(file, file_format):
+    """Yields the validated bookings of an open file, one record at a time."""
+    return validate(READERS[file_format](file))
+
+
+def write_jsonl(bookings, file):
+    """Writes the bookings as JSON Lines, one record at a time. Returns how many were written."""
+    count = 0
+    for date, time_of_day, slot, username in bookings:
+        file.write(json.dumps({'date': date, 'time': time_of_day, 'slot': slot, 'username': username}) + "\n")
+        count += 1
+    return count
+
+
+def write_csv(bookings, file):
+    """Writes the bookings as CSV with a date,time,slot,username header, one row at a time. Returns how many were
+    written."""
+    writer = csv.writer(file)
+    writer.writerow(CSV_FIELDS)
+    count = 0
+    for booking in bookings:
+        writer.writerow(booking)
+        count += 1
+    return count
+
+
+def write_json(bookings, file):
+    """Writes the bookings as a reservations.json style document, which has to be built in memory first. Returns
+    how many were written."""
+    reservations = {}
+    count = 0
+    for date, time_of_day, slot, username in bookings:
+        reservations.setdefault(f"{date} {time_of_day}", []).append({'slot': slot, 'username': username})
+        count += 1
+    json.dump(reservations, file)
+    return count
+
+
+WRITERS = {"json": write_json, "jsonl": write_jsonl, "csv": write_csv}
+
+
+def write_bookings(bookings, file, file_format):
+    """Writes the bookings to an open file in the given format. Returns how many were written."""
+    return WRITERS[file_format](bookings, file)
+
+
+class Counted:
+    """Wraps an iterable to count the items taken from it and time how long it took."""
+
+    def __init__(self, iterable):
+        self.iterable = iterable
+        self.count = 0
+        self.start = time.perf_counter()
+
+    def __iter__(self):
+        for item in self.iterable:
+            self.count += 1
+            yield item
+
+    def rate(self):
+        """Returns the number of items taken per second so far."""
+        elapsed = time.perf_counter() - self.start
+        return self.count / elapsed if elapsed > 0 else float(self.count)
@@ -0,0 +1,96 @@
+import datetime
+import io
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from resources import DEFAULT_TIMES
+from storage import SqliteBackend
+from transfer import (Counted, InvalidBooking, guess_format, read_bookings, read_csv, read_jsonl, write_bookings,
+                      write_csv, write_jsonl)
+
+BOOKINGS = [("2023-01-01", "09:00", 1, "user1"), ("2023-01-01", "09:00", 3, "user2"),
+            ("2023-01-02", "23:00", 2, "user1")]
+
+
+class TestTransfer(unittest.TestCase):
+
+    def test_guess_format(self):
+        self.assertEqual(guess_format("backup.CSV"), "csv")
+        self.assertEqual(guess_format("backup.jsonl"), "jsonl")
+        self.assertEqual(guess_format("reservations.json"), "json")
+        self.assertEqual(guess_format("backup"), "json")
+
+    def test_round_trips(self):
+        for file_format in ("json", "jsonl", "csv"):
+            with self.subTest(file_format=file_format):
+                file = io.StringIO(newline='')
+                self.assertEqual(write_bookings(iter(BOOKINGS), file, file_format), 3)
+                file.seek(0)
+                self.assertEqual(list(read_bookings(file, file_format)), BOOKINGS)
+
+    def test_jsonl_line_numbers(self):
+        file = io.StringIO('{"date": "2023-01-01", "time": "09:00", "slot": 1, "username": "a"}\n\nnot json\n')
+        records = read_jsonl(file)
+        self.assertEqual(next(records), (1, ("2023-01-01", "09:00", 1, "a")))
+        with self.assertRaises(InvalidBooking) as raised:
+            next(records)
+        self.assertEqual(raised.exception.line, 3)
+
+    def test_csv_missing_columns(self):
+        with self.assertRaises(InvalidBooking):
+            list(read_csv(io.StringIO("date,time,slot\n2023-01-01,09:00,1\n")))
+        self.assertEqual(list(read_csv(io.StringIO(""))), [])
+
+    def test_validation(self):
+        rows = {
+            "2023-02-30,09:00,1,a": "invalid date",
+            "2023-01-01,10:00,1,a": "invalid time",
+            "2023-01-01,09:00,x,a": "invalid slot",
+            "2023-01-01,09:00,0,a": "slot 0 is not between 1 and 3",
+            "2023-01-01,09:00,4,a": "slot 4 is not between 1 and 3",
+            "2023-01-01,09:00,1,": "missing username",
+        }
+        for row, message in rows.items():
+            with self.subTest(row=row):
+                with self.assertRaisesRegex(InvalidBooking, f"Line 2: {message}"):
+                    list(read_bookings(io.StringIO(f"date,time,slot,username\n{row}\n"), "csv"))
+
+    def test_reading_is_lazy(self):
+        file = io.StringIO("date,time,slot,username\n2023-01-01,09:00,1,a\n2023-01-01,10:00,1,a\n")
+        bookings = read_bookings(file, "csv")
+        self.assertEqual(next(bookings), ("2023-01-01", "09:00", 1, "a"))
+        with self.assertRaises(InvalidBooking):
+            next(bookings)
+
+    def test_counted(self):
+        counted = Counted(iter(BOOKINGS))
+        self.assertEqual(list(counted), BOOKINGS)
+        self.assertEqual(counted.count, 3)
+        self.assertGreater(counted.rate(), 0)
+
+    def test_export_memory_stays_flat(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = SqliteBackend(os.path.join(directory, "reservations.db"), import_from=None)
+            first_day = datetime.date(2023, 1, 1).toordinal()
+            backend.add_many((datetime.date.fromordinal(first_day + number // 8).isoformat(), DEFAULT_TIMES[number % 8],
+                              1, f"user{number}") for number in range(20000))
+
+            def peak(count):
+                with open(os.devnull, 'w') as sink:
+                    tracemalloc.start()
+                    try:
+                        write_jsonl((booking for _, booking in zip(range(count), backend.iter_bookings())), sink)
+                        return tracemalloc.get_traced_memory()[1]
+                    finally:
+                        tracemalloc.stop()
+
+            # Twenty times the records must not take anywhere near twenty times the memory.
+            self.assertLess(peak(20000), peak(1000) * 3)
+            for writer in (write_csv, write_jsonl):
+                self.assertEqual(writer(backend.iter_bookings(), io.StringIO()), 20000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,31 +1,20 @@
 import json
 import os
 import re
-import bcrypt
 from rich.console import Console
 from rich.prompt import Prompt, Confirm
+import auth
+import metrics
+import session
+import user_store
+from records import User
 
 console = Console(color_system="windows")
 
 
-class User:
-    def __init__(self, username, password, first_name, last_name):
-        self.username = username
-        self.password = password
-        self.first_name = first_name
-        self.last_name = last_name
-
-    def to_dict(self):
-        return {
-            'username': self.username,
-            'password': self.password,
-            'first_name': self.first_name,
-            'last_name': self.last_name
-        }
-
-
+@metrics.timed("load_users")
 def load_users():
-    """Loads the information of the users."""
+    """Loads the information of the users from users.json, the import and export format of the user store."""
     if not os.path.exists('users.json'):
         return {}
     with open('users.json', 'r') as file:
@@ -66,8 +55,8 @@ def sign_up():
         username = Prompt.ask("Enter username")
         if not validate_input("Username", username):
             continue
-        users = load_users()
-        if username in users:
+        store = user_store.get_user_store()
+        if store.get(username) is not None:
             console.print("[red]Username already exists. Please choose another one.[/red]")
             continue
 
@@ -76,6 +65,8 @@ def sign_up():
             console.print("[red]Password must be between 8 and 32 characters and contain at least one letter and one "
                           "number.[/red]")
             continue
+        # The password is hashed in the background while the names are typed in.
+        password_hash = auth.get_service().hash(password)
 
         first_name = Prompt.ask("Enter first name")
         if not validate_input("First name", first_name) or not validate_name(first_name):
@@ -85,10 +76,10 @@ def sign_up():
         if not validate_input("Last name", last_name) or not validate_name(last_name):
             continue
 
-        user = User(username, bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8'), first_name,
-                    last_name)
-        users[username] = user.to_dict()
-        save_users(users)
+        user = User(username, password_hash.result(), first_name, last_name)
+        if not store.add(user):
+            console.print("[red]Username already exists. Please choose another one.[/red]")
+            continue
         console.print("[bold green]Sign up successful![/bold green]")
         return username
 
@@ -98,14 +89,35 @@ def log_in():
     console.print("[bold blue]Log In[/bold blue]")
     while True:
         username = Prompt.ask("Enter username")
+        if session.get_store().resume(username):
+            # Logged in on this terminal before and the session hasn't expired or been logged out of.
+            console.print("[bold green]Login successful![/bold green]")
+            return username
         password = Prompt.ask("Enter password")
 
-        users = load_users()
-        if username in users and bcrypt.checkpw(password.encode('utf-8'), users[username]['password'].encode('utf-8')):
+        store = user_store.get_user_store()
+        with metrics.timer("user_lookup"):
+            stored = store.get(username)
+        valid, new_hash = False, None
+        if stored is not None:
+            valid, new_hash = auth.get_service().verify(password, stored.password).result()
+        if valid:
+            if new_hash:
+                # The hash was made with another cost factor than the configured one.
+                store.set_password(username, new_hash)
+            session.get_store().issue(username)
+            metrics.count("logins_total")
             console.print("[bold green]Login successful![/bold green]")
             return username
         else:
+            metrics.count("failed_logins_total")
             console.print("[red]Invalid username or password.[/red]")
             retry = Confirm.ask("Do you want to try again?")
             if not retry:
                 return None
+
+
+def log_out(username):
+    """Ends the session of the user on this terminal, so the next login checks the password again."""
+    session.get_store().revoke(username)
+    console.print("[bold green]Logged out.[/bold green]")
@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import cache
+import storage
+from records import User
+
+USER_STORE_ENV = "RESERVATION_USER_STORE"
+
+
+class JsonUserStore:
+    """Keeps every user in a single JSON document, the format users.json has always had."""
+
+    def __init__(self, path="users.json"):
+        self.path = path
+        self.lock_path = path + ".lock"
+
+    def read(self):
+        """Parses the JSON document."""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as file:
+            return json.load(file)
+
+    def load(self):
+        """Returns the users dict, parsed again only when the file changed. It is shared and must not be
+        modified."""
+        return cache.get(self.path, self.read)
+
+    def get(self, username):
+        """Returns the user with the given username, None if there is none."""
+        data = self.load().get(username)
+        return User.from_dict(data) if data else None
+
+    def add(self, user):
+        """Stores a new user, returns False if the username is already taken."""
+        with storage.file_lock(self.lock_path):
+            users = dict(self.load())
+            if user.username in users:
+                return False
+            users[user.username] = user.to_dict()
+            self.write(users)
+            return True
+
+    def set_password(self, username, password):
+        """Replaces the stored password hash of the user."""
+        with storage.file_lock(self.lock_path):
+            users = dict(self.load())
+            users[username] = dict(users[username], password=password)
+            self.write(users)
+
+    def write(self, users):
+        """Writes the users and keeps them cached. Must be called while holding the lock."""
+        storage.atomic_write_json(self.path, users)
+        cache.put(self.path, users)
+
+    def users(self):
+        """Yields every user."""
+        for data in self.load().values():
+            yield User.from_dict(data)
+
+
+class SqliteUserStore:
+    """Keeps the users in an SQLite table keyed by username, so a lookup reads one row and a sign up writes one."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path="users.db", import_from="users.json"):
+        self.path = path
+        is_new = not os.path.exists(path)
+        with self.connect() as connection:
+            connection.executescript(self.SCHEMA)
+        if is_new and import_from and os.path.exists(import_from):
+            import_users(self, import_from)
+
+    @contextmanager
+    def connect(self):
+        """Opens a connection to the database, commits on success and closes it afterwards."""
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, username):
+        """Returns the user with the given username, None if there is none."""
+        with self.connect() as connection:
+            row = connection.execute("SELECT username, password, first_name, last_name FROM users WHERE username = ?",
+                                     (username,)).fetchone()
+        return User(*row) if row else None
+
+    def add(self, user):
+        """Stores a new user, returns False if the username is already taken."""
+        try:
+            with self.connect() as connection:
+                connection.execute("INSERT INTO users (username, password, first_name, last_name) VALUES (?, ?, ?, ?)",
+                                   (user.username, user.password, user.first_name, user.last_name))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def set_password(self, username, password):
+        """Replaces the stored password hash of the user."""
+        with self.connect() as connection:
+            connection.execute("UPDATE users SET password = ? WHERE username = ?", (password, username))
+
+    def users(self):
+        """Yields every user."""
+        with self.connect() as connection:
+            for row in connection.execute("SELECT username, password, first_name, last_name FROM users"):
+                yield User(*row)
+
+
+def import_users(store, path="users.json"):
+    """Adds the users of a users.json document to the store, skipping the usernames it already has. Returns how
+    many were added."""
+    return sum(store.add(user) for user in JsonUserStore(path).users())
+
+
+def export_users(store, path="users.json"):
+    """Writes every user of the store to a users.json document."""
+    storage.atomic_write_json(path, {user.username: user.to_dict() for user in store.users()})
+
+
+USER_STORES = {"sqlite": SqliteUserStore, "json": JsonUserStore}
+
+_store = None
+
+
+def create_user_store(name):
+    """Creates the user store with the given name."""
+    if name not in USER_STORES:
+        raise ValueError(f"Unknown user store: {name}")
+    return USER_STORES[name]()
+
+
+def get_user_store():
+    """Gets the user store in use, chosen by the RESERVATION_USER_STORE environment variable (sqlite by default,
+    importing users.json the first time)."""
+    global _store
+    if _store is None:
+        _store = create_user_store(os.environ.get(USER_STORE_ENV, "sqlite"))
+    return _store
+
+
+def set_user_store(store):
+    """Replaces the user store in use."""
+    global _store
+    _store = store
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cache
+import user_store
+from records import User
+from user_store import JsonUserStore, SqliteUserStore, export_users, import_users
+
+ALICE = User('alice', 'hash-a', 'Alice', 'Smith')
+BOB = User('bob', 'hash-b', 'Bob', 'Jones')
+
+
+class UserStoreTests:
+    """Tests shared by every user store, run against a fresh store in a temporary directory."""
+
+    def make_store(self, directory):
+        raise NotImplementedError
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.store = self.make_store(self.directory)
+
+    def test_get_missing_user(self):
+        self.assertIsNone(self.store.get('alice'))
+
+    def test_add_and_get(self):
+        self.assertTrue(self.store.add(ALICE))
+        self.assertEqual(self.store.get('alice'), ALICE)
+        self.assertIsNone(self.store.get('bob'))
+
+    def test_add_existing_username(self):
+        self.store.add(ALICE)
+        self.assertFalse(self.store.add(User('alice', 'other', 'Other', 'Person')))
+        self.assertEqual(self.store.get('alice'), ALICE)
+
+    def test_set_password(self):
+        self.store.add(ALICE)
+        self.store.add(BOB)
+        self.store.set_password('alice', 'new-hash')
+        self.assertEqual(self.store.get('alice').password, 'new-hash')
+        self.assertEqual(self.store.get('bob'), BOB)
+
+    def test_users(self):
+        self.store.add(ALICE)
+        self.store.add(BOB)
+        self.assertEqual(sorted(self.store.users(), key=lambda user: user.username), [ALICE, BOB])
+
+    def test_export_and_import(self):
+        self.store.add(ALICE)
+        self.store.add(BOB)
+        path = os.path.join(self.directory, "export.json")
+        export_users(self.store, path)
+        with open(path) as file:
+            self.assertEqual(json.load(file), {'alice': ALICE.to_dict(), 'bob': BOB.to_dict()})
+
+        other = SqliteUserStore(os.path.join(self.directory, "other.db"), import_from=None)
+        other.add(User('alice', 'kept', 'Alice', 'Smith'))
+        self.assertEqual(import_users(other, path), 1)
+        self.assertEqual(other.get('alice').password, 'kept')
+        self.assertEqual(other.get('bob'), BOB)
+
+
+class TestSqliteUserStore(UserStoreTests, unittest.TestCase):
+
+    def make_store(self, directory):
+        return SqliteUserStore(os.path.join(directory, "users.db"), import_from=None)
+
+    def test_imports_json_when_created(self):
+        path = os.path.join(self.directory, "users.json")
+        with open(path, 'w') as file:
+            json.dump({'alice': ALICE.to_dict()}, file)
+        store = SqliteUserStore(os.path.join(self.directory, "imported.db"), import_from=path)
+        self.assertEqual(store.get('alice'), ALICE)
+
+        # An existing database is not imported into again.
+        with open(path, 'w') as file:
+            json.dump({'bob': BOB.to_dict()}, file)
+        self.assertIsNone(SqliteUserStore(store.path, import_from=path).get('bob'))
+
+
+class TestJsonUserStore(UserStoreTests, unittest.TestCase):
+
+    def make_store(self, directory):
+        return JsonUserStore(os.path.join(directory, "users.json"))
+
+    def test_keeps_the_users_json_format(self):
+        self.store.add(ALICE)
+        with open(self.store.path) as file:
+            self.assertEqual(json.load(file), {'alice': ALICE.to_dict()})
+
+
+class TestUserStoreSelection(unittest.TestCase):
+
+    def tearDown(self):
+        user_store.set_user_store(None)
+
+    @patch.dict(os.environ, {user_store.USER_STORE_ENV: "json"})
+    def test_environment_selects_store(self):
+        user_store.set_user_store(None)
+        self.assertIsInstance(user_store.get_user_store(), JsonUserStore)
+
+    def test_unknown_store(self):
+        with self.assertRaises(ValueError):
+            user_store.create_user_store("shelve")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,11 +3,33 @@ from unittest.mock import patch, mock_open, MagicMock
 import bcrypt
 import json
 import os
-from user import User, load_users, save_users, is_valid_password, validate_input, sign_up, log_in, validate_name
+import tempfile
+from auth import AuthService
+from session import SessionStore
+from user_store import SqliteUserStore
+from user import User, load_users, save_users, is_valid_password, validate_input, sign_up, log_in, log_out, \
+    validate_name
 
 
 class TestUserModule(unittest.TestCase):
 
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SqliteUserStore(os.path.join(directory.name, "users.db"), import_from=None)
+        patcher = patch("user.user_store.get_user_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sessions = SessionStore(os.path.join(directory.name, "sessions.json"),
+                                     os.path.join(directory.name, "session.key"), ttl=0)
+        patcher = patch("user.session.get_store", return_value=self.sessions)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_user(self, rounds=12):
+        self.store.add(User('new_user', bcrypt.hashpw('Password123'.encode('utf-8'), bcrypt.gensalt(rounds)).decode(
+            'utf-8'), 'Test', 'User'))
+
     @patch("builtins.open", new_callable=mock_open, read_data='{}')
     def test_load_users(self, mock_file):
         result = load_users()
@@ -42,49 +64,70 @@ class TestUserModule(unittest.TestCase):
         self.assertFalse(validate_name("John@Doe"))
         self.assertFalse(validate_name("John-Doe"))
 
-    @patch("user.load_users", return_value={})
-    @patch("user.save_users")
     @patch("rich.prompt.Prompt.ask", side_effect=['new_user', 'Password123', 'Test', 'User'])
     @patch("user.console.print")
-    def test_sign_up(self, mock_console_print, mock_prompt, mock_save_users, mock_load_users):
+    def test_sign_up(self, mock_console_print, mock_prompt):
         username = sign_up()
         self.assertEqual(username, 'new_user')
         mock_console_print.assert_any_call("[bold green]Sign up successful![/bold green]")
-        mock_save_users.assert_called_once()
-        args, kwargs = mock_save_users.call_args
-        self.assertIn('new_user', args[0])
-        saved_user = args[0]['new_user']
-        self.assertTrue(bcrypt.checkpw('Password123'.encode('utf-8'), saved_user['password'].encode('utf-8')))
+        saved_user = self.store.get('new_user')
+        self.assertEqual((saved_user.first_name, saved_user.last_name), ('Test', 'User'))
+        self.assertTrue(bcrypt.checkpw('Password123'.encode('utf-8'), saved_user.password.encode('utf-8')))
+
+    @patch("rich.prompt.Prompt.ask", side_effect=['new_user', 'other_user', 'Password123', 'Test', 'User'])
+    @patch("user.console.print")
+    def test_sign_up_existing_username(self, mock_console_print, mock_prompt):
+        self.add_user(4)
+        self.assertEqual(sign_up(), 'other_user')
+        mock_console_print.assert_any_call("[red]Username already exists. Please choose another one.[/red]")
 
-    @patch("user.load_users")
     @patch("rich.prompt.Prompt.ask", side_effect=['new_user', 'Password123'])
     @patch("rich.console.Console.print")
-    def test_log_in_success(self, mock_print, mock_prompt, mock_load_users):
-        mock_load_users.return_value = {
-            'new_user': {
-                'username': 'new_user',
-                'password': bcrypt.hashpw('Password123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8'),
-                'first_name': 'Test',
-                'last_name': 'User'
-            }
-        }
+    def test_log_in_success(self, mock_print, mock_prompt):
+        self.add_user()
         username = log_in()
         self.assertEqual(username, 'new_user')
         mock_print.assert_any_call("[bold green]Login successful![/bold green]")
 
-    @patch("user.load_users")
+    @patch("user.auth.get_service", return_value=AuthService(rounds=5, workers=0))
+    @patch("rich.prompt.Prompt.ask", side_effect=['new_user', 'Password123'])
+    @patch("rich.console.Console.print")
+    def test_log_in_rehashes_password(self, mock_print, mock_prompt, mock_get_service):
+        self.add_user(4)
+        self.assertEqual(log_in(), 'new_user')
+        saved_hash = self.store.get('new_user').password
+        self.assertTrue(saved_hash.startswith('$2b$05$'))
+        self.assertTrue(bcrypt.checkpw('Password123'.encode('utf-8'), saved_hash.encode('utf-8')))
+
+    @patch("rich.prompt.Prompt.ask", side_effect=['new_user', 'Password123', 'new_user'])
+    @patch("rich.console.Console.print")
+    def test_log_in_resumes_session(self, mock_print, mock_prompt):
+        self.sessions.ttl = 600
+        self.add_user(4)
+        self.assertEqual(log_in(), 'new_user')
+        self.assertTrue(self.sessions.resume('new_user'))
+        # The second login only asks for the username.
+        with patch("user.auth.get_service") as mock_get_service:
+            self.assertEqual(log_in(), 'new_user')
+        mock_get_service.assert_not_called()
+        self.assertEqual(mock_prompt.call_count, 3)
+
+    @patch("rich.prompt.Prompt.ask", side_effect=['new_user', 'Password123', 'new_user', 'Password123'])
+    @patch("rich.console.Console.print")
+    def test_log_out_revokes_session(self, mock_print, mock_prompt):
+        self.sessions.ttl = 600
+        self.add_user(4)
+        log_in()
+        log_out('new_user')
+        self.assertFalse(self.sessions.resume('new_user'))
+        self.assertEqual(log_in(), 'new_user')
+        self.assertEqual(mock_prompt.call_count, 4)
+
     @patch("rich.prompt.Prompt.ask", side_effect=['new_user', 'WrongPassword'])
     @patch("rich.console.Console.print")
     @patch("rich.prompt.Confirm.ask", return_value=False)
-    def test_log_in_failure(self, mock_confirm, mock_print, mock_prompt, mock_load_users):
-        mock_load_users.return_value = {
-            'new_user': {
-                'username': 'new_user',
-                'password': bcrypt.hashpw('Password123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8'),
-                'first_name': 'Test',
-                'last_name': 'User'
-            }
-        }
+    def test_log_in_failure(self, mock_confirm, mock_print, mock_prompt):
+        self.add_user()
         username = log_in()
         self.assertIsNone(username)
         mock_print.assert_any_call("[red]Invalid username or password.[/red]")
@@ -0,0 +1,42 @@
+class Waitlists(dict):
+    """The users waiting for a slot to free up at each "YYYY-MM-DD HH:MM" key, first come first served. Each queue
+    is a dict used as an ordered set, so joining, leaving and taking the first user are all O(1)."""
+
+    @classmethod
+    def from_json(cls, data):
+        """Builds the waitlists from their {key: [username, ...]} JSON form."""
+        return cls({key: dict.fromkeys(usernames) for key, usernames in data.items()})
+
+    def to_json(self):
+        return {key: list(queue) for key, queue in self.items()}
+
+    def join(self, key, username):
+        """Puts the user at the end of the queue unless they are already in it. Returns their position, from 1."""
+        queue = self.setdefault(key, {})
+        if username in queue:
+            return list(queue).index(username) + 1
+        queue[username] = None
+        return len(queue)
+
+    def leave(self, key, username):
+        """Takes the user out of the queue, returns False if they weren't in it."""
+        queue = self.get(key)
+        if queue is None or username not in queue:
+            return False
+        del queue[username]
+        if not queue:
+            del self[key]
+        return True
+
+    def promote(self, key, slot, reservations):
+        """Books the freed slot for the first user in the queue, skipping the ones who got a slot at that time in
+        the meantime. Returns the username of the promoted user, None if nobody was waiting."""
+        queue = self.get(key)
+        while queue:
+            username = next(iter(queue))
+            self.leave(key, username)
+            if not any(res['username'] == username for res in reservations.get(key, [])):
+                reservations.book(key, slot, username)
+                return username
+            queue = self.get(key)
+        return None
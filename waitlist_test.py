@@ -0,0 +1,42 @@
+import unittest
+
+from occupancy import IndexedReservations
+from waitlist import Waitlists
+
+
+class TestWaitlists(unittest.TestCase):
+
+    def test_join_keeps_order_and_ignores_repeats(self):
+        waitlists = Waitlists()
+        self.assertEqual(waitlists.join("2023-01-01 09:00", "user1"), 1)
+        self.assertEqual(waitlists.join("2023-01-01 09:00", "user2"), 2)
+        self.assertEqual(waitlists.join("2023-01-01 09:00", "user1"), 1)
+        self.assertEqual(list(waitlists["2023-01-01 09:00"]), ["user1", "user2"])
+
+    def test_leave_drops_empty_queues(self):
+        waitlists = Waitlists()
+        waitlists.join("2023-01-01 09:00", "user1")
+        self.assertFalse(waitlists.leave("2023-01-01 09:00", "user2"))
+        self.assertTrue(waitlists.leave("2023-01-01 09:00", "user1"))
+        self.assertEqual(waitlists, {})
+
+    def test_json_round_trip(self):
+        waitlists = Waitlists.from_json({"2023-01-01 09:00": ["user2", "user1"]})
+        self.assertEqual(waitlists.to_json(), {"2023-01-01 09:00": ["user2", "user1"]})
+
+    def test_promote(self):
+        reservations = IndexedReservations({"2023-01-01 09:00": [{'slot': 2, 'username': "user2"}]})
+        waitlists = Waitlists.from_json({"2023-01-01 09:00": ["user2", "user3", "user4"]})
+        self.assertEqual(waitlists.promote("2023-01-01 09:00", 1, reservations), "user3")
+        self.assertEqual(reservations["2023-01-01 09:00"], [{'slot': 2, 'username': "user2"},
+                                                            {'slot': 1, 'username': "user3"}])
+        self.assertEqual(waitlists.to_json(), {"2023-01-01 09:00": ["user4"]})
+
+    def test_promote_nobody_waiting(self):
+        reservations = IndexedReservations()
+        self.assertIsNone(Waitlists().promote("2023-01-01 09:00", 1, reservations))
+        self.assertEqual(reservations, {})
+
+
+if __name__ == '__main__':
+    unittest.main()